@@ -0,0 +1,92 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Vectorized cleaning of the scraped articles
+# The keyword filter compiles any number of keywords into one alternation regex shaped like a trie: keywords sharing
+# a prefix share its branch, so at every position of an article Python's backtracking re engine follows at most one
+# branch per character instead of trying each keyword in turn. It is not an Aho-Corasick automaton and gives no
+# linear-time guarantee, the engine still restarts at every position, but with plain literal keywords the work per
+# position grows with the keyword length and the branching of the trie (at most the alphabet per character) rather
+# than with the number of keywords. Publish dates repeat heavily (one date per day and site), so every distinct raw
+# string is parsed once and the result broadcast back to the rows. Only the rows kept by the filter are copied.
+
+DEFAULT_KEYWORDS = ("Nvidia", "GPU", "processor")
+
+# the "Month day year" part of both sites' dates once commas are removed:
+# Fox News "March 1, 2024 3:00pm EST", CNN "3:00 PM EST, Fri March 1, 2024"
+DATE_RE = r"([a-zA-Z]+ [0-9]+ [0-9]+)"
+
+def trie_pattern(keywords):
+    """
+        Builds an alternation regex matching any of the keywords, nested like a trie so that common prefixes are
+        matched once (a plain backtracking regex for re, not an Aho-Corasick automaton).
+        A keyword extending a shorter one is dropped, for a substring test the shorter one already matches.
+    """
+    trie = {}
+    for keyword in sorted(set(k.lower() for k in keywords if k), key=len):
+        node = trie
+        for ch in keyword:
+            if "" in node:
+                break
+            node = node.setdefault(ch, {})
+        else:
+            node.clear()
+            node[""] = True
+
+    def build(node):
+        if "" in node:
+            return ""
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items())]
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    return build(trie)
+
+class KeywordFilter:
+    def __init__(self, keywords=DEFAULT_KEYWORDS):
+        """
+            Case-insensitive substring filter over an arbitrary list of keywords.
+        """
+        self.keywords = list(keywords)
+        self.pattern = re.compile(trie_pattern(self.keywords), re.IGNORECASE) if self.keywords else None
+
+    def mask(self, texts):
+        """
+            :return: A boolean numpy array, True for the texts containing at least one keyword (missing texts never do).
+        """
+        if self.pattern is None:
+            return np.zeros(len(texts), dtype=bool)
+        search = self.pattern.search
+        return np.fromiter((isinstance(text, str) and search(text) is not None for text in texts), dtype=bool, count=len(texts))
+
+def parse_publish_dates(dates):
+    """
+        Parses the publish dates of both sites like convert_dt_str, but once per distinct raw string.
+
+            @ dates: Series or list of raw date strings.
+
+        :return: A datetime64 Series aligned with dates, NaT where no date was found.
+    """
+    dates = pd.Series(dates)
+    codes, uniques = pd.factorize(dates)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object).astype(str).str.replace(",", "", regex=False).str.extract(DATE_RE)[0],
+                            format="%B %d %Y", errors="coerce")
+    # factorize gives -1 for missing dates, which point to the appended NaT
+    values = np.append(parsed.to_numpy(dtype="datetime64[ns]"), np.datetime64("NaT", "ns"))
+    return pd.Series(values[codes], index=dates.index)
+
+def clean_articles(df, keywords=DEFAULT_KEYWORDS, columns=("publish_date", "headline", "main_text", "media")):
+    """
+        Cleans scraped articles like the notebooks' clean_text followed by convert_dt_str.
+
+            @ df: DataFrame of scraped records.
+            @ keywords: Keep only the articles mentioning one of them, case-insensitive. Defaults to DEFAULT_KEYWORDS.
+            @ columns: Columns to keep, in order. Defaults to publish_date, headline, main_text and media.
+
+        :return: A new DataFrame of the kept articles, main_text on one line and publish_date parsed.
+    """
+    keep = KeywordFilter(keywords).mask(df["main_text"].to_numpy(dtype=object))
+    cleaned = df.loc[keep, list(columns)]
+    cleaned["main_text"] = cleaned["main_text"].str.replace("\n", " ", regex=False)
+    if "publish_date" in cleaned:
+        cleaned["publish_date"] = parse_publish_dates(cleaned["publish_date"])
+    return cleaned
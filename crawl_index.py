@@ -0,0 +1,128 @@
+import json
+import time
+import sqlite3
+import hashlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Persistent crawl index for incremental scraping
+# One SQLite row per normalized url with the last fetch time, the parse status and a hash of the extracted records.
+# A rerun only fetches urls that are new, failed transiently, or are due for a refresh; pages that parsed to nothing or
+# are irrelevant are remembered and skipped, and a refreshed page whose records hash did not change is not saved again.
+
+# parse status of a url
+OK = "ok"                   # at least one record was extracted
+EMPTY = "empty"             # the page loaded but has no valid article, known-bad, not fetched again
+IRRELEVANT = "irrelevant"   # promotions and the like, not fetched again
+ERROR = "error"             # the fetch failed, retried on the next runs up to max_failures times
+
+# query parameters that only track where a click came from
+TRACKING_PARAMS = ("utm_", "cmpid", "intcmp", "fbclid", "gclid")
+
+def normalize_url(url):
+    """
+        Normalizes a url so that the same article found through different links maps to one index row:
+        lowercase scheme and host, no fragment, no tracking query parameters and no trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not k.lower().startswith(TRACKING_PARAMS)]
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower() or "https", parts.netloc.lower(), path, urlencode(sorted(query)), ""))
+
+def records_hash(records):
+    # hash of the extracted content rather than the raw html, which changes with every ad and tracking pixel
+    content = json.dumps([[r.get("headline"), r.get("publish_date"), r.get("main_text")] for r in records], ensure_ascii=False)
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+class CrawlIndex:
+    def __init__(self, path="./data/crawl_index.sqlite", max_failures=3):
+        """
+            Opens (or creates) the crawl index.
+
+                @ path: Path of the SQLite file. Defaults to "./data/crawl_index.sqlite".
+                @ max_failures: Number of failed fetches after which a url is given up on. Defaults to 3.
+        """
+        self.path = path
+        self.max_failures = max_failures
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                media TEXT,
+                status TEXT NOT NULL,
+                content_hash TEXT,
+                num_records INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                first_seen REAL NOT NULL,
+                fetched_at REAL NOT NULL
+            )""")
+        self.conn.commit()
+
+    def lookup(self, urls):
+        # url -> (status, content_hash, failures, fetched_at) of the known urls among the given ones
+        rows = {}
+        keys = [normalize_url(url) for url in urls]
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            query = f"SELECT url, status, content_hash, failures, fetched_at FROM urls WHERE url IN ({','.join('?' * len(chunk))})"
+            for url, status, content_hash, failures, fetched_at in self.conn.execute(query, chunk):
+                rows[url] = (status, content_hash, failures, fetched_at)
+        return rows
+
+    def select(self, urls, refresh_after=None):
+        """
+            Picks the urls that need fetching: new ones, failed ones under max_failures and, if refresh_after is set,
+            successfully parsed ones fetched more than refresh_after seconds ago.
+
+            :return: The list of urls to fetch (duplicates by normalized url removed) and a dict of status -> count of the skipped ones.
+        """
+        known = self.lookup(urls)
+        now = time.time()
+        selected, skipped, seen = [], {}, set()
+        for url in urls:
+            key = normalize_url(url)
+            if key in seen:
+                continue
+            seen.add(key)
+            status, _, failures, fetched_at = known.get(key, (None, None, 0, 0))
+            if status is None \
+                    or (status == ERROR and failures < self.max_failures) \
+                    or (status == OK and refresh_after is not None and now - fetched_at > refresh_after):
+                selected.append(url)
+            else:
+                skipped[status] = skipped.get(status, 0) + 1
+        return selected, skipped
+
+    def is_changed(self, url, records):
+        # True if the records differ from what was extracted from the url last time
+        known = self.lookup([url]).get(normalize_url(url))
+        return known is None or known[1] != records_hash(records)
+
+    def record(self, url, status, records=(), media=None, error=None, commit=True):
+        """
+            Stores the outcome of fetching and parsing a url.
+        """
+        now = time.time()
+        content_hash = records_hash(records) if records else None
+        self.conn.execute("""
+            INSERT INTO urls (url, media, status, content_hash, num_records, failures, error, first_seen, fetched_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                media = COALESCE(excluded.media, media),
+                status = excluded.status,
+                content_hash = COALESCE(excluded.content_hash, content_hash),
+                num_records = excluded.num_records,
+                failures = CASE WHEN excluded.status = 'error' THEN failures + 1 ELSE 0 END,
+                error = excluded.error,
+                fetched_at = excluded.fetched_at""",
+            (normalize_url(url), media, status, content_hash, len(records), int(status == ERROR), error and str(error), now, now))
+        if commit: self.conn.commit()
+
+    def commit(self):
+        self.conn.commit()
+
+    def stats(self):
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM urls GROUP BY status").fetchall())
+
+    def close(self):
+        self.conn.close()
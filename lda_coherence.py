@@ -0,0 +1,247 @@
+import numpy as np
+import pandas as pd
+from numba import jit
+from lda_vocabulary import Corpus, build_corpus
+
+# Topic coherence of the Numba LDA models, without gensim
+# The measures are the ones of gensim's CoherenceModel (Röder et al., 2015), on the encoded corpus:
+#   u_mass: mean over the word pairs (w_i, w_j), j < i, of log((p(w_i, w_j) + eps) / p(w_j)), documents as contexts
+#   c_npmi: mean over the same pairs of the normalized PMI, sliding windows of 10 tokens as contexts
+#   c_v:    mean cosine similarity between the NPMI vector of every top word and the summed NPMI vector of the topic,
+#           sliding windows of 110 tokens as contexts
+# A CooccurrenceIndex caches the co-occurrence counts of the words asked for so far and only counts the pairs involving
+# words it has not seen yet, so scoring many topics and many models on the same corpus (e.g. every config of a sweep)
+# mostly reuses counts that are already there. The windows containing a word are merged into intervals and the pair
+# counts are the overlaps of the intervals, found with a sweep line in Numba, so the windows are never materialized
+# (gensim builds a set per window). The scores of all the topics are then gathered from the counts at once.
+
+MEASURES = ("u_mass", "c_npmi", "c_v")
+# the context of every measure, None for documents and an int for sliding windows of that many tokens
+DEFAULT_WINDOWS = {"u_mass": None, "c_npmi": 10, "c_v": 110}
+EPSILON = 1e-12
+
+@jit(nopython=True)
+def count_cooccurrences(token_ids, doc_offsets, column_of, is_new, window_size):
+    """
+        Context counts of the words with a column, for the pairs involving at least one new word.
+
+            @ column_of: Column of every word id, -1 for the words not counted.
+            @ is_new: Per column, whether its counts still have to be computed.
+            @ window_size: Size of the sliding windows, 0 for documents as contexts.
+
+        :return: The n x n matrix of the number of contexts of every pair of columns (of every column on the diagonal),
+                 zero where neither column is new.
+    """
+    n = len(is_new)
+    counts = np.zeros((n, n), dtype=np.int64)
+    # the windows containing one word form intervals, merged per word while scanning its occurrences in order
+    open_start = np.full(n, -1, dtype=np.int64)
+    open_end = np.full(n, -1, dtype=np.int64)
+    starts = np.empty(len(token_ids), dtype=np.int64)
+    ends = np.empty(len(token_ids), dtype=np.int64)
+    cols = np.empty(len(token_ids), dtype=np.int64)
+    active_end = np.empty(n, dtype=np.int64)
+    active_col = np.empty(n, dtype=np.int64)
+    for d in range(len(doc_offsets) - 1):
+        doc_start, doc_len = doc_offsets[d], doc_offsets[d + 1] - doc_offsets[d]
+        num_windows = max(doc_len - window_size + 1, 1) if window_size > 0 else 1
+        num_intervals = 0
+        touched = []
+        for i in range(doc_len):
+            c = column_of[token_ids[doc_start + i]]
+            if c < 0:
+                continue
+            # the token at offset i is in the windows max(0, i - w + 1) .. min(i, num_windows - 1)
+            lo = max(i - window_size + 1, 0) if window_size > 0 else 0
+            hi = min(i, num_windows - 1) if window_size > 0 else 0
+            if open_start[c] < 0:
+                open_start[c], open_end[c] = lo, hi
+                touched.append(c)
+            elif lo <= open_end[c] + 1:
+                open_end[c] = hi
+            else:
+                starts[num_intervals], ends[num_intervals], cols[num_intervals] = open_start[c], open_end[c], c
+                num_intervals += 1
+                open_start[c], open_end[c] = lo, hi
+        for c in touched:
+            starts[num_intervals], ends[num_intervals], cols[num_intervals] = open_start[c], open_end[c], c
+            num_intervals += 1
+            open_start[c] = -1
+
+        # sweep line over the intervals by start: every interval overlaps the still active ones started before it
+        order = np.argsort(starts[:num_intervals], kind="mergesort")
+        num_active = 0
+        for idx in order:
+            start, end, c = starts[idx], ends[idx], cols[idx]
+            kept = 0
+            for a in range(num_active):
+                if active_end[a] >= start:
+                    active_end[kept], active_col[kept] = active_end[a], active_col[a]
+                    kept += 1
+                    b = active_col[a]
+                    if is_new[c] or is_new[b]:
+                        overlap = min(end, active_end[a]) - start + 1
+                        counts[c, b] += overlap
+                        counts[b, c] += overlap
+            num_active = kept
+            active_end[num_active], active_col[num_active] = end, c
+            num_active += 1
+            if is_new[c]:
+                counts[c, c] += end - start + 1
+    return counts
+
+class CooccurrenceIndex:
+    def __init__(self, token_ids, doc_offsets, V, window_size=None):
+        """
+            Co-occurrence counts of the words of an encoded corpus, computed on demand and cached.
+
+                @ token_ids, doc_offsets: Flat corpus arrays, see lda_vocabulary.Corpus.
+                @ V: Vocabulary size.
+                @ window_size: Contexts are sliding windows of window_size tokens within the documents (a document
+                               shorter than that is one window), as gensim's boolean_sliding_window, or the documents
+                               if None. Defaults to None.
+        """
+        self.token_ids = np.ascontiguousarray(token_ids, dtype=np.int32)
+        self.doc_offsets = np.ascontiguousarray(doc_offsets, dtype=np.int64)
+        self.window_size = window_size
+        doc_lengths = np.diff(self.doc_offsets)
+        if window_size is None:
+            self.num_contexts = len(doc_lengths)
+        else:
+            self.num_contexts = int(np.maximum(doc_lengths - window_size + 1, 1).sum())
+        # cached words in the order of the rows of counts, and the position of every word id there (-1 if not cached)
+        self.words = np.zeros(0, dtype=np.int64)
+        self.position = np.full(V, -1, dtype=np.int64)
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+
+    def lookup(self, word_ids):
+        """
+            Computes the counts of the words not cached yet, in one pass over the corpus.
+
+            :return: The positions of word_ids in self.counts, whose diagonal holds the number of contexts of every word
+                     and the rest the number of contexts of every pair.
+        """
+        word_ids = np.asarray(word_ids, dtype=np.int64)
+        new = np.unique(word_ids[self.position[word_ids] < 0])
+        if len(new):
+            num_cached = len(self.words)
+            self.words = np.concatenate([self.words, new])
+            self.position[new] = np.arange(num_cached, len(self.words))
+            is_new = np.arange(len(self.words)) >= num_cached
+            counts = count_cooccurrences(self.token_ids, self.doc_offsets, self.position, is_new, self.window_size or 0)
+            counts[:num_cached, :num_cached] = self.counts
+            self.counts = counts
+        return self.position[word_ids]
+
+    def probabilities(self, top):
+        """
+            :return: The T x N x N array of the context probabilities of the word pairs of every topic of top (T x N word
+                     ids), with the probability of each word on the diagonal.
+        """
+        positions = self.lookup(top.ravel()).reshape(top.shape)
+        return self.counts[positions[:, :, None], positions[:, None, :]] / max(self.num_contexts, 1)
+
+def npmi(joint, prob_a, prob_b):
+    return np.log((joint + EPSILON) / (prob_a * prob_b)) / -np.log(joint + EPSILON)
+
+def one_pre_pairs(N):
+    # gensim's s_one_pre segmentation: every word with each of the words before it
+    return np.tril_indices(N, -1)
+
+def u_mass(probs):
+    later, earlier = one_pre_pairs(probs.shape[1])
+    return np.log((probs[:, later, earlier] + EPSILON) / probs[:, earlier, earlier]).mean(axis=1)
+
+def c_npmi(probs):
+    later, earlier = one_pre_pairs(probs.shape[1])
+    return npmi(probs[:, later, earlier], probs[:, later, later], probs[:, earlier, earlier]).mean(axis=1)
+
+def c_v(probs):
+    # s_one_set segmentation: every word against the whole topic, with the indirect cosine measure over NPMI vectors
+    marginals = np.diagonal(probs, axis1=1, axis2=2)
+    vectors = npmi(probs, marginals[:, :, None], marginals[:, None, :])
+    topic_vectors = vectors.sum(axis=1, keepdims=True)
+    cosine = (vectors * topic_vectors).sum(axis=2) / (np.linalg.norm(vectors, axis=2) * np.linalg.norm(topic_vectors, axis=2))
+    return cosine.mean(axis=1)
+
+MEASURE_FUNCTIONS = {"u_mass": u_mass, "c_npmi": c_npmi, "c_v": c_v}
+
+def top_word_ids(phi, top_words=10, allowed=None):
+    """
+        The top_words most probable words of every topic by decreasing probability, with argpartition instead of a full sort.
+
+            @ allowed: Boolean mask of the words that may be picked, None allows all. Defaults to None.
+
+        :return: A K x top_words array of word ids.
+    """
+    phi = np.asarray(phi)
+    if allowed is not None:
+        phi = np.where(allowed, phi, -np.inf)
+    top_words = min(top_words, phi.shape[1])
+    # the largest values end up in the last top_words columns, without a negated copy of phi
+    top = np.argpartition(phi, phi.shape[1] - top_words, axis=1)[:, phi.shape[1] - top_words:]
+    # by decreasing probability, ties by word id as pandas' nlargest
+    order = np.lexsort((top, -np.take_along_axis(phi, top, axis=1)), axis=-1)
+    return np.take_along_axis(top, order, axis=1)
+
+class CoherenceEvaluator:
+    def __init__(self, documents, windows=None):
+        """
+            Scores the topics of any number of models on one reference corpus, with one cached CooccurrenceIndex per
+            kind of context.
+
+                @ documents: Tokenized documents or an encoded lda_vocabulary.Corpus, usually the corpus the models were
+                             fitted on.
+                @ windows: Dict of measure -> window size overriding DEFAULT_WINDOWS. Defaults to None.
+        """
+        self.corpus = documents if isinstance(documents, Corpus) else build_corpus(documents)
+        self.windows = dict(DEFAULT_WINDOWS, **(windows or {}))
+        self.indexes = {}
+        self.word_to_index = None
+
+    def index(self, window_size):
+        if window_size not in self.indexes:
+            self.indexes[window_size] = CooccurrenceIndex(self.corpus.token_ids, self.corpus.doc_offsets, len(self.corpus.vocabulary), window_size)
+        return self.indexes[window_size]
+
+    def score(self, top, measure="c_v"):
+        """
+            Coherence of topics given as word ids of the corpus.
+
+                @ top: T x N array of word ids, the words of every topic by decreasing probability.
+                @ measure: One of MEASURES. Defaults to "c_v".
+
+            :return: The array of the T topic coherences.
+        """
+        if measure not in MEASURE_FUNCTIONS:
+            raise ValueError(f"Unknown coherence measure {measure!r}, expected one of {MEASURES}")
+        top = np.atleast_2d(np.asarray(top, dtype=np.int64))
+        return MEASURE_FUNCTIONS[measure](self.index(self.windows[measure]).probabilities(top))
+
+    def model_top_words(self, lda, top_words=10):
+        # the top words of the model as ids of the corpus, only words of the corpus are picked
+        vocabulary = list(lda["vocabulary"])
+        if vocabulary == list(self.corpus.vocabulary):
+            return top_word_ids(lda["phi"], top_words)
+        if self.word_to_index is None:
+            self.word_to_index = {word: idx for idx, word in enumerate(self.corpus.vocabulary)}
+        corpus_ids = np.array([self.word_to_index.get(word, -1) for word in vocabulary], dtype=np.int64)
+        top = top_word_ids(lda["phi"], top_words, allowed=corpus_ids >= 0)
+        return corpus_ids[top]
+
+    def evaluate(self, lda, measures=MEASURES, top_words=10):
+        """
+            Coherence of every topic of a fitted model.
+
+                @ lda: Model dict with phi and vocabulary, e.g. fitted by lda_model.fit_lda or loaded by load_lda.
+                @ measures: Measures to compute. Defaults to all of MEASURES.
+                @ top_words: Number of words per topic. Defaults to 10.
+
+            :return: A DataFrame with one row per topic: topic, its top words and one column per measure.
+        """
+        top = self.model_top_words(lda, top_words)
+        vocabulary = np.array(self.corpus.vocabulary, dtype=object)
+        table = pd.DataFrame({"topic": np.arange(len(top)), "top_words": [", ".join(words) for words in vocabulary[top]]})
+        for measure in measures:
+            table[measure] = self.score(top, measure)
+        return table
@@ -0,0 +1,191 @@
+import os
+import tempfile
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+import lda_model
+
+# Process-pool backend of fit_lda for corpora that outgrow one process
+# The global n_k_i/n_k (and the per document n_j_k/n_j) live in multiprocessing.shared_memory blocks and the corpus
+# (token_ids, doc_offsets, topic_ids) in .npy files that every worker memory-maps, so nothing but shard indices and
+# seeds is ever pickled. A worker process attaches to all of it once in the pool initializer, then each task samples
+# one shard for `sync_interval` sweeps against a private copy of the counts as of the start of the round and adds its
+# delta back to the global counts under a lock.
+# A ProcessPoolSampler keeps the pool, the shared blocks and the corpus files alive across calls, so the blocks of a
+# checkpointed or monitored fit (lda_model.blocked_sampling) reuse the same workers and their compiled kernels.
+
+# per process state of a pool worker, filled in by init_worker
+_worker = {}
+
+def create_shared_array(shape, dtype):
+    shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1))
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def attach_shared_array(name, shape, dtype):
+    # pool workers share the parent's resource tracker, so attaching does not make them owners of the block,
+    # only the parent unlinks it
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def init_worker(corpus_dir, shared_specs, lock, shard_bounds, K, alpha, beta, V):
+    """
+        Pool initializer, attaches the worker to the shared count matrices and memory-maps the corpus files.
+
+            @ corpus_dir: Directory written by lda_model.save_corpus, holding token_ids, doc_offsets and topic_ids.
+            @ shared_specs: Dict of array name -> (shared memory name, shape, dtype) for n_k_i, n_k, n_j_k, n_j and the
+                            round_n_k_i/round_n_k snapshots the parent takes at the start of every round.
+            @ lock: Lock guarding the merge of the deltas into the global n_k_i/n_k.
+    """
+    token_ids, doc_offsets = lda_model.load_corpus(corpus_dir)
+    _worker["token_ids"] = token_ids
+    _worker["doc_offsets"] = doc_offsets
+    _worker["topic_ids"] = np.asarray(np.load(os.path.join(corpus_dir, "topic_ids.npy"), mmap_mode="r+"))
+    _worker["shm"] = []
+    for key, (name, shape, dtype) in shared_specs.items():
+        shm, arr = attach_shared_array(name, shape, dtype)
+        _worker["shm"].append(shm)
+        _worker[key] = arr
+    _worker["lock"] = lock
+    _worker["shard_bounds"] = shard_bounds
+    _worker["params"] = (K, alpha, beta, V)
+    # private buffers reused by every task this process runs
+    _worker["local_n_k_i"] = np.empty_like(_worker["n_k_i"])
+    _worker["local_n_k"] = np.empty_like(_worker["n_k"])
+
+def sample_shard(task):
+    """
+        Runs num_sweeps Gibbs sweeps over one shard and merges the resulting delta into the global counts.
+
+            @ task: Tuple of (shard index, num_sweeps, seed).
+
+        :return: The shard index.
+    """
+    w, num_sweeps, seed = task
+    K, alpha, beta, V = _worker["params"]
+    n_k_i, n_k = _worker["n_k_i"], _worker["n_k"]
+    local_n_k_i, local_n_k = _worker["local_n_k_i"], _worker["local_n_k"]
+    round_n_k_i, round_n_k = _worker["round_n_k_i"], _worker["round_n_k"]
+    doc_start, doc_end = _worker["shard_bounds"][w], _worker["shard_bounds"][w + 1]
+
+    # start from the round snapshot rather than the live counts, which other workers may already have merged into,
+    # so that the draws do not depend on the order the tasks get scheduled in
+    np.copyto(local_n_k_i, round_n_k_i)
+    np.copyto(local_n_k, round_n_k)
+
+    # the kernels are compiled on the first task of the process and reused afterwards
+    lda_model.set_seed(seed)
+    for _ in range(num_sweeps):
+        lda_model.gibbs_sweep(doc_start, doc_end, _worker["token_ids"], _worker["doc_offsets"], local_n_k_i, local_n_k,
+                              _worker["n_j_k"], _worker["n_j"], _worker["topic_ids"], K, alpha, beta, V)
+
+    # integer deltas commute, so the merged counts do not depend on the order the workers finish in
+    local_n_k_i -= round_n_k_i
+    local_n_k -= round_n_k
+    with _worker["lock"]:
+        n_k_i += local_n_k_i
+        n_k += local_n_k
+    return w
+
+class ProcessPoolSampler:
+    def __init__(self, token_ids, doc_offsets, K, alpha, beta, V, n_workers, corpus_dir=None):
+        """
+            Keeps a pool of worker processes, the shared count matrices and the corpus files alive for any number of
+            sampling runs on the same corpus and model (e.g. every block of lda_model.blocked_sampling), so the workers
+            start, attach and compile their kernels once.
+
+                @ n_workers: Number of worker processes, the documents are split into as many shards.
+                @ corpus_dir: Directory to write the flat corpus files to, a temporary directory is used if None. Defaults to None.
+        """
+        self.n_workers = n_workers
+        self.shard_bounds = lda_model.shard_documents(doc_offsets, n_workers)
+        self.tmp_dir = None
+        if corpus_dir is None:
+            self.tmp_dir = tempfile.TemporaryDirectory(prefix="lda_corpus_")
+            corpus_dir = self.tmp_dir.name
+        lda_model.save_corpus(corpus_dir, token_ids, doc_offsets)
+        topic_ids_path = os.path.join(corpus_dir, "topic_ids.npy")
+        np.save(topic_ids_path, np.zeros(len(token_ids), dtype=np.uint16))
+        # the workers map the same file, what the parent writes here is what they sample from
+        self.topic_ids = np.load(topic_ids_path, mmap_mode="r+")
+
+        D = len(doc_offsets) - 1
+        self.shms, self.shared, shared_specs = [], {}, {}
+        self.pool = None
+        try:
+            for key, shape in (("n_k_i", (K, V)), ("n_k", (K,)), ("n_j_k", (D, K)), ("n_j", (D,)), ("round_n_k_i", (K, V)), ("round_n_k", (K,))):
+                shm, self.shared[key] = create_shared_array(shape, np.int32)
+                self.shms.append(shm)
+                shared_specs[key] = (shm.name, shape, np.dtype(np.int32).str)
+            ctx = mp.get_context()
+            self.pool = ctx.Pool(n_workers, initializer=init_worker,
+                                 initargs=(corpus_dir, shared_specs, ctx.Lock(), self.shard_bounds, K, alpha, beta, V))
+        except BaseException:
+            self.close()
+            raise
+
+    def sample(self, num_iterations, n_k_i, n_k, n_j_k, n_j, topic_ids, seed=None, sync_interval=1):
+        """
+            Runs AD-LDA Gibbs sampling in the pool from the given counts and topic assignments.
+
+                @ seed: Seed of the per round and shard random streams, a run is reproducible for a fixed seed and n_workers. Defaults to None.
+                @ sync_interval: Number of sweeps each worker runs on its shard between two merges of the global counts. Defaults to 1.
+
+            :return: The updated n_k_i, n_k, n_j_k, n_j and topic_ids.
+        """
+        sync_rounds = [min(sync_interval, num_iterations - start) for start in range(0, num_iterations, sync_interval)]
+        round_seeds = np.random.default_rng(seed).integers(0, 2**31 - 1, size=(len(sync_rounds), self.n_workers))
+        shared = self.shared
+        for key, arr in (("n_k_i", n_k_i), ("n_k", n_k), ("n_j_k", n_j_k), ("n_j", n_j)):
+            shared[key][...] = arr
+        self.topic_ids[...] = topic_ids
+
+        for r, num_sweeps in enumerate(sync_rounds):
+            np.copyto(shared["round_n_k_i"], shared["n_k_i"])
+            np.copyto(shared["round_n_k"], shared["n_k"])
+            self.pool.map(sample_shard, [(w, num_sweeps, int(round_seeds[r, w])) for w in range(self.n_workers)], chunksize=1)
+
+        n_k_i[...] = shared["n_k_i"]
+        n_k[...] = shared["n_k"]
+        n_j_k[...] = shared["n_j_k"]
+        n_j[...] = shared["n_j"]
+        topic_ids[...] = self.topic_ids
+        return n_k_i, n_k, n_j_k, n_j, topic_ids
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        # the views have to be released before the blocks can be closed
+        self.shared.clear()
+        self.topic_ids = None
+        for shm in self.shms:
+            shm.close()
+            shm.unlink()
+        self.shms = []
+        if self.tmp_dir is not None:
+            self.tmp_dir.cleanup()
+            self.tmp_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.pool is not None:
+            self.pool.terminate()
+        self.close()
+
+def process_pool_sampling(num_iterations, token_ids, doc_offsets, n_k_i, n_k, n_j_k, n_j, topic_ids, K, alpha, beta, V, n_workers, seed=None, sync_interval=1, corpus_dir=None):
+    """
+        Runs AD-LDA Gibbs sampling in a multiprocessing pool over shared-memory count matrices, in a ProcessPoolSampler
+        that only lives for this call.
+
+            @ n_workers: Number of worker processes, the documents are split into as many shards.
+            @ seed: Seed of the per round and shard random streams, a fit is reproducible for a fixed seed and n_workers. Defaults to None.
+            @ sync_interval: Number of sweeps each worker runs on its shard between two merges of the global counts. Defaults to 1.
+            @ corpus_dir: Directory to write the flat corpus files to, a temporary directory is used if None. Defaults to None.
+
+        :return: The updated n_k_i, n_k, n_j_k, n_j and topic_ids.
+    """
+    with ProcessPoolSampler(token_ids, doc_offsets, K, alpha, beta, V, n_workers, corpus_dir) as sampler:
+        return sampler.sample(num_iterations, n_k_i, n_k, n_j_k, n_j, topic_ids, seed, sync_interval)
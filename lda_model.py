@@ -0,0 +1,795 @@
+import os
+import json
+import time
+import shutil
+from collections.abc import Sequence
+from contextlib import contextmanager, nullcontext
+import numpy as np
+import numba
+from numba import jit, prange
+from scipy.special import gammaln
+from lda_vocabulary import build_corpus
+
+# Splitted functions version of the Numba LDA (see section 2.4 of agg_code_*.ipynb), kept in a module
+# so that the notebooks can share one implementation and benchmark the different samplers against each other
+
+SAMPLERS = ("dense", "alias")
+BACKENDS = ("threads", "processes")
+# topic assignments are stored as uint16
+MAX_TOPICS = np.iinfo(np.uint16).max + 1
+
+# use a dictionary to simulate the class self.properties, the dictionary is the model
+def initialize_lda(K, alpha, beta, num_iterations):
+    lda = {
+        "K": K,
+        "alpha": alpha,
+        "theta": None,
+        "beta": beta,
+        "phi": None,
+        "num_iterations": num_iterations,
+        "vocabulary": None
+    }
+    return lda
+
+# Numba is having trouble compiling the code due to the presence of
+# reflected containers (lists of lists) with Unicode elements.
+# So the corpus is flattened into CSR form: the tokens of document d are token_ids[doc_offsets[d]:doc_offsets[d+1]],
+# and the topic of each token lives at the same position of a flat topic_ids array
+def encode_documents(documents, vocabulary, word_to_index=None):
+    """
+        Encodes tokenized documents into one contiguous array of word ids, dropping out-of-vocabulary words.
+
+            @ documents: Tokenized documents.
+            @ vocabulary: List of words, the position of a word is its id.
+            @ word_to_index: Precomputed word -> id dict of the vocabulary, built from vocabulary if None. Defaults to None.
+
+        :return: token_ids (int32, all tokens back to back) and doc_offsets (int64, length D+1).
+    """
+    if word_to_index is None:
+        word_to_index = {word: idx for idx, word in enumerate(vocabulary)}
+    doc_offsets = np.zeros(len(documents) + 1, dtype=np.int64)
+    encoded_words = []
+    for d, doc in enumerate(documents):
+        encoded_doc = [word_to_index[word] for word in doc if word in word_to_index]
+        encoded_words.extend(encoded_doc)
+        doc_offsets[d + 1] = doc_offsets[d] + len(encoded_doc)
+    token_ids = np.array(encoded_words, dtype=np.int32)
+    return token_ids, doc_offsets
+
+def save_corpus(corpus_dir, token_ids, doc_offsets):
+    """
+        Writes the flat corpus arrays as .npy files so that they can be memory-mapped by other processes.
+    """
+    os.makedirs(corpus_dir, exist_ok=True)
+    np.save(os.path.join(corpus_dir, "token_ids.npy"), token_ids)
+    np.save(os.path.join(corpus_dir, "doc_offsets.npy"), doc_offsets)
+
+def load_corpus(corpus_dir, mmap_mode="r"):
+    """
+        Memory-maps the flat corpus arrays written by save_corpus.
+
+        :return: token_ids and doc_offsets, backed by the files unless mmap_mode is None.
+    """
+    token_ids = np.asarray(np.load(os.path.join(corpus_dir, "token_ids.npy"), mmap_mode=mmap_mode))
+    doc_offsets = np.asarray(np.load(os.path.join(corpus_dir, "doc_offsets.npy"), mmap_mode=mmap_mode))
+    return token_ids, doc_offsets
+
+@jit(nopython=True)
+def initialize_count_matrices(K, D, V, token_ids, doc_offsets):
+    # uint16 topics halve the memory of the assignments, K is capped at MAX_TOPICS
+    topic_ids = np.random.randint(0, K, size=len(token_ids)).astype(np.uint16)
+    return count_topic_assignments(K, D, V, token_ids, doc_offsets, topic_ids)
+
+@jit(nopython=True)
+def count_topic_assignments(K, D, V, token_ids, doc_offsets, topic_ids):
+    # the count matrices are fully determined by the topic assignments
+    n_k_i = np.zeros((K, V), dtype=np.int32)
+    n_k = np.zeros(K, dtype=np.int32)
+    n_j_k = np.zeros((D, K), dtype=np.int32)
+    n_j = np.zeros(D, dtype=np.int32)
+
+    for d in range(D):
+        for pos in range(doc_offsets[d], doc_offsets[d + 1]):
+            topic = topic_ids[pos]
+            n_k_i[topic, token_ids[pos]] += 1
+            n_k[topic] += 1
+            n_j_k[d, topic] += 1
+            n_j[d] += 1
+
+    return n_k_i, n_k, n_j_k, n_j, topic_ids
+
+@jit(nopython=True, cache=True)
+def set_seed(seed):
+    # numba keeps its own random state, np.random.seed outside of jitted code does not reach it
+    np.random.seed(seed)
+
+# cached on disk, the process-pool workers of lda_distributed load it instead of compiling it in every process
+@jit(nopython=True, cache=True)
+def gibbs_sweep(doc_start, doc_end, token_ids, doc_offsets, n_k_i, n_k, n_j_k, n_j, topic_ids, K, alpha, beta, V):
+    # one Gibbs pass over the documents [doc_start, doc_end)
+    for d in range(doc_start, doc_end):
+        for pos in range(doc_offsets[d], doc_offsets[d + 1]):
+            word_idx = token_ids[pos]
+            topic = topic_ids[pos]
+
+            n_k_i[topic, word_idx] -= 1
+            n_k[topic] -= 1
+            n_j_k[d, topic] -= 1
+            n_j[d] -= 1
+
+            p_topic = (n_k_i[:, word_idx] + beta) / (n_k + V * beta) * (n_j_k[d] + alpha) / (n_j[d] + K * alpha)
+            p_topic /= np.sum(p_topic)
+
+            new_topic = np.random.multinomial(1, p_topic).argmax()
+
+            n_k_i[new_topic, word_idx] += 1
+            n_k[new_topic] += 1
+            n_j_k[d, new_topic] += 1
+            n_j[d] += 1
+
+            topic_ids[pos] = new_topic
+
+@jit(nopython=True)
+def gibbs_sampling(num_iterations, token_ids, doc_offsets, n_k_i, n_k, n_j_k, n_j, topic_ids, K, alpha, beta, V):
+    D = len(doc_offsets) - 1
+    for _ in range(num_iterations):
+        gibbs_sweep(0, D, token_ids, doc_offsets, n_k_i, n_k, n_j_k, n_j, topic_ids, K, alpha, beta, V)
+
+    return n_k_i, n_k, n_j_k, n_j, topic_ids
+
+# AD-LDA (approximate distributed LDA, Newman et al.)
+# Documents are sharded across workers, every worker samples its shard against its own copy of n_k_i/n_k taken at the
+# start of the sweep, and the copies are reconciled afterwards by adding up each worker's delta. n_j_k, n_j and
+# topic_ids are only ever touched by the worker owning the document, so they need no copies.
+
+@contextmanager
+def numba_threads(n_workers):
+    # caps the threads of the prange loops run inside the block, None uses all of them
+    prev_threads = numba.get_num_threads()
+    if n_workers is not None:
+        numba.set_num_threads(max(1, min(n_workers, numba.config.NUMBA_NUM_THREADS)))
+    try:
+        yield
+    finally:
+        numba.set_num_threads(prev_threads)
+
+def shard_documents(doc_offsets, n_workers):
+    """
+        Splits the documents into n_workers contiguous shards holding roughly the same number of tokens.
+
+        :return: An int64 array of length n_workers+1, shard w covers the documents [bounds[w], bounds[w+1]).
+    """
+    token_bounds = np.linspace(0, doc_offsets[-1], n_workers + 1)
+    shard_bounds = np.searchsorted(doc_offsets, token_bounds).astype(np.int64)
+    shard_bounds[0], shard_bounds[-1] = 0, len(doc_offsets) - 1
+    return shard_bounds
+
+@jit(nopython=True, parallel=True)
+def adlda_gibbs_sampling(num_iterations, token_ids, doc_offsets, n_k_i, n_k, n_j_k, n_j, topic_ids, K, alpha, beta, V, shard_bounds, sweep_seeds):
+    n_workers = len(shard_bounds) - 1
+    local_n_k_i = np.empty((n_workers, K, V), dtype=n_k_i.dtype)
+    local_n_k = np.empty((n_workers, K), dtype=n_k.dtype)
+
+    for it in range(num_iterations):
+        for w in prange(n_workers):
+            # numba threads have their own random states, seeding per (sweep, shard) makes the draws
+            # independent of which thread ends up running which shard
+            np.random.seed(sweep_seeds[it, w])
+            local_n_k_i[w] = n_k_i
+            local_n_k[w] = n_k
+            gibbs_sweep(shard_bounds[w], shard_bounds[w + 1], token_ids, doc_offsets, local_n_k_i[w], local_n_k[w], n_j_k, n_j, topic_ids, K, alpha, beta, V)
+
+        # reconcile: global + sum of the workers' deltas = sum of the local copies - (n_workers - 1) * global
+        for k in prange(K):
+            for word_idx in range(V):
+                total = 0
+                for w in range(n_workers):
+                    total += local_n_k_i[w, k, word_idx]
+                n_k_i[k, word_idx] = total - (n_workers - 1) * n_k_i[k, word_idx]
+            total = 0
+            for w in range(n_workers):
+                total += local_n_k[w, k]
+            n_k[k] = total - (n_workers - 1) * n_k[k]
+
+    return n_k_i, n_k, n_j_k, n_j, topic_ids
+
+# Alias-table sampler (AliasLDA / LightLDA style)
+# The dense sampler above pays O(K) per token to build p_topic. Here the full conditional is split into
+#   doc proposal  q_d(k) ~ n_j_k[d, k] + alpha                      -> O(1): pick the topic of a random token of the doc
+#   word proposal q_w(k) ~ (n_k_i[k, w] + beta) / (n_k[k] + V*beta) -> O(1): draw from a (stale) Walker alias table
+# and the two proposals are alternated as Metropolis-Hastings steps, each accepted against the exact conditional.
+# The alias table of a word is rebuilt after it served `staleness` draws, so the O(K) rebuild is amortized to O(1).
+
+@jit(nopython=True)
+def build_alias_table(weights, prob, alias, small, large):
+    """
+        Builds a Walker alias table (Vose's method) for the unnormalized weights in place.
+
+            @ weights: Unnormalized probabilities of the K outcomes.
+            @ prob, alias: Output arrays of length K holding the acceptance probability and the alias of each bucket.
+            @ small, large: Preallocated int32 scratch arrays of length K.
+    """
+    K = weights.shape[0]
+    total = 0.0
+    for k in range(K):
+        total += weights[k]
+    n_small, n_large = 0, 0
+    for k in range(K):
+        prob[k] = weights[k] * K / total
+        if prob[k] < 1.0:
+            small[n_small] = k
+            n_small += 1
+        else:
+            large[n_large] = k
+            n_large += 1
+    while n_small > 0 and n_large > 0:
+        n_small -= 1
+        s = small[n_small]
+        l = large[n_large - 1]
+        alias[s] = l
+        prob[l] = prob[l] + prob[s] - 1.0
+        if prob[l] < 1.0:
+            small[n_small] = l
+            n_small += 1
+            n_large -= 1
+    # leftovers are only off from 1 by rounding errors
+    for i in range(n_large):
+        prob[large[i]] = 1.0
+    for i in range(n_small):
+        prob[small[i]] = 1.0
+
+@jit(nopython=True)
+def sample_alias_table(prob, alias):
+    K = prob.shape[0]
+    k = np.random.randint(0, K)
+    if np.random.random() < prob[k]:
+        return k
+    return alias[k]
+
+@jit(nopython=True)
+def rebuild_word_alias_table(word_idx, n_k_i, n_k, beta, V, word_q, word_prob, word_alias, small, large):
+    # Snapshot of the word proposal; word_q keeps the (normalized) probabilities the table was built with
+    # since the MH acceptance has to use the proposal that was actually drawn from, not the live counts
+    K = n_k.shape[0]
+    total = 0.0
+    for k in range(K):
+        word_q[word_idx, k] = (n_k_i[k, word_idx] + beta) / (n_k[k] + V * beta)
+        total += word_q[word_idx, k]
+    for k in range(K):
+        word_q[word_idx, k] /= total
+    build_alias_table(word_q[word_idx], word_prob[word_idx], word_alias[word_idx], small, large)
+
+@jit(nopython=True)
+def alias_gibbs_sampling(num_iterations, token_ids, doc_offsets, n_k_i, n_k, n_j_k, n_j, topic_ids, K, alpha, beta, V, mh_steps, staleness):
+    word_q = np.zeros((V, K), dtype=np.float64)
+    word_prob = np.zeros((V, K), dtype=np.float64)
+    word_alias = np.zeros((V, K), dtype=np.int32)
+    # every table starts out stale so it is built on the first draw
+    word_draws = np.full(V, staleness, dtype=np.int64)
+    small = np.zeros(K, dtype=np.int32)
+    large = np.zeros(K, dtype=np.int32)
+    V_beta = V * beta
+    K_alpha = K * alpha
+    D = len(doc_offsets) - 1
+
+    for _ in range(num_iterations):
+        for d in range(D):
+            doc_start = doc_offsets[d]
+            doc_len = doc_offsets[d + 1] - doc_start
+            for pos in range(doc_start, doc_start + doc_len):
+                word_idx = token_ids[pos]
+                old_topic = topic_ids[pos]
+
+                n_k_i[old_topic, word_idx] -= 1
+                n_k[old_topic] -= 1
+                n_j_k[d, old_topic] -= 1
+                n_j[d] -= 1
+
+                topic = old_topic
+                for step in range(mh_steps):
+                    if step % 2 == 0:
+                        # word proposal from the (possibly stale) alias table
+                        if word_draws[word_idx] >= staleness:
+                            rebuild_word_alias_table(word_idx, n_k_i, n_k, beta, V, word_q, word_prob, word_alias, small, large)
+                            word_draws[word_idx] = 0
+                        new_topic = sample_alias_table(word_prob[word_idx], word_alias[word_idx])
+                        word_draws[word_idx] += 1
+                        if new_topic == topic:
+                            continue
+                        # pi = p(t) q_w(s) / (p(s) q_w(t))
+                        accept = ((n_j_k[d, new_topic] + alpha) * (n_k_i[new_topic, word_idx] + beta) * (n_k[topic] + V_beta) * word_q[word_idx, topic]) \
+                            / ((n_j_k[d, topic] + alpha) * (n_k_i[topic, word_idx] + beta) * (n_k[new_topic] + V_beta) * word_q[word_idx, new_topic])
+                    else:
+                        # doc proposal: topic of a random token of the doc or uniform, where position pos counts
+                        # as the current state so that q_d(k | s) ~ n_j_k[d, k] + [k == s] + alpha
+                        u = np.random.random() * (doc_len + K_alpha)
+                        if u < doc_len:
+                            j = doc_start + int(u)
+                            new_topic = topic if j == pos else topic_ids[j]
+                        else:
+                            new_topic = np.random.randint(0, K)
+                        if new_topic == topic:
+                            continue
+                        # pi = p(t) q_d(s | t) / (p(s) q_d(t | s)), the doc terms cancel out
+                        accept = ((n_k_i[new_topic, word_idx] + beta) * (n_k[topic] + V_beta)) \
+                            / ((n_k_i[topic, word_idx] + beta) * (n_k[new_topic] + V_beta))
+                    if accept >= 1.0 or np.random.random() < accept:
+                        topic = new_topic
+
+                n_k_i[topic, word_idx] += 1
+                n_k[topic] += 1
+                n_j_k[d, topic] += 1
+                n_j[d] += 1
+
+                topic_ids[pos] = topic
+
+    return n_k_i, n_k, n_j_k, n_j, topic_ids
+
+def estimate_parameters(lda, n_k_i, n_k, n_j_k, n_j):
+    lda["theta"] = (n_j_k + lda["alpha"]) / (n_j[:, np.newaxis] + lda["K"] * lda["alpha"])
+    lda["phi"] = (n_k_i + lda["beta"]) / (n_k[:, np.newaxis] + len(lda["vocabulary"]) * lda["beta"])
+
+def run_sampler(sampler, num_iterations, token_ids, doc_offsets, n_k_i, n_k, n_j_k, n_j, topic_ids, K, alpha, beta, V, mh_steps=2, staleness=None, n_workers=1, seed=None,
+                backend="threads", sync_interval=1, pool_sampler=None):
+    """
+        Dispatches the Gibbs sweeps to the chosen sampler kernel.
+
+            @ sampler: "dense" for the exact O(K) per token sampler, "alias" for the Metropolis-Hastings alias-table sampler.
+            @ mh_steps: Number of alternating word/doc proposals per token for the alias sampler, more steps mix faster per sweep
+                        at a higher cost per token. Defaults to 2.
+            @ staleness: Number of draws an alias table serves before being rebuilt. Defaults to K.
+            @ n_workers: Number of document shards sampled in parallel with AD-LDA, 1 runs the serial kernel. Defaults to 1.
+            @ seed: Seed of the per sweep and shard random streams of the parallel sampler. Defaults to None.
+            @ backend: "threads" runs the shards as Numba prange threads, "processes" in a multiprocessing pool over shared
+                       memory (see lda_distributed). Defaults to "threads".
+            @ sync_interval: Number of sweeps between two merges of the global counts for the "processes" backend. Defaults to 1.
+            @ pool_sampler: lda_distributed.ProcessPoolSampler to run the "processes" backend in, a pool is started for
+                            this call only if None. Defaults to None.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+    if n_workers > 1:
+        if sampler != "dense":
+            raise ValueError(f"n_workers > 1 is only supported by the dense sampler, got sampler={sampler!r}")
+        if backend == "processes":
+            if pool_sampler is not None:
+                return pool_sampler.sample(num_iterations, n_k_i, n_k, n_j_k, n_j, topic_ids, seed, sync_interval)
+            from lda_distributed import process_pool_sampling
+            return process_pool_sampling(num_iterations, token_ids, doc_offsets, n_k_i, n_k, n_j_k, n_j, topic_ids, K, alpha, beta, V, n_workers, seed, sync_interval)
+        shard_bounds = shard_documents(doc_offsets, n_workers)
+        sweep_seeds = np.random.default_rng(seed).integers(0, 2**31 - 1, size=(num_iterations, n_workers))
+        with numba_threads(n_workers):
+            return adlda_gibbs_sampling(num_iterations, token_ids, doc_offsets, n_k_i, n_k, n_j_k, n_j, topic_ids, K, alpha, beta, V, shard_bounds, sweep_seeds)
+    if sampler == "dense":
+        return gibbs_sampling(num_iterations, token_ids, doc_offsets, n_k_i, n_k, n_j_k, n_j, topic_ids, K, alpha, beta, V)
+    if sampler == "alias":
+        if staleness is None: staleness = K
+        return alias_gibbs_sampling(num_iterations, token_ids, doc_offsets, n_k_i, n_k, n_j_k, n_j, topic_ids, K, alpha, beta, V, mh_steps, staleness)
+    raise ValueError(f"Unknown sampler {sampler!r}, expected one of {SAMPLERS}")
+
+# Checkpointing of long fits
+# Since the counts can be recomputed from the topic assignments, a checkpoint is just topic_ids (2 bytes per token) plus
+# a small state.json; the corpus is written once when the run starts. The sweeps run in blocks ending at every checkpoint
+# (see blocked_sampling) and every block reseeds the samplers from (base seed, first sweep of the block), so the random state at a checkpoint is
+# fully described by two integers and a resumed fit draws exactly what the uninterrupted fit would have drawn.
+
+CHECKPOINT_STATE = "state.json"
+
+def checkpoint_seed(base_seed, sweep):
+    return int(np.random.default_rng((base_seed, sweep)).integers(0, 2**31 - 1))
+
+def write_checkpoint(checkpoint_dir, topic_ids, state):
+    """
+        Atomically writes the topic assignments and the sampler state of a checkpoint.
+        The assignments go to a new file and state.json is only pointed at it once it is complete,
+        so a crash in the middle of a write leaves the previous checkpoint intact.
+    """
+    file_name = f"topic_ids-{state['sweep']}.npy"
+    tmp_path = os.path.join(checkpoint_dir, file_name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, topic_ids)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(checkpoint_dir, file_name))
+
+    state = dict(state, topic_ids_file=file_name)
+    tmp_path = os.path.join(checkpoint_dir, CHECKPOINT_STATE + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(checkpoint_dir, CHECKPOINT_STATE))
+
+    # the assignments of older checkpoints are not referenced anymore
+    for old_file in os.listdir(checkpoint_dir):
+        if old_file.startswith("topic_ids-") and old_file != file_name:
+            os.remove(os.path.join(checkpoint_dir, old_file))
+
+def read_checkpoint(checkpoint_dir):
+    # returns the state of the last complete checkpoint, None if there is none yet
+    state_path = os.path.join(checkpoint_dir, CHECKPOINT_STATE)
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path) as f:
+        return json.load(f)
+
+# Convergence monitoring
+# The collapsed joint log-likelihood log p(w, z) only needs the count matrices (Griffiths & Steyvers, 2004):
+#   log p(w|z) = K * (lgamma(V*beta) - V * lgamma(beta)) + sum_k [sum_w lgamma(n_k_i[k, w] + beta) - lgamma(n_k[k] + V*beta)]
+#   log p(z)   = D * (lgamma(K*alpha) - K * lgamma(alpha)) + sum_d [sum_k lgamma(n_j_k[d, k] + alpha) - lgamma(n_j[d] + K*alpha)]
+# which are a handful of vectorized gammaln calls over K x V and D x K, far cheaper than a sweep.
+
+def word_log_likelihood(n_k_i, n_k, beta):
+    K, V = n_k_i.shape
+    return K * (gammaln(V * beta) - V * gammaln(beta)) + np.sum(gammaln(n_k_i + beta)) - np.sum(gammaln(n_k + V * beta))
+
+def log_likelihood(n_k_i, n_k, n_j_k, n_j, alpha, beta):
+    """
+        Collapsed joint log-likelihood log p(w, z) of the corpus under the current topic assignments.
+    """
+    D, K = n_j_k.shape
+    topic_ll = D * (gammaln(K * alpha) - K * gammaln(alpha)) + np.sum(gammaln(n_j_k + alpha)) - np.sum(gammaln(n_j + K * alpha))
+    return word_log_likelihood(n_k_i, n_k, beta) + topic_ll
+
+def perplexity(n_k_i, n_k, beta):
+    # per token perplexity of the words given the topic assignments, exp(-log p(w|z) / N)
+    return np.exp(-word_log_likelihood(n_k_i, n_k, beta) / np.sum(n_k))
+
+def has_converged(history, tol, patience):
+    # the Gibbs chain keeps the log-likelihood fluctuating around its plateau, so compare the mean of the last `patience`
+    # evaluations with the mean of the `patience` before them: converged once it stopped improving by more than tol relative
+    if len(history) < 2 * patience:
+        return False
+    ll = np.array([value for _, value in history[-2 * patience:]])
+    prev_mean, last_mean = ll[:patience].mean(), ll[patience:].mean()
+    return bool(last_mean - prev_mean < tol * abs(prev_mean))
+
+def blocked_sampling(sampler, num_iterations, token_ids, doc_offsets, K, alpha, beta, V, mh_steps=2, staleness=None, n_workers=1, seed=None, backend="threads",
+                     sync_interval=1, checkpoint_dir=None, checkpoint_every=100, resume=False, eval_every=None, tol=1e-4, patience=3, verbose=False):
+    """
+        Runs run_sampler in blocks of sweeps, writing a checkpoint and/or evaluating the log-likelihood between blocks.
+        A block ends every checkpoint_every sweeps if checkpoint_dir is set and every eval_every sweeps if eval_every is set.
+
+            @ checkpoint_dir: Directory of the checkpoint files, no checkpoints are written if None. Defaults to None.
+            @ checkpoint_every: Number of sweeps between two checkpoints, a resumed run keeps the value it was started with.
+            @ resume: Continue from the checkpoint in checkpoint_dir if there is one, otherwise start over. A fresh run
+                      overwrites any checkpoint there.
+            @ eval_every: Number of sweeps between two evaluations of the log-likelihood, None disables the monitoring. Defaults to None.
+            @ tol: Relative improvement of the log-likelihood under which it counts as plateaued. Defaults to 1e-4.
+            @ patience: Number of evaluations averaged on either side of the plateau test. Defaults to 3.
+            @ verbose: Print the log-likelihood and perplexity at every evaluation. Defaults to False.
+
+        :return: The updated n_k_i, n_k, n_j_k, n_j, topic_ids and the list of (sweep, log-likelihood) evaluations.
+    """
+    D = len(doc_offsets) - 1
+    # everything that shapes the random draws, a checkpoint can only be resumed with the same values
+    config = {"K": K, "alpha": alpha, "beta": beta, "V": V, "sampler": sampler, "mh_steps": mh_steps, "staleness": staleness,
+              "n_workers": n_workers, "backend": backend, "sync_interval": sync_interval, "eval_every": eval_every}
+    state = read_checkpoint(checkpoint_dir) if checkpoint_dir is not None and resume else None
+
+    if state is not None:
+        mismatched = [key for key in config if state["config"].get(key) != config[key]]
+        if mismatched:
+            raise ValueError(f"Cannot resume from {checkpoint_dir}, the checkpoint was written with different {', '.join(mismatched)}")
+        saved_token_ids, saved_doc_offsets = load_corpus(checkpoint_dir)
+        if not (np.array_equal(saved_token_ids, token_ids) and np.array_equal(saved_doc_offsets, doc_offsets)):
+            raise ValueError(f"Cannot resume from {checkpoint_dir}, the checkpoint was written for different documents")
+        topic_ids = np.load(os.path.join(checkpoint_dir, state["topic_ids_file"]))
+        n_k_i, n_k, n_j_k, n_j, topic_ids = count_topic_assignments(K, D, V, token_ids, doc_offsets, topic_ids)
+    else:
+        base_seed = seed if seed is not None else int(np.random.default_rng().integers(0, 2**31 - 1))
+        set_seed(base_seed)
+        n_k_i, n_k, n_j_k, n_j, topic_ids = initialize_count_matrices(K, D, V, token_ids, doc_offsets)
+        state = {"config": config, "base_seed": base_seed, "checkpoint_every": checkpoint_every, "sweep": 0, "log_likelihood": []}
+        if checkpoint_dir is not None:
+            save_corpus(checkpoint_dir, token_ids, doc_offsets)
+            write_checkpoint(checkpoint_dir, topic_ids, state)
+
+    history = state.setdefault("log_likelihood", [])
+    block_sizes = [size for size in (state["checkpoint_every"] if checkpoint_dir is not None else None, eval_every) if size]
+    # the worker pool of the "processes" backend is started once and samples every block
+    pool_sampler = None
+    if backend == "processes" and n_workers > 1 and state["sweep"] < num_iterations:
+        from lda_distributed import ProcessPoolSampler
+        pool_sampler = ProcessPoolSampler(token_ids, doc_offsets, K, alpha, beta, V, n_workers)
+    with pool_sampler if pool_sampler is not None else nullcontext():
+        while state["sweep"] < num_iterations and not (eval_every and has_converged(history, tol, patience)):
+            sweep = state["sweep"]
+            block_end = min([num_iterations] + [(sweep // size + 1) * size for size in block_sizes])
+            block_seed = checkpoint_seed(state["base_seed"], sweep)
+            set_seed(block_seed)
+            n_k_i, n_k, n_j_k, n_j, topic_ids = run_sampler(sampler, block_end - sweep, token_ids, doc_offsets, n_k_i, n_k, n_j_k, n_j, topic_ids, K, alpha, beta, V, mh_steps,
+                                                               staleness, n_workers, block_seed, backend, sync_interval, pool_sampler)
+            state["sweep"] = block_end
+
+            if eval_every and (block_end % eval_every == 0 or block_end == num_iterations):
+                history.append((block_end, float(log_likelihood(n_k_i, n_k, n_j_k, n_j, alpha, beta))))
+                if verbose:
+                    print(f"Sweep {block_end}: log-likelihood {history[-1][1]:.1f}, perplexity {perplexity(n_k_i, n_k, beta):.1f}")
+            if checkpoint_dir is not None:
+                write_checkpoint(checkpoint_dir, topic_ids, state)
+
+    if verbose and state["sweep"] < num_iterations:
+        print(f"Converged after {state['sweep']} of {num_iterations} sweeps")
+    return n_k_i, n_k, n_j_k, n_j, topic_ids, history
+
+def fit_lda(lda, documents, sampler="dense", mh_steps=2, staleness=None, n_workers=1, seed=None, backend="threads", sync_interval=1,
+            checkpoint_dir=None, checkpoint_every=100, resume=False, eval_every=None, tol=1e-4, patience=3, verbose=False, min_df=1, max_df=1.0,
+            max_vocab_size=None):
+    """
+        Fits the LDA model on the tokenized documents (or an encoded lda_vocabulary.Corpus) with collapsed Gibbs sampling,
+        storing theta, phi and the vocabulary in lda.
+
+            @ sampler: "dense" or "alias", see run_sampler. Defaults to "dense".
+            @ n_workers: Number of cores to shard the documents over (AD-LDA), only for the dense sampler. Defaults to 1.
+            @ seed: Random seed, a fit is reproducible for a fixed seed and n_workers. Defaults to None.
+            @ backend: "threads" (Numba prange) or "processes" (multiprocessing pool), see run_sampler. Defaults to "threads".
+            @ sync_interval: Sweeps between merges of the global counts for the "processes" backend. Defaults to 1.
+            @ checkpoint_dir: Directory to checkpoint the sampler state to, no checkpoints are written if None. Defaults to None.
+            @ checkpoint_every: Number of sweeps between two checkpoints. Defaults to 100.
+            @ resume: Continue from the last checkpoint in checkpoint_dir, if any. The resumed fit ends up bit-for-bit where the
+                      uninterrupted one would have, and lda["num_iterations"] may be raised to extend a finished run. Defaults to False.
+            @ eval_every: Evaluate the log-likelihood every eval_every sweeps and stop early once it plateaus, None runs all
+                          num_iterations sweeps unmonitored. Defaults to None.
+            @ tol: Relative improvement of the mean log-likelihood of the last `patience` evaluations over the `patience` before
+                   them under which the sampling stops. Defaults to 1e-4.
+            @ patience: Number of evaluations averaged on either side of the plateau test. Defaults to 3.
+            @ verbose: Print the log-likelihood and perplexity at every evaluation. Defaults to False.
+            @ min_df, max_df, max_vocab_size: Vocabulary pruning, see lda_vocabulary.build_corpus. Pruning rare words (and
+                                              for bigrams the rare pairs) shrinks V, i.e. n_k_i and phi. Defaults keep all words.
+    """
+    if lda["K"] > MAX_TOPICS:
+        raise ValueError(f"K={lda['K']} does not fit the uint16 topic assignments, at most {MAX_TOPICS} topics are supported")
+    lda["vocabulary"], token_ids, doc_offsets = build_corpus(documents, min_df, max_df, max_vocab_size)
+    K, V = lda["K"], len(lda["vocabulary"])
+    if checkpoint_dir is not None or eval_every is not None:
+        n_k_i, n_k, n_j_k, n_j, topic_ids, history = blocked_sampling(sampler, lda["num_iterations"], token_ids, doc_offsets, K, lda["alpha"], lda["beta"], V, mh_steps, staleness,
+                                                                      n_workers, seed, backend, sync_interval, checkpoint_dir, checkpoint_every, resume, eval_every, tol,
+                                                                      patience, verbose)
+        # (sweep, log-likelihood) of every evaluation, kept as an array so that save_lda stores it along with the model
+        lda["log_likelihood"] = np.array(history, dtype=np.float64).reshape(-1, 2)
+    else:
+        if seed is not None: set_seed(seed)
+        n_k_i, n_k, n_j_k, n_j, topic_ids = initialize_count_matrices(K, len(doc_offsets) - 1, V, token_ids, doc_offsets)
+        n_k_i, n_k, n_j_k, n_j, topic_ids = run_sampler(sampler, lda["num_iterations"], token_ids, doc_offsets, n_k_i, n_k, n_j_k, n_j, topic_ids, K, lda["alpha"], lda["beta"], V, mh_steps, staleness, n_workers, seed,
+                                                           backend, sync_interval)
+    estimate_parameters(lda, n_k_i, n_k, n_j_k, n_j)
+
+@jit(nopython=True)
+def transform_lda_helper(theta, token_ids, doc_offsets, phi, alpha, K):
+    for d in range(len(doc_offsets) - 1):
+        topic_counts = np.zeros(K, dtype=np.int32)
+        for pos in range(doc_offsets[d], doc_offsets[d + 1]):
+            topic_probs = phi[:, token_ids[pos]].copy()
+            topic_probs /= np.sum(topic_probs)
+            topic = np.random.multinomial(1, topic_probs).argmax()
+            topic_counts[topic] += 1
+        theta[d] = (topic_counts + alpha) / (doc_offsets[d + 1] - doc_offsets[d] + K * alpha)
+    return theta
+
+def transform_lda(lda, documents):
+    token_ids, doc_offsets = encode_documents(documents, lda["vocabulary"])
+    D = len(doc_offsets) - 1
+    theta = np.zeros((D, lda["K"]))
+    theta = transform_lda_helper(theta, token_ids, doc_offsets, lda["phi"], lda["alpha"], lda["K"])
+    return theta
+
+# Fold-in inference: Gibbs sampling of the document side only, p(z = k) ~ phi[k, w] * (n_dk + alpha) with phi frozen,
+# so documents are independent of each other and are sampled in parallel
+
+@jit(nopython=True, parallel=True)
+def fold_in_gibbs_sampling(token_ids, doc_offsets, phi, alpha, n_iter, burn_in, doc_seeds):
+    K = phi.shape[0]
+    D = len(doc_offsets) - 1
+    theta = np.zeros((D, K))
+    for d in prange(D):
+        np.random.seed(doc_seeds[d])
+        doc_start = doc_offsets[d]
+        doc_len = doc_offsets[d + 1] - doc_start
+        n_dk = np.zeros(K)
+        n_dk_sum = np.zeros(K)
+        p_topic = np.empty(K)
+        topics = np.empty(doc_len, dtype=np.int64)
+
+        for sweep in range(n_iter + 1):
+            for i in range(doc_len):
+                word_idx = token_ids[doc_start + i]
+                # sweep 0 initializes from phi alone, the following sweeps resample against the doc counts
+                if sweep > 0:
+                    n_dk[topics[i]] -= 1
+                total = 0.0
+                for k in range(K):
+                    total += phi[k, word_idx] * (n_dk[k] + alpha)
+                    p_topic[k] = total
+                u = np.random.random() * total
+                new_topic = 0
+                while new_topic < K - 1 and p_topic[new_topic] <= u:
+                    new_topic += 1
+                topics[i] = new_topic
+                n_dk[new_topic] += 1
+            if sweep > burn_in:
+                n_dk_sum += n_dk
+
+        # average of the counts over the post burn-in sweeps
+        theta[d] = (n_dk_sum / (n_iter - burn_in) + alpha) / (doc_len + K * alpha)
+    return theta
+
+def transform(lda, documents, n_iter=50, burn_in=None, n_workers=None, seed=None, word_to_index=None):
+    """
+        Infers theta of unseen documents against the frozen phi of a trained model, without refitting it.
+
+            @ lda: Trained model dict (phi and vocabulary), not modified.
+            @ documents: Tokenized documents, out-of-vocabulary words are ignored.
+            @ n_iter: Number of fold-in Gibbs sweeps per document. Defaults to 50.
+            @ burn_in: Number of initial sweeps left out of the theta estimate. Defaults to n_iter // 2.
+            @ n_workers: Number of cores to spread the documents over, all Numba threads if None. Defaults to None.
+            @ seed: Random seed, results are reproducible for a fixed seed whatever n_workers. Defaults to None.
+            @ word_to_index: Precomputed word -> id dict of lda["vocabulary"], to spare the O(V) dict of every call when
+                             transforming many small batches; built from the vocabulary if None. Defaults to None.
+
+        :return: theta of the documents (len(documents) x K).
+    """
+    if burn_in is None: burn_in = n_iter // 2
+    if not 0 <= burn_in < n_iter:
+        raise ValueError(f"burn_in must be in [0, n_iter), got burn_in={burn_in} and n_iter={n_iter}")
+    # the word -> id dict is not cached on the model, where it would go stale once the model is refitted
+    token_ids, doc_offsets = encode_documents(documents, lda["vocabulary"], word_to_index)
+    doc_seeds = np.random.default_rng(seed).integers(0, 2**31 - 1, size=len(doc_offsets) - 1)
+    with numba_threads(n_workers):
+        return fold_in_gibbs_sampling(token_ids, doc_offsets, np.asarray(lda["phi"], dtype=np.float64), float(lda["alpha"]), n_iter, burn_in, doc_seeds)
+
+def get_topics(lda, top_words=10):
+    for topic_idx in range(lda["K"]):
+        print(f"Topic {topic_idx+1}:")
+        word_probs = lda["phi"][topic_idx]
+        top_word_indices = word_probs.argsort()[-top_words:][::-1]
+        top_words_list = [lda["vocabulary"][idx] for idx in top_word_indices]
+        print(f"  Top words: {', '.join(top_words_list)}\n")
+
+# On-disk model format
+# A model is a directory holding meta.json (format version, scalar settings and an index of the arrays), one raw .npy
+# file per array of the model dict (theta, phi, ...) and of the optional counts, and the vocabulary as the
+# concatenated UTF-8 bytes of all words (vocabulary.bin) plus their byte offsets (vocabulary_offsets.npy).
+# Every file can be np.memmap'd, so loading is zero-copy and processes loading the same model share its pages.
+
+MODEL_FORMAT_VERSION = 1
+
+class MappedVocabulary(Sequence):
+    """
+        Read-only list-like view of a vocabulary stored as concatenated UTF-8 bytes and offsets,
+        words are only decoded when accessed.
+    """
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0: idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("vocabulary index out of range")
+        return bytes(self.data[self.offsets[idx]:self.offsets[idx + 1]]).decode("utf-8")
+
+    def __iter__(self):
+        data = bytes(self.data)
+        for start, end in zip(self.offsets[:-1].tolist(), self.offsets[1:].tolist()):
+            yield data[start:end].decode("utf-8")
+
+def save_lda(lda, model_dir, counts=None):
+    """
+        Saves the model dict to a directory in the memory-mappable format, replacing any previous model there atomically.
+
+            @ lda: Model dict, its numpy arrays, vocabulary and JSON serializable scalars are saved, anything else is skipped.
+            @ model_dir: Directory to save the model to.
+            @ counts: Optional dict of extra arrays to save along, e.g. {"n_k_i": n_k_i, "n_k": n_k}. Defaults to None.
+    """
+    model_dir = os.path.abspath(model_dir)
+    tmp_dir = f"{model_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    meta = {"format_version": MODEL_FORMAT_VERSION, "params": {}, "arrays": [], "counts": []}
+    for key, value in lda.items():
+        if key == "vocabulary":
+            continue
+        if isinstance(value, np.ndarray):
+            np.save(os.path.join(tmp_dir, f"{key}.npy"), value)
+            meta["arrays"].append(key)
+        elif value is None or isinstance(value, (bool, int, float, str)):
+            meta["params"][key] = value
+        elif isinstance(value, np.generic):
+            meta["params"][key] = value.item()
+    for key, value in (counts or {}).items():
+        np.save(os.path.join(tmp_dir, f"count_{key}.npy"), np.asarray(value))
+        meta["counts"].append(key)
+
+    vocabulary = lda.get("vocabulary")
+    meta["has_vocabulary"] = vocabulary is not None
+    if vocabulary is not None:
+        encoded = [word.encode("utf-8") for word in vocabulary]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(word) for word in encoded], out=offsets[1:])
+        with open(os.path.join(tmp_dir, "vocabulary.bin"), "wb") as f:
+            f.write(b"".join(encoded))
+        np.save(os.path.join(tmp_dir, "vocabulary_offsets.npy"), offsets)
+
+    # meta.json is written last, a directory without it is an incomplete save
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=1)
+
+    # swap the finished directory in, readers see either the old or the new model
+    old_dir = None
+    if os.path.exists(model_dir):
+        old_dir = f"{model_dir}.old-{os.getpid()}"
+        os.replace(model_dir, old_dir)
+    os.replace(tmp_dir, model_dir)
+    if old_dir is not None:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+def load_lda(model_dir, mmap_mode="r"):
+    """
+        Loads a model saved by save_lda.
+
+            @ model_dir: Directory the model was saved to.
+            @ mmap_mode: Mode np.memmap opens the arrays with, "r" is zero-copy and read-only, None reads them into memory.
+                         Defaults to "r".
+
+        :return: The model dict, with the saved counts (if any) under lda["counts"].
+    """
+    with open(os.path.join(model_dir, "meta.json")) as f:
+        meta = json.load(f)
+    if meta.get("format_version", 0) > MODEL_FORMAT_VERSION:
+        raise ValueError(f"Model format version {meta.get('format_version')} is newer than the supported version {MODEL_FORMAT_VERSION}")
+
+    lda = dict(meta["params"])
+    for key in meta["arrays"]:
+        lda[key] = np.load(os.path.join(model_dir, f"{key}.npy"), mmap_mode=mmap_mode)
+    if meta["counts"]:
+        lda["counts"] = {key: np.load(os.path.join(model_dir, f"count_{key}.npy"), mmap_mode=mmap_mode) for key in meta["counts"]}
+
+    lda["vocabulary"] = None
+    if meta["has_vocabulary"]:
+        offsets = np.load(os.path.join(model_dir, "vocabulary_offsets.npy"), mmap_mode=mmap_mode)
+        vocab_path = os.path.join(model_dir, "vocabulary.bin")
+        if mmap_mode is not None and offsets[-1] > 0:
+            data = np.memmap(vocab_path, dtype=np.uint8, mode="r")
+        else:
+            data = np.fromfile(vocab_path, dtype=np.uint8)
+        lda["vocabulary"] = MappedVocabulary(data, offsets)
+    return lda
+
+def benchmark_samplers(documents, K_values=(4, 8, 50, 200), num_iterations=20, alpha=0.1, beta=0.01, samplers=SAMPLERS):
+    """
+        Benchmarks the Gibbs sampler kernels on the same encoded corpus and reports their throughput.
+        Kernels are compiled on a 1-sweep warm up run first so that the timings exclude the JIT compilation.
+
+            @ documents: Tokenized documents, e.g. the output of process_words.
+            @ K_values: Numbers of topics to benchmark. Defaults to (4, 8, 50, 200).
+            @ num_iterations: Number of timed sweeps per run. Defaults to 20.
+
+        :return: A list of dicts with sampler, K, seconds and tokens_per_sec of each run.
+    """
+    vocabulary, token_ids, doc_offsets = build_corpus(documents)
+    V, D = len(vocabulary), len(doc_offsets) - 1
+    num_tokens = len(token_ids)
+    results = []
+    for K in K_values:
+        for sampler in samplers:
+            # warm up (compile) on fresh counts, then time on fresh counts again
+            run_sampler(sampler, 1, token_ids, doc_offsets, *initialize_count_matrices(K, D, V, token_ids, doc_offsets), K, alpha, beta, V)
+            counts = initialize_count_matrices(K, D, V, token_ids, doc_offsets)
+            st = time.time()
+            run_sampler(sampler, num_iterations, token_ids, doc_offsets, *counts, K, alpha, beta, V)
+            et = time.time()
+            results.append({
+                "sampler": sampler,
+                "K": K,
+                "seconds": et - st,
+                "tokens_per_sec": num_tokens * num_iterations / (et - st)
+            })
+            print(f"{sampler:>6} K={K:<4} {results[-1]['tokens_per_sec']:>14,.0f} tokens/sec")
+    return results
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+from lda_vocabulary import prune_corpus
+
+# N-grams on the encoded corpus
+# Instead of appending "w1 w2" strings to every tokenized document (process_words of the bigram notebook), the n-grams
+# are found on the int32 unigram ids of a Corpus: the pair of ids at every position is packed into one int64 key
+# (id1 * V + id2), and a trigram into (code of its first bigram) * V + id3, so keys never overflow whatever V is.
+# One np.unique over the keys gives every distinct n-gram with its count, which is scored by PMI against the unigram
+# counts, and only the n-grams passing the frequency and PMI thresholds become new words. The result is again the flat
+# corpus arrays the samplers consume, with a kept n-gram appended to its document like process_words does, so bigram
+# LDA costs about as much memory as unigram LDA instead of twice the tokens plus millions of rare n-gram strings.
+
+def find_ngrams(token_ids, doc_offsets, V, max_n=2):
+    """
+        Packs the n-grams (inside a document) of an encoded corpus into integer codes.
+
+        :return: A dict n -> (starts, codes, counts, components), starts the positions of the n-grams in token_ids,
+                 codes their index into counts (the number of occurrences of every distinct n-gram) and components the
+                 unigram ids of every distinct n-gram, one row each.
+    """
+    token_ids = np.asarray(token_ids, dtype=np.int64)
+    T = len(token_ids)
+    doc_of = np.repeat(np.arange(len(doc_offsets) - 1, dtype=np.int64), np.diff(doc_offsets))
+    # the code of the (n-1)-gram starting at every position, -1 where it does not fit in its document
+    codes = token_ids
+    components = np.arange(V, dtype=np.int64)[:, None]
+    ngrams = {}
+    for n in range(2, max_n + 1):
+        if T < n:
+            break
+        starts = np.flatnonzero(doc_of[:T - n + 1] == doc_of[n - 1:])
+        keys = codes[starts] * V + token_ids[starts + n - 1]
+        unique_keys, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        components = np.column_stack([components[unique_keys // V], unique_keys % V])
+        ngrams[n] = (starts, inverse, counts, components)
+        codes = np.full(T, -1, dtype=np.int64)
+        codes[starts] = inverse
+    return ngrams
+
+def pmi(counts, components, word_freq):
+    # log(p(w1 .. wn) / (p(w1) .. p(wn))), with all probabilities relative to the number of tokens
+    num_tokens = word_freq.sum()
+    n = components.shape[1]
+    return np.log(counts) + (n - 1) * np.log(num_tokens) - np.log(word_freq[components]).sum(axis=1)
+
+def score_ngrams(corpus, max_n=2, min_count=1):
+    """
+        The collocations of an encoded corpus, to choose the thresholds of add_ngrams.
+
+        :return: A DataFrame of ngram, n, count and pmi, sorted by decreasing pmi.
+    """
+    vocabulary = np.array(corpus.vocabulary, dtype=object)
+    word_freq = np.bincount(corpus.token_ids, minlength=len(vocabulary))
+    tables = []
+    for n, (_, _, counts, components) in find_ngrams(corpus.token_ids, corpus.doc_offsets, len(vocabulary), max_n).items():
+        frequent = counts >= min_count
+        counts, components = counts[frequent], components[frequent]
+        words = vocabulary[components]
+        tables.append(pd.DataFrame({"ngram": [" ".join(gram) for gram in words], "n": n, "count": counts,
+                                    "pmi": pmi(counts, components, word_freq)}))
+    if not tables:
+        return pd.DataFrame(columns=["ngram", "n", "count", "pmi"])
+    return pd.concat(tables, ignore_index=True).sort_values("pmi", ascending=False, kind="stable", ignore_index=True)
+
+def add_ngrams(corpus, max_n=2, min_count=5, min_pmi=1.0, max_ngrams=None, min_df=1, max_df=1.0, max_vocab_size=None):
+    """
+        Appends the collocations of every document to it as new words, on the encoded corpus.
+
+            @ corpus: Unigram Corpus, e.g. from text_preprocessing.preprocess_corpus. Prune it afterwards (min_df etc.
+                      below) rather than before, the words dropped by pruning would make their neighbours adjacent.
+            @ max_n: Longest n-gram, 2 for bigrams and 3 for bigrams and trigrams. Defaults to 2.
+            @ min_count: Keep the n-grams occurring at least this many times in the corpus. Defaults to 5.
+            @ min_pmi: Keep the n-grams whose PMI is at least this (natural log), None keeps all of them. Defaults to 1.0.
+            @ max_ngrams: Keep only this many n-grams with the highest PMI, None keeps all of them. Defaults to None.
+            @ min_df, max_df, max_vocab_size: Vocabulary pruning of the result, see lda_vocabulary.build_corpus.
+                                              Default to no pruning.
+
+        :return: A Corpus whose vocabulary holds the unigrams and the kept n-grams ("w1 w2"), every document being its
+                 unigrams followed by its kept n-grams in order, like process_words; with min_count=1 and min_pmi=None
+                 it is the Corpus of process_words' documents.
+    """
+    vocabulary = list(corpus.vocabulary)
+    token_ids = np.asarray(corpus.token_ids, dtype=np.int32)
+    doc_offsets = np.asarray(corpus.doc_offsets, dtype=np.int64)
+    V, D = len(vocabulary), len(doc_offsets) - 1
+    word_freq = np.bincount(token_ids, minlength=V)
+
+    ngrams = find_ngrams(token_ids, doc_offsets, V, max_n)
+    # score every distinct n-gram once and pick the ones to keep, over all n together for max_ngrams
+    levels, scores = [], []
+    for n, (starts, codes, counts, components) in ngrams.items():
+        candidates = np.flatnonzero(counts >= min_count)
+        levels.append((n, candidates))
+        scores.append(pmi(counts[candidates], components[candidates], word_freq))
+    scores = np.concatenate(scores) if scores else np.zeros(0)
+    selected = np.ones(len(scores), dtype=bool) if min_pmi is None else scores >= min_pmi
+    if max_ngrams is not None and selected.sum() > max_ngrams:
+        best = np.flatnonzero(selected)
+        best = best[np.argsort(-scores[best], kind="stable")[:max_ngrams]]
+        selected[:] = False
+        selected[best] = True
+
+    words = np.array(vocabulary, dtype=object)
+    doc_of = np.repeat(np.arange(D, dtype=np.int64), np.diff(doc_offsets))
+    new_ids, new_docs = [token_ids], [doc_of]
+    next_id, done = V, 0
+    for n, candidates in levels:
+        starts, codes, counts, components = ngrams[n]
+        kept = candidates[selected[done:done + len(candidates)]]
+        done += len(candidates)
+        # distinct n-gram -> new word id, -1 for the dropped ones
+        remap = np.full(len(counts), -1, dtype=np.int32)
+        remap[kept] = np.arange(next_id, next_id + len(kept), dtype=np.int32)
+        next_id += len(kept)
+        vocabulary.extend(" ".join(gram) for gram in words[components[kept]])
+        occurrences = remap[codes]
+        found = occurrences >= 0
+        new_ids.append(occurrences[found])
+        new_docs.append(doc_of[starts[found]])
+
+    # a stable sort by document keeps the unigrams first, then the n-grams of every n in their order in the document
+    all_docs = np.concatenate(new_docs)
+    order = np.argsort(all_docs, kind="stable")
+    offsets = np.zeros(D + 1, dtype=np.int64)
+    np.cumsum(np.bincount(all_docs, minlength=D), out=offsets[1:])
+    return prune_corpus(vocabulary, np.concatenate(new_ids)[order], offsets, min_df, max_df, max_vocab_size)
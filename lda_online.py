@@ -0,0 +1,150 @@
+import numpy as np
+from scipy.special import psi
+
+# Online variational Bayes for LDA (Hoffman, Blei & Bach, 2010)
+# Instead of refitting from scratch, the topic-word variational parameters lambda (K x V) are updated with a natural
+# gradient step from every mini-batch of documents:
+#   lambda <- (1 - rho_t) * lambda + rho_t * (beta + total_docs / batch_size * sstats),  rho_t = (tau0 + t) ** -kappa
+# so memory is bounded by the batch size and the model, not by the size of the corpus seen so far.
+# The vocabulary grows with the stream, the lambda columns of unseen words start at the prior beta.
+
+def initialize_online_lda(K, alpha, beta, tau0=1.0, kappa=0.7, seed=None):
+    """
+        Initializes an LDA model dict for online variational Bayes, with the same keys as lda_model.initialize_lda.
+
+            @ K: Number of topics.
+            @ alpha: Document-topic Dirichlet prior.
+            @ beta: Topic-word Dirichlet prior.
+            @ tau0: Delay that down-weights the first batches, must be >= 0. Defaults to 1.0.
+            @ kappa: Forgetting rate of the step size rho_t, in (0.5, 1] for convergence. Defaults to 0.7.
+            @ seed: Seed of the random initialization of lambda and gamma. Defaults to None.
+    """
+    lda = {
+        "K": K,
+        "alpha": alpha,
+        "theta": None,
+        "beta": beta,
+        "phi": None,
+        "num_iterations": 0,
+        "vocabulary": [],
+        "word_to_index": {},
+        "lambda": np.zeros((K, 0)),
+        "tau0": tau0,
+        "kappa": kappa,
+        "num_docs_seen": 0,
+        "rng": np.random.default_rng(seed)
+    }
+    return lda
+
+def dirichlet_expectation(x):
+    # E[log X] for X ~ Dir(x), row-wise for 2d inputs
+    if x.ndim == 1:
+        return psi(x) - psi(np.sum(x))
+    return psi(x) - psi(np.sum(x, axis=1))[:, np.newaxis]
+
+def extend_vocabulary(lda, batch):
+    # new words get lambda columns as if they had never been observed, i.e. at the prior
+    word_to_index = lda["word_to_index"]
+    new_words = []
+    for doc in batch:
+        for word in doc:
+            if word not in word_to_index:
+                word_to_index[word] = len(lda["vocabulary"]) + len(new_words)
+                new_words.append(word)
+    if new_words:
+        lda["vocabulary"].extend(new_words)
+        # a little noise breaks the symmetry between topics for words seen in the very first batch
+        new_cols = lda["beta"] + lda["rng"].gamma(100., 1. / 100., (lda["K"], len(new_words))) * (lda["num_iterations"] == 0)
+        lda["lambda"] = np.hstack([lda["lambda"], new_cols])
+
+def bag_of_words(doc, word_to_index):
+    ids, cts = np.unique(np.array([word_to_index[word] for word in doc if word in word_to_index], dtype=np.int64), return_counts=True)
+    return ids, cts.astype(np.float64)
+
+def e_step(lda, batch, max_iter=100, tol=1e-3):
+    """
+        Fits the per document variational parameters gamma of a batch against the current lambda.
+
+        :return: gamma (len(batch) x K) and the sufficient statistics (K x V) for the lambda update.
+    """
+    K, alpha = lda["K"], lda["alpha"]
+    expElogbeta = np.exp(dirichlet_expectation(lda["lambda"]))
+    gamma = lda["rng"].gamma(100., 1. / 100., (len(batch), K))
+    sstats = np.zeros_like(lda["lambda"])
+    for d, doc in enumerate(batch):
+        ids, cts = bag_of_words(doc, lda["word_to_index"])
+        if len(ids) == 0:
+            gamma[d] = alpha
+            continue
+        gamma_d = gamma[d]
+        expElogtheta_d = np.exp(dirichlet_expectation(gamma_d))
+        expElogbeta_d = expElogbeta[:, ids]
+        # phi_dwk ~ expElogtheta_dk * expElogbeta_kw is never materialized, only its normalizer phinorm
+        phinorm = expElogtheta_d @ expElogbeta_d + 1e-100
+        for _ in range(max_iter):
+            last_gamma = gamma_d
+            gamma_d = alpha + expElogtheta_d * ((cts / phinorm) @ expElogbeta_d.T)
+            expElogtheta_d = np.exp(dirichlet_expectation(gamma_d))
+            phinorm = expElogtheta_d @ expElogbeta_d + 1e-100
+            if np.mean(np.abs(gamma_d - last_gamma)) < tol:
+                break
+        gamma[d] = gamma_d
+        sstats[:, ids] += np.outer(expElogtheta_d, cts / phinorm)
+    sstats *= expElogbeta
+    return gamma, sstats
+
+def partial_fit(lda, batch, total_docs=None, max_iter=100, tol=1e-3):
+    """
+        Updates the topic-word parameters of an online LDA model with one mini-batch of tokenized documents.
+
+            @ lda: Model dict from initialize_online_lda, updated in place (lambda, phi, vocabulary).
+            @ batch: List of tokenized documents, e.g. a chunk of sent_to_words/process_words output.
+            @ total_docs: Size of the corpus the batch is drawn from, scales the batch statistics. Defaults to the number
+                          of documents seen so far including this batch.
+            @ max_iter: Maximum number of E-step iterations per document. Defaults to 100.
+            @ tol: Mean absolute change of gamma under which the E-step of a document stops. Defaults to 1e-3.
+
+        :return: theta of the batch documents (len(batch) x K).
+    """
+    batch = list(batch)
+    if not batch:
+        return np.zeros((0, lda["K"]))
+    # models loaded with lda_model.load_lda come with a read-only vocabulary and without the word index and random state
+    if not isinstance(lda["vocabulary"], list):
+        lda["vocabulary"] = list(lda["vocabulary"])
+    if "word_to_index" not in lda:
+        lda["word_to_index"] = {word: idx for idx, word in enumerate(lda["vocabulary"])}
+    if "rng" not in lda:
+        lda["rng"] = np.random.default_rng()
+    extend_vocabulary(lda, batch)
+    gamma, sstats = e_step(lda, batch, max_iter, tol)
+
+    lda["num_docs_seen"] += len(batch)
+    if total_docs is None: total_docs = lda["num_docs_seen"]
+    rho = (lda["tau0"] + lda["num_iterations"]) ** -lda["kappa"]
+    lda["lambda"] = (1 - rho) * lda["lambda"] + rho * (lda["beta"] + total_docs / len(batch) * sstats)
+    lda["num_iterations"] += 1
+    lda["phi"] = lda["lambda"] / lda["lambda"].sum(axis=1, keepdims=True)
+
+    return gamma / gamma.sum(axis=1, keepdims=True)
+
+def iter_batches(documents, batch_size):
+    # chunks any iterable of documents (e.g. the sent_to_words generator) into lists of batch_size
+    batch = []
+    for doc in documents:
+        batch.append(doc)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def fit_lda_online(lda, documents, batch_size=256, total_docs=None, max_iter=100, tol=1e-3):
+    """
+        Streams the documents through partial_fit in mini-batches and stores the theta of every document in lda.
+
+            @ documents: Iterable of tokenized documents, consumed once.
+            @ batch_size: Number of documents per update. Defaults to 256.
+    """
+    thetas = [partial_fit(lda, batch, total_docs, max_iter, tol) for batch in iter_batches(documents, batch_size)]
+    lda["theta"] = np.vstack(thetas) if thetas else np.zeros((0, lda["K"]))
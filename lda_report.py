@@ -0,0 +1,83 @@
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+import lda_model
+from lda_coherence import top_word_ids
+from lda_vocabulary import Corpus
+
+# Topic report of a fitted lda dict, for the plots of visualization.ipynb
+# Everything is computed on the model and corpus arrays: the top words of every topic with argpartition instead of
+# iterating over the rows of a V x K DataFrame, the corpus frequency of every word from the n_k_i counts (or one
+# bincount of the token ids) instead of a Counter over the flattened documents, and the dominant topic and length of
+# every document and the per topic histograms of the lengths with argmax and bincount. The tables are tidy (one row
+# per topic and word, per document, per topic and bin), so the WordCloud and bar plots only filter them by topic.
+
+TopicReport = namedtuple("TopicReport", ["keywords", "documents", "length_histogram"])
+
+def corpus_word_counts(lda, documents=None, counts=None):
+    """
+        Number of occurrences of every vocabulary word in the corpus.
+
+            @ documents: Tokenized documents or the encoded lda_vocabulary.Corpus the model was fitted on, used when there
+                         are no counts. Defaults to None.
+            @ counts: Dict with the n_k_i counts of the fit (as saved by save_lda), defaults to lda["counts"].
+
+        :return: An int64 array of length V.
+    """
+    counts = counts if counts is not None else lda.get("counts")
+    if counts is not None and "n_k_i" in counts:
+        return np.asarray(counts["n_k_i"]).sum(axis=0, dtype=np.int64)
+    if documents is None:
+        raise ValueError("Word counts need either the n_k_i counts of the fit or the documents")
+    token_ids = documents.token_ids if isinstance(documents, Corpus) else lda_model.encode_documents(documents, lda["vocabulary"])[0]
+    return np.bincount(token_ids, minlength=len(lda["vocabulary"])).astype(np.int64)
+
+def document_lengths(documents=None, counts=None, lda=None):
+    # tokens per document, from the n_j counts of the fit if there are some
+    counts = counts if counts is not None else (lda or {}).get("counts")
+    if counts is not None and "n_j" in counts:
+        return np.asarray(counts["n_j"], dtype=np.int64)
+    if isinstance(documents, Corpus):
+        return np.diff(documents.doc_offsets)
+    return np.fromiter(map(len, documents), np.int64, len(documents))
+
+def topic_report(lda, documents=None, counts=None, top_words=10, bins=50):
+    """
+        Builds the tables of the topic plots.
+
+            @ lda: Fitted model dict (phi, theta and vocabulary), e.g. from lda_model.fit_lda or load_lda.
+            @ documents: Tokenized documents or Corpus the model was fitted on, for the word counts and document lengths
+                         when counts does not have them. Defaults to None.
+            @ counts: Dict with n_k_i and/or n_j of the fit, defaults to lda["counts"].
+            @ top_words: Number of keywords per topic. Defaults to 10.
+            @ bins: Bins of the document length histograms, an int or the bin edges as for np.histogram. Defaults to 50.
+
+        :return: A TopicReport of three DataFrames:
+                 keywords: topic_id, rank, word, importance (phi) and word_count (in the corpus) of every keyword,
+                 documents: doc, topic (dominant), weight (its theta) and length of every document,
+                 length_histogram: topic_id, bin_start, bin_end and num_documents, the lengths of the documents of every
+                                   dominant topic.
+    """
+    phi = np.asarray(lda["phi"])
+    K = phi.shape[0]
+    top = top_word_ids(phi, top_words)
+    vocabulary = np.array(list(lda["vocabulary"]), dtype=object)
+    word_counts = corpus_word_counts(lda, documents, counts)
+    keywords = pd.DataFrame({"topic_id": np.repeat(np.arange(K), top.shape[1]), "rank": np.tile(np.arange(top.shape[1]), K),
+                             "word": vocabulary[top.ravel()], "importance": np.take_along_axis(phi, top, axis=1).ravel(),
+                             "word_count": word_counts[top.ravel()]})
+
+    theta = np.asarray(lda["theta"])
+    dominant = theta.argmax(axis=1)
+    lengths = document_lengths(documents, counts, lda)
+    docs = pd.DataFrame({"doc": np.arange(len(theta)), "topic": dominant,
+                         "weight": np.take_along_axis(theta, dominant[:, None], axis=1).ravel(), "length": lengths})
+
+    # one bincount over (topic, bin) pairs for all the histograms
+    edges = np.histogram_bin_edges(lengths, bins)
+    num_bins = len(edges) - 1
+    bin_idx = np.clip(np.searchsorted(edges, lengths, side="right") - 1, 0, num_bins - 1)
+    histogram = np.bincount(dominant * num_bins + bin_idx, minlength=K * num_bins)
+    length_histogram = pd.DataFrame({"topic_id": np.repeat(np.arange(K), num_bins), "bin_start": np.tile(edges[:-1], K),
+                                     "bin_end": np.tile(edges[1:], K), "num_documents": histogram})
+    return TopicReport(keywords, docs, length_histogram)
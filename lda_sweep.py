@@ -0,0 +1,130 @@
+import os
+import time
+import tempfile
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+import lda_model
+from lda_vocabulary import build_corpus
+from lda_coherence import CoherenceEvaluator, top_word_ids
+
+# Hyperparameter sweeps of the Numba LDA
+# The corpus is encoded once and written to .npy files that every worker process memory-maps in its pool initializer,
+# so all fits read the same pages of the read-only token arrays and only the small configs and results are pickled.
+# Every fit is one single-threaded sampler run; the fits are submitted longest first (cost ~ tokens x K x sweeps for
+# the dense sampler) to a pool of one process per core, which packs the short ones in behind the long ones.
+# Each config gets a row with its time, the final log-likelihood, the perplexity and the mean coherence of its topics,
+# scored in the parent on one lda_coherence.CoherenceEvaluator whose cached counts are shared by all the configs.
+
+# per process state of a pool worker, filled in by init_worker
+_worker = {}
+
+def sweep_grid(K_values=(4, 8), alpha_values=(0.1,), beta_values=(0.01,), seeds=(42,)):
+    """
+        Every combination of the given values.
+
+        :return: A list of config dicts with K, alpha, beta and seed.
+    """
+    return [{"K": K, "alpha": alpha, "beta": beta, "seed": seed}
+            for K, alpha, beta, seed in itertools.product(K_values, alpha_values, beta_values, seeds)]
+
+def init_worker(corpus_dir, vocabulary, sampler, mh_steps, top_words, model_dir):
+    token_ids, doc_offsets = lda_model.load_corpus(corpus_dir)
+    _worker.update(token_ids=token_ids, doc_offsets=doc_offsets, vocabulary=vocabulary, V=len(vocabulary), sampler=sampler, mh_steps=mh_steps,
+                   top_words=top_words, model_dir=model_dir)
+    # compile the kernel for the memory-mapped (read-only) arrays on a one token corpus, so the timings exclude the JIT
+    warm_token_ids, warm_doc_offsets = np.zeros(1, dtype=np.int32), np.array([0, 1], dtype=np.int64)
+    warm_token_ids.flags.writeable = warm_doc_offsets.flags.writeable = False
+    counts = lda_model.initialize_count_matrices(1, 1, 1, warm_token_ids, warm_doc_offsets)
+    lda_model.run_sampler(sampler, 1, warm_token_ids, warm_doc_offsets, *counts, 1, 0.1, 0.01, 1, mh_steps)
+
+def model_name(config):
+    return f"K{config['K']}_alpha{config['alpha']}_beta{config['beta']}_seed{config['seed']}"
+
+def fit_config(config):
+    """
+        Worker task: fits one config on the shared corpus, as fit_lda would with the same seed.
+
+        :return: The config with its seconds, log_likelihood and perplexity, and the ids of the top words of every topic.
+    """
+    token_ids, doc_offsets, V = _worker["token_ids"], _worker["doc_offsets"], _worker["V"]
+    K, alpha, beta, seed = config["K"], float(config["alpha"]), float(config["beta"]), config["seed"]
+    st = time.time()
+    if seed is not None: lda_model.set_seed(seed)
+    counts = lda_model.initialize_count_matrices(K, len(doc_offsets) - 1, V, token_ids, doc_offsets)
+    n_k_i, n_k, n_j_k, n_j, topic_ids = lda_model.run_sampler(_worker["sampler"], config["num_iterations"], token_ids, doc_offsets, *counts,
+                                                              K, alpha, beta, V, _worker["mh_steps"], None, 1, seed)
+    seconds = time.time() - st
+
+    result = dict(config, seconds=seconds, log_likelihood=float(lda_model.log_likelihood(n_k_i, n_k, n_j_k, n_j, alpha, beta)),
+                  perplexity=float(lda_model.perplexity(n_k_i, n_k, beta)))
+    # the most frequent words of a topic are the most probable ones, phi only rescales the counts of each topic
+    top = top_word_ids(n_k_i, _worker["top_words"])
+    if _worker["model_dir"] is not None:
+        lda = lda_model.initialize_lda(K, alpha, beta, config["num_iterations"])
+        lda["vocabulary"] = _worker["vocabulary"]
+        lda_model.estimate_parameters(lda, n_k_i, n_k, n_j_k, n_j)
+        result["model_dir"] = os.path.join(_worker["model_dir"], model_name(config))
+        lda_model.save_lda(lda, result["model_dir"], counts={"n_k_i": n_k_i, "n_k": n_k})
+    return result, top
+
+def run_sweep(documents, configs, num_iterations=1000, sampler="dense", mh_steps=2, n_workers=None, top_words=10,
+              measures=("u_mass", "c_v"), model_dir=None, min_df=1, max_df=1.0, max_vocab_size=None, verbose=True):
+    """
+        Fits one model per config on the same encoded corpus, concurrently in a pool of processes.
+
+            @ documents: Tokenized documents or an encoded lda_vocabulary.Corpus, encoded once for all configs.
+            @ configs: List of dicts with K, alpha, beta and seed, e.g. sweep_grid(...). A config may also set its own
+                       num_iterations.
+            @ num_iterations: Number of sweeps of the configs that do not set it. Defaults to 1000.
+            @ sampler, mh_steps: See lda_model.run_sampler. Default to "dense" and 2.
+            @ n_workers: Number of processes, 0 fits the configs one after the other in the current process and None uses
+                         all cores. Defaults to None.
+            @ top_words: Number of words per topic the coherence is computed on. Defaults to 10.
+            @ measures: Coherence measures, see lda_coherence.MEASURES. Default to u_mass and c_v.
+            @ model_dir: Save every model (with its n_k_i/n_k counts) under model_dir/K{K}_alpha{alpha}_beta{beta}_seed{seed}
+                         with lda_model.save_lda, None keeps none of them. Defaults to None.
+            @ min_df, max_df, max_vocab_size: Vocabulary pruning, see lda_vocabulary.build_corpus. Default to no pruning.
+            @ verbose: Print every result as it comes in. Defaults to True.
+
+        :return: A DataFrame with one row per config, in the order of configs: K, alpha, beta, seed, num_iterations,
+                 seconds, log_likelihood, perplexity, model_dir if models were saved and the mean coherence of the
+                 topics for every measure.
+    """
+    corpus = build_corpus(documents, min_df, max_df, max_vocab_size)
+    vocabulary, token_ids, doc_offsets = corpus
+    V = len(vocabulary)
+    configs = [dict(config) for config in configs]
+    for config in configs:
+        config.setdefault("seed", None)
+        config.setdefault("num_iterations", num_iterations)
+        if config["K"] > lda_model.MAX_TOPICS:
+            raise ValueError(f"K={config['K']} does not fit the uint16 topic assignments, at most {lda_model.MAX_TOPICS} topics are supported")
+    # longest fits first, so that no core is left with a long fit at the end while the others are idle
+    order = sorted(range(len(configs)), key=lambda idx: -configs[idx]["K"] * configs[idx]["num_iterations"])
+    evaluator = CoherenceEvaluator(corpus)
+    rows = [None] * len(configs)
+
+    def collect(idx, result, top):
+        for measure in measures:
+            result[measure] = float(evaluator.score(top, measure).mean())
+        rows[idx] = result
+        if verbose:
+            print(f"{model_name(result)}: {result['seconds']:.1f}s, log-likelihood {result['log_likelihood']:.1f}, "
+                  f"perplexity {result['perplexity']:.1f}" + "".join(f", {measure} {result[measure]:.3f}" for measure in measures))
+
+    with tempfile.TemporaryDirectory(prefix="lda_sweep_") as corpus_dir:
+        lda_model.save_corpus(corpus_dir, token_ids, doc_offsets)
+        initargs = (corpus_dir, vocabulary, sampler, mh_steps, top_words, model_dir)
+        if n_workers == 0:
+            init_worker(*initargs)
+            for idx in order:
+                collect(idx, *fit_config(configs[idx]))
+        else:
+            n_workers = min(n_workers or os.cpu_count(), len(configs)) or 1
+            with ProcessPoolExecutor(n_workers, initializer=init_worker, initargs=initargs) as pool:
+                futures = {pool.submit(fit_config, configs[idx]): idx for idx in order}
+                for future in as_completed(futures):
+                    collect(futures[future], *future.result())
+    return pd.DataFrame(rows)
@@ -0,0 +1,90 @@
+from array import array
+from collections import defaultdict, namedtuple
+import numpy as np
+
+# Vocabulary building and corpus encoding in one streaming pass
+# Every word gets a provisional id the first time it is seen (one dict lookup per token, no list.index) and the
+# documents are appended to a flat int32 buffer right away, so the tokenized corpus is never held twice in memory and
+# `documents` can be a generator such as sent_to_words. Document frequencies are counted afterwards with numpy, the
+# pruned words are dropped and the remaining ones renumbered in sorted order with one vectorized remap of the buffer.
+
+# the flat corpus arrays of lda_model, vocabulary[token_ids[doc_offsets[d]:doc_offsets[d + 1]]] are the words of document d
+Corpus = namedtuple("Corpus", ["vocabulary", "token_ids", "doc_offsets"])
+
+def resolve_df_bound(bound, num_docs):
+    # ints are absolute document counts, floats a fraction of the documents (as in sklearn's CountVectorizer)
+    if isinstance(bound, float):
+        return bound * num_docs
+    return bound
+
+def build_corpus(documents, min_df=1, max_df=1.0, max_vocab_size=None):
+    """
+        Builds the vocabulary of the tokenized documents and encodes them into the flat corpus arrays of lda_model.
+
+            @ documents: Iterable of tokenized documents, consumed once, or an already encoded Corpus (e.g. from
+                         text_preprocessing.preprocess_corpus), which is only pruned and renumbered.
+            @ min_df: Drop the words occurring in fewer documents, an int is a document count and a float a fraction of
+                      the documents. Defaults to 1.
+            @ max_df: Drop the words occurring in more documents, int or float as for min_df. Defaults to 1.0.
+            @ max_vocab_size: Keep only this many words with the highest corpus frequency (ties go to the word that sorts
+                              first), None keeps all of them. Defaults to None.
+
+        :return: A Corpus of vocabulary (sorted list of words, the position of a word is its id), token_ids (int32) and
+                 doc_offsets (int64, length D+1), dropped words are removed from the documents.
+    """
+    if isinstance(documents, Corpus):
+        return prune_corpus(*documents, min_df=min_df, max_df=max_df, max_vocab_size=max_vocab_size)
+
+    # a missing word is assigned len(word_to_index), i.e. the next free id, so the lookup loop stays in C
+    word_to_index = defaultdict()
+    word_to_index.default_factory = word_to_index.__len__
+    token_buffer = array("i")
+    doc_lengths = array("q")
+    for doc in documents:
+        num_tokens = len(token_buffer)
+        token_buffer.extend(map(word_to_index.__getitem__, doc))
+        doc_lengths.append(len(token_buffer) - num_tokens)
+
+    doc_offsets = np.zeros(len(doc_lengths) + 1, dtype=np.int64)
+    np.cumsum(np.frombuffer(doc_lengths, dtype=np.int64), out=doc_offsets[1:])
+    return prune_corpus(list(word_to_index), np.frombuffer(token_buffer, dtype=np.int32), doc_offsets, min_df, max_df, max_vocab_size)
+
+def prune_corpus(vocabulary, token_ids, doc_offsets, min_df=1, max_df=1.0, max_vocab_size=None):
+    """
+        Prunes an encoded corpus as described in build_corpus and renumbers the kept words in sorted order.
+
+        :return: A Corpus.
+    """
+    words = np.array(vocabulary, dtype=object)
+    V, D = len(words), len(doc_offsets) - 1
+    token_ids = np.asarray(token_ids, dtype=np.int32)
+
+    # document frequencies from the distinct (document, word) pairs, found by sorting their combined keys
+    word_freq = np.bincount(token_ids, minlength=V)
+    pair_keys = np.sort(np.repeat(np.arange(D, dtype=np.int64) * V, np.diff(doc_offsets)) + token_ids)
+    first_in_doc = np.ones(len(pair_keys), dtype=bool)
+    np.not_equal(pair_keys[1:], pair_keys[:-1], out=first_in_doc[1:])
+    doc_freq = np.bincount(pair_keys[first_in_doc] % max(V, 1), minlength=V)
+
+    keep = (doc_freq >= resolve_df_bound(min_df, D)) & (doc_freq <= resolve_df_bound(max_df, D))
+    if max_vocab_size is not None and keep.sum() > max_vocab_size:
+        candidates = np.flatnonzero(keep)
+        # most frequent first, ties broken by the word itself so that the cut does not depend on the input order
+        order = sorted(candidates.tolist(), key=lambda idx: (-word_freq[idx], words[idx]))
+        keep[:] = False
+        keep[order[:max_vocab_size]] = True
+
+    # sorted ids are reproducible across runs, with nothing pruned the vocabulary is sorted(set(all words))
+    kept = np.flatnonzero(keep)
+    kept = kept[np.argsort(words[kept].astype(str), kind="stable")]
+    remap = np.full(V, -1, dtype=np.int32)
+    remap[kept] = np.arange(len(kept), dtype=np.int32)
+
+    token_ids = remap[token_ids]
+    kept_tokens = token_ids >= 0
+    if not kept_tokens.all():
+        kept_before = np.zeros(len(kept_tokens) + 1, dtype=np.int64)
+        np.cumsum(kept_tokens, out=kept_before[1:])
+        doc_offsets = kept_before[doc_offsets]
+        token_ids = token_ids[kept_tokens]
+    return Corpus(words[kept].tolist(), np.ascontiguousarray(token_ids), doc_offsets)
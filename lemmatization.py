@@ -0,0 +1,126 @@
+import re
+from functools import lru_cache
+
+# Lemmatization stage of the preprocessing
+# News vocabulary is highly repetitive, so CachedLemmatizer memoizes the lemma of every surface form in a bounded LRU
+# cache and WordNet is only asked once per distinct word, with one lemmatizer per process instead of one per document.
+# SpacyLemmatizer batches whole documents through nlp.pipe with the parser and NER disabled, the model is loaded once
+# per process. Both map a list of token lists to a list of lemma lists, so either can be passed to clean_texts below or
+# as the lemmatizer of text_preprocessing.preprocess_corpus, where every worker process loads its own copy.
+
+PUNCTUATION_RE = re.compile(r"[^\w\s]")
+URL_RE = re.compile(r"http\S+")
+DIGITS_RE = re.compile(r"\d+")
+
+# the words nltk's word_tokenize splits in two once punctuation is gone (Treebank CONTRACTIONS2)
+TREEBANK_SPLITS = {"cannot": ("can", "not"), "gimme": ("gim", "me"), "gonna": ("gon", "na"), "gotta": ("got", "ta"),
+                   "lemme": ("lem", "me"), "wanna": ("wan", "na")}
+
+def wordnet_lemmatize():
+    from nltk.stem import WordNetLemmatizer
+    return WordNetLemmatizer().lemmatize
+
+class CachedLemmatizer:
+    def __init__(self, lemmatize_word=None, cache_size=200000):
+        """
+            Word by word lemmatizer with a bounded LRU memo keyed by surface form.
+
+                @ lemmatize_word: Function mapping a word to its lemma, defaults to nltk's WordNetLemmatizer().lemmatize.
+                @ cache_size: Maximum number of memoized surface forms. Defaults to 200000.
+        """
+        self.lemmatize_word = lemmatize_word
+        self.cache_size = cache_size
+        self.lemmatize = None
+
+    def load(self):
+        # done lazily so that the lemmatizer can be pickled to worker processes and build its cache there
+        lemmatize_word = self.lemmatize_word or wordnet_lemmatize()
+        self.lemmatize = lru_cache(maxsize=self.cache_size)(lemmatize_word)
+
+    def __call__(self, docs):
+        if self.lemmatize is None:
+            self.load()
+        lemmatize = self.lemmatize
+        return [[lemmatize(word) for word in doc] for doc in docs]
+
+    def cache_info(self):
+        return None if self.lemmatize is None else self.lemmatize.cache_info()
+
+    def __getstate__(self):
+        return {"lemmatize_word": self.lemmatize_word, "cache_size": self.cache_size, "lemmatize": None}
+
+# spaCy pipelines of the current process by model name, loaded at most once
+spacy_models = {}
+
+class SpacyLemmatizer:
+    def __init__(self, model="en_core_web_sm", allowed_postags=None, n_process=1, batch_size=256):
+        """
+            Batched spaCy lemmatizer.
+
+                @ model: spaCy model name. Defaults to "en_core_web_sm".
+                @ allowed_postags: Keep only the tokens with these coarse POS tags, e.g. ('NOUN', 'ADJ', 'VERB', 'ADV') as
+                                   process_words does, None keeps all. Defaults to None.
+                @ n_process: Processes of nlp.pipe, keep 1 inside the worker processes of text_preprocessing. Defaults to 1.
+                @ batch_size: Documents per nlp.pipe batch. Defaults to 256.
+        """
+        self.model = model
+        self.allowed_postags = None if allowed_postags is None else frozenset(allowed_postags)
+        self.n_process = n_process
+        self.batch_size = batch_size
+
+    def nlp(self):
+        if self.model not in spacy_models:
+            import spacy
+            # the parser and NER are most of spaCy's time and not needed for lemmas and POS tags
+            spacy_models[self.model] = spacy.load(self.model, disable=["parser", "ner"])
+        return spacy_models[self.model]
+
+    def __call__(self, docs):
+        texts = (" ".join(doc) for doc in docs)
+        lemmas = []
+        for doc in self.nlp().pipe(texts, n_process=self.n_process, batch_size=self.batch_size):
+            if self.allowed_postags is None:
+                lemmas.append([token.lemma_ for token in doc if not token.is_space])
+            else:
+                lemmas.append([token.lemma_ for token in doc if token.pos_ in self.allowed_postags])
+        return lemmas
+
+def prepare_words(text, stop_words=frozenset()):
+    # the regex passes of visualization's clean_text before lemmatizing: once punctuation is removed, words are the
+    # whitespace-separated runs, so single characters and stop words are dropped per word instead of re-scanning the text
+    text = DIGITS_RE.sub("", URL_RE.sub("", PUNCTUATION_RE.sub("", text)))
+    words = []
+    for word in text.split():
+        word = word.lower()
+        if len(word) > 1 and word not in stop_words:
+            words.append(word)
+    return words
+
+def clean_texts(texts, ngram=1, stop_words=frozenset(), lemmatizer=None):
+    """
+        Batched and cached version of visualization's clean_text, returning the same tokens.
+
+            @ texts: List of article texts.
+            @ ngram: Also append the n-grams up to this n. Defaults to 1.
+            @ stop_words: Set of words to drop. Defaults to an empty set.
+            @ lemmatizer: CachedLemmatizer or SpacyLemmatizer, defaults to a new CachedLemmatizer over WordNet.
+
+        :return: The list of token lists.
+    """
+    lemmatizer = lemmatizer or CachedLemmatizer()
+    docs = lemmatizer([prepare_words(text, stop_words) if isinstance(text, str) else [] for text in texts])
+    tokens = []
+    for words in docs:
+        doc_tokens = []
+        for word in words:
+            if word in TREEBANK_SPLITS:
+                doc_tokens.extend(TREEBANK_SPLITS[word])
+            else:
+                doc_tokens.append(word)
+        for n in range(2, ngram + 1):
+            doc_tokens.extend(" ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+        tokens.append(doc_tokens)
+    return tokens
+
+def clean_text(text, ngram=1, stop_words=frozenset(), lemmatizer=None):
+    return clean_texts([text], ngram, stop_words, lemmatizer)[0]
@@ -0,0 +1,115 @@
+import re
+from bs4 import BeautifulSoup
+
+# HTML -> records extractors for Fox News and CNN pages
+# Pure functions of the page html, so that they can run in the parsing processes of news_pipeline and be rerun offline on
+# saved pages. Each returns the list of article records found on the page, an empty list means the page is skipped.
+
+JUNK_TEXT_FOXNEWS = {"cyberguy.com", "click here"}
+
+def extract_foxnews_article(html, url, min_word_cnt):
+    article_soup = BeautifulSoup(html, features="lxml")
+    # Header info extraction, if page has no content, skip this article
+    header = article_soup.find("header", {"class":"article-header"})
+    if header is None or header.find("span",{"class":"article-date"}) is None or header.find("h1",{"class":"headline"}) is None:
+        return []
+
+    # Meta information scraping
+    publish_date = header.find("span",{"class":"article-date"}).text.strip("Published\n ").strip()
+    headline = header.find("h1",{"class":"headline"}).text.strip().replace(u'\xa0', u' ')
+
+    # Main Article Text scraping
+    main_text = []
+    for p in article_soup.select("div.article-body > p"):
+        sent = p.text.strip()
+        if not any(junk in sent.lower() for junk in JUNK_TEXT_FOXNEWS) and not sent.isupper():
+            main_text.append(sent)
+    main_text = re.sub(r'[\xa0]+|\s{2,}', ' ', ' '.join(main_text)).strip()
+
+    # Check article validity
+    if len(main_text) < min_word_cnt:
+        return []
+    return [{
+        "publish_date": publish_date,
+        "headline": headline,
+        "main_text": main_text,
+        "media": "FoxNews",
+        "type": "article",
+        "url":url
+    }]
+
+def extract_cnn_article(html, url, min_word_cnt):
+    article_soup = BeautifulSoup(html, features="lxml")
+    header = article_soup.find("div", {"class":"headline headline--has-lowertext"})
+    main_text_sec = article_soup.find("div",{"class":"article__content"})
+    if header is None or main_text_sec is None:
+        return []
+
+    # Meta Information scraping
+    head_wrapper = header.find("div", {"class":"headline__wrapper"})
+    head_footer_set = header.find("div", {"class":"headline__sub-text"})
+    if head_wrapper is None or head_wrapper.find("h1", {"id":"maincontent"}) is None or head_footer_set is None or head_footer_set.find("div", {"class":"timestamp"}) is None:
+        return []
+    headline = head_wrapper.find("h1", {"id":"maincontent"}).text.strip().replace(u'\xa0', u' ')
+    publish_date = re.sub(r'^(Published|Updated|\n|\s)+|[\xa0\n]+|\s{2,}', ' ', head_footer_set.find("div", {"class":"timestamp"}).text).strip()
+
+    # Main Article Text scraping
+    main_text = [i.text for i in main_text_sec.find_all("p", {"class":"paragraph inline-placeholder"})]
+    main_text = re.sub(r'[\xa0\n\t]+|\s{2,}', ' ', " ".join(main_text)).replace("  "," ").strip()
+
+    # Check article validity
+    if len(main_text) < min_word_cnt:
+        return []
+    return [{
+        "publish_date": publish_date,
+        "headline": headline,
+        "main_text": main_text,
+        "media": "CNN",
+        "type": "article",
+        "url":url
+    }]
+
+def extract_cnn_live(html, url, min_word_cnt):
+    # each news blog in live-news is treated as an independent article
+    article_soup = BeautifulSoup(html, features="lxml")
+    main_text_sec = article_soup.find("div",{"class":'live-story__items-container'})
+    if main_text_sec is None:
+        main_text_sec = article_soup.find("div",{"id":'posts-and-button'})
+        if main_text_sec is None:
+            return []
+    article_content = []
+    for article in main_text_sec.find_all("article"):
+        header = article.find("header")
+        if header is None or header.find("h2") is None or header.find("span") is None: continue
+        headline = header.find("h2").text.strip().replace(u'\xa0', u' ')
+        publish_date = header.find("span").text.strip().replace(u'\xa0', u' ')
+        main_text = re.sub(r'[\xa0\n\t]+|\s{2,}', ' ', " ".join([p.text for p in article.select("div > p")])).replace("  "," ").strip()
+        if len(main_text) < min_word_cnt or headline == "": continue
+        if "From CNN" in publish_date or publish_date == "": continue
+        article_content.append({
+            "publish_date": publish_date,
+            "headline": headline,
+            "main_text": main_text,
+            "media": "CNN",
+            "type": "live-news",
+            "url":url
+        })
+    return article_content
+
+def is_irrelevant_cnn_link(url):
+    # Promotions and advertisements of products
+    return "/reviews/" in url or "/cnn-underscored/" in url
+
+def extractor_for(url, media):
+    """
+        Picks the extractor of a page the way the scrapers do, for rerunning extraction on saved pages.
+
+        :return: The extractor function, None for links the scrapers skip.
+    """
+    if media == "FoxNews":
+        return extract_foxnews_article
+    if "live-news" in url:
+        return extract_cnn_live
+    if is_irrelevant_cnn_link(url):
+        return None
+    return extract_cnn_article
@@ -0,0 +1,126 @@
+import time
+import asyncio
+import inspect
+from contextlib import nullcontext
+from collections import namedtuple
+import aiohttp
+from rate_limiter import outcome_of, THROTTLED, TIMEOUT
+
+# Async HTTP fetching of static pages for NewsScraper
+# Regular articles are server-rendered HTML, so instead of a Chrome instance per page they are fetched with one pooled
+# aiohttp session: keep-alive connections are reused across requests and a semaphore caps the requests in flight.
+# Only the JS-heavy pages (live-news, search pagination) still go through Selenium. With a rate_limiter.RateController
+# every request also waits for its domain's token bucket and concurrency limit, which adapt to the responses.
+# Throttling answers (429/5xx) and timeouts are retried a few times with exponential backoff, other errors are final.
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9"
+}
+
+# status is the HTTP status (None if no response was received), html is None unless the request succeeded
+FetchResult = namedtuple("FetchResult", ["url", "status", "html", "error", "elapsed"])
+
+class AsyncFetcher:
+    def __init__(self, max_concurrency=32, timeout=15, connect_timeout=5, max_per_host=None, headers=None, rate_controller=None,
+                 max_retries=2, backoff=0.5):
+        """
+            Initializes the fetcher with its concurrency and timeout settings.
+
+                @ max_concurrency: Maximum number of requests in flight. Defaults to 32.
+                @ timeout: Total timeout of one request in seconds, connecting and reading the body included. Defaults to 15.
+                @ connect_timeout: Timeout of establishing a connection in seconds. Defaults to 5.
+                @ max_per_host: Maximum number of connections to one host, None only applies max_concurrency. Defaults to None.
+                @ headers: Request headers, defaults to browser-like headers since news sites tend to block unknown clients.
+                @ rate_controller: Optional rate_limiter.RateController pacing the requests per domain. Defaults to None.
+                @ max_retries: Number of retries of a request answered with 429/5xx or timed out. Defaults to 2.
+                @ backoff: Seconds before the first retry, doubled for every further one. Defaults to 0.5.
+        """
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host or 0
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.headers = headers or DEFAULT_HEADERS
+        self.rate_controller = rate_controller
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    def make_session(self):
+        # one connection pool for all requests, the per host limit keeps a single site from taking every connection
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.max_per_host, ttl_dns_cache=300)
+        return aiohttp.ClientSession(connector=connector, timeout=self.timeout, headers=self.headers)
+
+    async def fetch(self, session, url, semaphore):
+        """
+            Fetches one page, errors are returned in the result instead of raised so that one bad link does not stop the batch.
+            A 429/5xx answer or a timeout is retried up to max_retries times.
+
+            :return: A FetchResult, of the last attempt.
+        """
+        limiter = self.rate_controller.limiter(url) if self.rate_controller is not None else None
+        for attempt in range(self.max_retries + 1):
+            # every attempt waits for the limiter and reports to it, so a retried 429 also slows the domain down
+            if limiter is not None: await limiter.acquire_async()
+            result = await self.request(session, url, semaphore)
+            outcome = outcome_of(result.status, result.error)
+            if limiter is not None: limiter.release(result.elapsed, outcome)
+            if outcome not in (THROTTLED, TIMEOUT) or attempt == self.max_retries:
+                return result
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def request(self, session, url, semaphore):
+        async with semaphore:
+            st = time.perf_counter()
+            try:
+                async with session.get(url) as response:
+                    if response.status != 200:
+                        return FetchResult(url, response.status, None, f"HTTP {response.status}", time.perf_counter() - st)
+                    html = await response.text(errors="replace")
+                    return FetchResult(url, response.status, html, None, time.perf_counter() - st)
+            except asyncio.TimeoutError:
+                return FetchResult(url, None, None, "timeout", time.perf_counter() - st)
+            except aiohttp.ClientError as e:
+                return FetchResult(url, None, None, f"{type(e).__name__}: {e}", time.perf_counter() - st)
+
+    async def fetch_all_async(self, urls, callback=None):
+        """
+            Fetches all urls concurrently with a shared session.
+
+                @ urls: List of page urls.
+                @ callback: Optional function called with every FetchResult as soon as it completes, e.g. to parse pages while
+                            others are still downloading. It may be a coroutine function, awaited by the task of the page:
+                            at most max_concurrency pages are between the start of their download and the end of their
+                            callback, so a callback waiting on a slow consumer (ParsePipeline.submit_async) slows the
+                            downloads down instead of piling up html or freezing the event loop. Defaults to None.
+
+            :return: The list of FetchResults, in completion order.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        handoff = asyncio.Semaphore(self.max_concurrency) if callback is not None else nullcontext()
+        results = []
+
+        async def fetch_one(session, url):
+            async with handoff:
+                result = await self.fetch(session, url, semaphore)
+                if callback is not None:
+                    handled = callback(result)
+                    if inspect.isawaitable(handled): await handled
+            results.append(result)
+
+        async with self.make_session() as session:
+            tasks = [asyncio.ensure_future(fetch_one(session, url)) for url in urls]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                # a failing callback stops the batch, the other pages are cancelled before the session closes
+                for task in tasks: task.cancel()
+        return results
+
+    def fetch_all(self, urls, callback=None):
+        """
+            Blocking wrapper of fetch_all_async for scripts. Inside a running event loop (e.g. Jupyter) await
+            fetch_all_async directly instead.
+
+            :return: The list of FetchResults, in completion order.
+        """
+        return asyncio.run(self.fetch_all_async(urls, callback))
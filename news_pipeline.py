@@ -0,0 +1,138 @@
+import time
+import asyncio
+import threading
+import multiprocessing as mp
+from concurrent.futures import Future, ProcessPoolExecutor
+
+# Fetch -> parse pipeline
+# BeautifulSoup parsing is CPU-bound and holds the GIL, so parsing on the fetching threads stops scaling after a few
+# threads. Here the fetchers only hand the raw html to the pipeline, which runs the news_extractors functions in a pool
+# of processes. At most max_pending pages wait for or sit in the pool, a fetcher submitting beyond that waits until
+# a slot frees up, so a burst of fast downloads cannot pile up html in memory faster than it is parsed. The browser
+# threads wait in submit; the async fetcher awaits submit_async, which suspends only the task of that page (woken from
+# the pool's callback thread with call_soon_threadsafe) so the event loop keeps serving the other downloads.
+
+def run_extractor(extractor, html, url, min_word_cnt):
+    # module level so that the pool can pickle it, the extractor itself is pickled by reference
+    return extractor(html, url, min_word_cnt)
+
+def wake(freed):
+    if not freed.done():
+        freed.set_result(None)
+
+class ParsePipeline:
+    def __init__(self, n_workers=None, max_pending=None):
+        """
+            Starts the parsing processes.
+
+                @ n_workers: Number of parsing processes, 0 parses inline on the submitting thread and None uses all cores.
+                             Defaults to None.
+                @ max_pending: Maximum number of pages queued or being parsed before submit waits. Defaults to 4 * n_workers.
+        """
+        self.n_workers = mp.cpu_count() if n_workers is None else n_workers
+        self.pool = ProcessPoolExecutor(self.n_workers) if self.n_workers > 0 else None
+        self.slots = threading.BoundedSemaphore(max_pending or 4 * max(self.n_workers, 1))
+        # (loop, future) of the submit_async calls waiting for a slot, guarded by lock together with the slots
+        self.lock = threading.Lock()
+        self.waiters = []
+
+    def submit(self, extractor, html, url, min_word_cnt):
+        """
+            Queues one page for extraction, blocking while max_pending pages are already waiting.
+
+            :return: A Future of the list of article records.
+        """
+        if self.pool is None:
+            future = Future()
+            try:
+                future.set_result(extractor(html, url, min_word_cnt))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        self.slots.acquire()
+        return self.start(extractor, html, url, min_word_cnt)
+
+    async def submit_async(self, extractor, html, url, min_word_cnt):
+        """
+            Coroutine version of submit for the event loop of the async fetcher: while max_pending pages are already
+            waiting, only the calling task is suspended and the other downloads go on.
+
+            :return: A Future of the list of article records.
+        """
+        if self.pool is None:
+            return self.submit(extractor, html, url, min_word_cnt)
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.lock:
+                if self.slots.acquire(blocking=False):
+                    break
+                freed = loop.create_future()
+                self.waiters.append((loop, freed))
+            await freed
+        return self.start(extractor, html, url, min_word_cnt)
+
+    def start(self, extractor, html, url, min_word_cnt):
+        # the caller holds a slot, given back once the page is parsed
+        future = self.pool.submit(run_extractor, extractor, html, url, min_word_cnt)
+        future.add_done_callback(self.release_slot)
+        return future
+
+    def release_slot(self, _):
+        # runs on the pool's thread, the waiting tasks are woken on their own loops and try again for the slot
+        with self.lock:
+            self.slots.release()
+            waiters, self.waiters = self.waiters, []
+        for loop, freed in waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(wake, freed)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def resolve_records(futures, verbose=True):
+    """
+        Waits for the extraction futures of a dict of url -> Future (plain values are passed through).
+        A page whose extractor raised counts as a page without valid content.
+
+        :return: A dict of url -> list of article records.
+    """
+    results = {}
+    for url, future in futures.items():
+        if not isinstance(future, Future):
+            results[url] = future
+            continue
+        try:
+            results[url] = future.result()
+        except Exception as e:
+            if verbose: print(f"\tExtraction failed ({type(e).__name__}: {e}) - link: {url}")
+            results[url] = []
+    return results
+
+def benchmark_parsing(pages, extractor, n_workers_values=(0, 1, 2, 4), min_word_cnt=10):
+    """
+        Benchmarks the parsing stage alone on saved pages, e.g. the ones replayed from the page cache.
+
+            @ pages: List of (url, html) pairs.
+            @ extractor: One of the news_extractors functions.
+            @ n_workers_values: Numbers of parsing processes to time, 0 is inline parsing. Defaults to (0, 1, 2, 4).
+
+        :return: A list of dicts with n_workers, seconds and pages_per_sec of each run.
+    """
+    results = []
+    for n_workers in n_workers_values:
+        with ParsePipeline(n_workers) as pipeline:
+            # start the processes before timing
+            resolve_records({"warm up": pipeline.submit(extractor, "<html></html>", "", min_word_cnt)})
+            st = time.time()
+            resolve_records({url: pipeline.submit(extractor, html, url, min_word_cnt) for url, html in pages})
+            et = time.time()
+        results.append({"n_workers": n_workers, "seconds": et - st, "pages_per_sec": len(pages) / (et - st)})
+        print(f"n_workers={n_workers:<3} {results[-1]['pages_per_sec']:>10,.1f} pages/sec")
+    return results
@@ -1,22 +1,36 @@
 import re
 import os
 import time
-import random
 import numpy as np
 import pandas as pd
 import cchardet as chardet
-from itertools import islice
-from threading import Thread, Lock
-from queue import Queue
+from functools import partial
 from selenium import webdriver
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import TimeoutException
 from bs4 import BeautifulSoup
+from news_fetcher import AsyncFetcher
+from news_pipeline import ParsePipeline, resolve_records
+from news_extractors import extract_foxnews_article, extract_cnn_article, extract_cnn_live, is_irrelevant_cnn_link
+from scraper_scheduler import DriverPool, WorkStealingScheduler
+from crawl_index import CrawlIndex, OK, EMPTY, IRRELEVANT, ERROR
+from page_cache import PageCache
+from record_store import RecordWriter
+from rate_limiter import RateController
+from page_readiness import scroll_until, click_until, wait_for_items, remaining
+
+# items the readiness waits count: search results and live-news posts
+FOXNEWS_RESULT_SELECTOR = "div.m > a"
+CNN_RESULT_SELECTOR = "div.container__headline.container_list-images-with-description__headline > span.container__headline-text"
+CNN_RESULTS_COUNT_SELECTOR = "div.search__results-count"
+CNN_LIVE_POST_SELECTOR = "div.live-story__items-container article, div#posts-and-button article"
 
 class NewsScraper:
-    def __init__(self, search_keyword, driver_path="./webdriver/chromedriver.exe", n_threads = 1, max_article_num = 200, min_word_cnt_per_article = 10, save_to_local = False, data_save_path="./data/"):
+    def __init__(self, search_keyword, driver_path="./webdriver/chromedriver.exe", n_threads = 1, max_article_num = 200, min_word_cnt_per_article = 10, save_to_local = False, data_save_path="./data/",
+                 max_concurrency = 32, fetch_timeout = 15, task_timeout = 60, max_retries = 2, index_path = None, refresh_after = None,
+                 parse_workers = 0, cache_path = None, cache_max_bytes = 2 * 1024 ** 3,
+                 output_format = "xlsx", batch_size = 100, rate_limits = None):
         """
             Initializes the NewsScraper with specified settings.
 
@@ -26,6 +40,25 @@ class NewsScraper:
                 @ min_word_cnt_per_article: Minimum word count per article for it to be considered valid. Defaults to 10 words.
                 @ save_to_local: Boolean indicating whether to save the scraped data to a local file. Defaults to False.
                 @ data_save_path: Path to save the scraped data if save_to_local is True. Defaults to "./data/".
+                @ max_concurrency: Maximum number of concurrent requests of the async scrapers. Defaults to 32.
+                @ fetch_timeout: Timeout in seconds of one request of the async scrapers. Defaults to 15.
+                @ task_timeout: Time budget in seconds of one page loaded in a browser, live-news scrolling included. Defaults to 60.
+                @ max_retries: Number of retries, with backoff, of a page that failed to load in the threaded scrapers. Defaults to 2.
+                @ index_path: Path of a SQLite crawl index, makes the scrapers incremental: only new links (and
+                              failed ones) are fetched and the saved files are updated instead of overwritten. Defaults to None.
+                @ refresh_after: With a crawl index, refetch pages scraped more than this many seconds ago, e.g. live-news that
+                                 keeps growing. None never refetches. Defaults to None.
+                @ parse_workers: Number of processes parsing the fetched pages, 0 parses on the fetching threads and None uses
+                                 all cores. Defaults to 0.
+                @ cache_path: Folder of a compressed raw page cache keeping the html of every page the scrapers fetch, so that
+                              page_cache.replay can rerun extraction offline. Defaults to None.
+                @ cache_max_bytes: Size bound of the page cache, the snapshots fetched longest ago are evicted. Defaults to 2 GiB.
+                @ output_format: "xlsx" writes one file per site at the end of a run, "jsonl" or "parquet" make the scrapers
+                                 stream their records to shards under data_save_path/records as pages get parsed, read back
+                                 with record_store.read_records. Defaults to "xlsx".
+                @ batch_size: Number of records per shard of the streamed output. Defaults to 100.
+                @ rate_limits: Dict of rate_limiter.DomainLimiter settings (initial rate, bounds, target latency...) of the
+                               adaptive per-domain pacing of the scrapers. Defaults to None, the defaults.
         """
         # Driver setting
         options = webdriver.ChromeOptions()
@@ -35,7 +68,10 @@ class NewsScraper:
         options.add_argument('log-level=3')
 
         # Intiate drivers and variables
-        self.driver = {i:webdriver.Chrome(executable_path=driver_path, options=options) for i in range(n_threads)}
+        # the pool restarts crashed browsers in place, so self.driver always holds live ones
+        self.driver_pool = DriverPool(lambda: webdriver.Chrome(executable_path=driver_path, options=options), n_threads)
+        self.driver = self.driver_pool.drivers
+        self.scheduler = WorkStealingScheduler(self.driver_pool, task_timeout=task_timeout, max_retries=max_retries)
         self.threaded = n_threads > 1
         self.n_threads = n_threads
         self.save_path = data_save_path
@@ -46,12 +82,33 @@ class NewsScraper:
 
         # Pre-store the search results of foxnews
         self.search_fox = []
+
+        # Adaptive per-domain pacing, shared by the HTTP client and the browsers, see self.rate_controller.stats()
+        self.rate_controller = RateController(**(rate_limits or {}))
+
+        # Pooled HTTP client for the static article pages of the async scrapers
+        self.fetcher = AsyncFetcher(max_concurrency=max_concurrency, timeout=fetch_timeout, rate_controller=self.rate_controller)
+        # Fetched html is handed to the parsing processes, bounded so that fast fetchers wait for the parsers
+        self.parser = ParsePipeline(parse_workers)
+        self.page_cache = PageCache(cache_path, cache_max_bytes) if cache_path else None
+
+        # Streamed output, one shard writer per site
+        self.output_format = output_format
+        self.batch_size = batch_size
+        self.record_writers = {}
+
+        # Crawl index of the incremental runs
+        self.crawl_index = CrawlIndex(index_path) if index_path else None
+        self.refresh_after = refresh_after
     
-    def search_foxnews(self, driver, verbose = True):
+    def search_foxnews(self, driver, verbose = True, deadline = None):
         """
         Searches Fox News for articles matching the initialized search keyword and retrieves their URLs.
         To display full search results, the driver first clicks 'Show More' button many times and then retreive the full search page html.
 
+            @ deadline: time.time() after which the waiting and clicking stop and the results shown so far are taken, e.g. the
+                        deadline of a scheduler task. Defaults to None.
+
         :return: A list of URLs of the articles found.
         """
         # Retrieve urls of articles returned by search results
@@ -59,31 +116,9 @@ class NewsScraper:
         if verbose: print("\nBegin searching on FoxNews...")
         driver.get(search_url_prefix+self.search_keyword)
         # Get full search results - 2 steps
-        wait = WebDriverWait(driver, 30)
-        # 1. first, click 'Show More' many times
-        i = 0
-        while i < int(self.max_article_num//10):
-            try:
-                # Scroll down to the bottom to avoid any pop-up windows blocking the 'show more' button
-                # Get scroll height
-                last_height = driver.execute_script("return document.body.scrollHeight")
-                t = 0
-                while t < 10:
-                    # Scroll down to bottom
-                    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                    # Wait to load page
-                    time.sleep(random.uniform(0.15, 0.2))
-                    # Calculate new scroll height and compare with last scroll height
-                    new_height = driver.execute_script("return document.body.scrollHeight")
-                    if new_height == last_height:
-                        break
-                    last_height = new_height
-                    t += 1
-                element = wait.until(EC.visibility_of_element_located((By.XPATH, "(//div[@class='button load-more'])[1]/a")))
-                element.click()
-                i += 1
-            except TimeoutException:
-                break
+        # 1. first, click 'Show More' until max_article_num results are shown or no more get loaded
+        wait_for_items(driver, FOXNEWS_RESULT_SELECTOR, timeout=remaining(deadline, 30))
+        click_until(driver, (By.XPATH, "(//div[@class='button load-more'])[1]/a"), FOXNEWS_RESULT_SELECTOR, target_count=self.max_article_num, deadline=deadline)
         # 2. then, copy down all that's now shown on the page
         search_result_soup = BeautifulSoup(driver.page_source, features="lxml")
         # Extract all links from the full page html
@@ -108,7 +143,7 @@ class NewsScraper:
         i = 0
         while page_results is None and i < 10:
             self.driver[0].get(search_url_prefix.format(self.search_keyword, 0, 1))
-            time.sleep(1) # Allowing the initial JavaScript search result be generated properly
+            wait_for_items(self.driver[0], CNN_RESULTS_COUNT_SELECTOR, timeout=5) # Allowing the initial JavaScript search result be generated properly
             page = BeautifulSoup(self.driver[0].page_source, features="lxml")
             page_results = page.find("div", {"class":"search__results-count"})
             i += 1
@@ -118,9 +153,9 @@ class NewsScraper:
         # start turning pages
         for i in range(1, min(num_results//10+1, int(self.max_article_num//10))):
             self.driver[0].get(search_url_prefix.format(self.search_keyword, i*10, i+1))
-            time.sleep(1) # just in case the next page hasn't finished loading
+            wait_for_items(self.driver[0], CNN_RESULT_SELECTOR, timeout=5) # just in case the next page hasn't finished loading
             page = BeautifulSoup(self.driver[0].page_source, features="lxml")
-            links = [link["data-zjs-href"] for link in page.select("div.container__headline.container_list-images-with-description__headline > span.container__headline-text")]
+            links = [link["data-zjs-href"] for link in page.select(CNN_RESULT_SELECTOR)]
             article_links.extend(links)
         article_links = list(set(article_links))
         print(f"Searching finished, {len(article_links)} articles found on CNN...")
@@ -144,46 +179,32 @@ class NewsScraper:
         i = 0
         while page_results is None and i < 10:
             self.driver[0].get(search_url_prefix.format(self.search_keyword, 0, 1))
-            time.sleep(random.uniform(0.5, 1)) # Allowing the initial JavaScript search result be generated properly
+            wait_for_items(self.driver[0], CNN_RESULTS_COUNT_SELECTOR, timeout=5) # Allowing the initial JavaScript search result be generated properly
             page = BeautifulSoup(self.driver[0].page_source, features="lxml")
             page_results = page.find("div", {"class":"search__results-count"})
             i += 1
         num_results = int(re.findall('out of (\d+)', page_results.text)[0])
-        global article_links_cnn
-        article_links_cnn = [link["data-zjs-href"] for link in page.select("div.container__headline.container_list-images-with-description__headline > span.container__headline-text")]
-
-        # start turning pages - parallelized using multi-threading
-        lock = Lock()
-        def search_per_thread(q, driver):
-            wait = WebDriverWait(driver, 2)
-            while True:
-                chunk = q.get()
-                for i in chunk:
-                    driver.get(search_url_prefix.format(self.search_keyword, i*10, i+1))
-                    #time.sleep(0.75) # just in case the next page hasn't finished loading
-                    wait.until(EC.visibility_of_element_located((By.CSS_SELECTOR, "div.container__headline.container_list-images-with-description__headline > span.container__headline-text")))
-                    page = BeautifulSoup(driver.page_source, features="lxml")
-                    links = [link["data-zjs-href"] for link in page.select("div.container__headline.container_list-images-with-description__headline > span.container__headline-text")]
-                    lock.acquire()
-                    article_links_cnn.extend(links)
-                    lock.release()
-                q.task_done()
-
-        q = Queue()
-        for i in range(self.n_threads):
-            worker = Thread(target=search_per_thread, args=(q, self.driver[i], ), daemon=True)
-            worker.start() 
+        article_links = [link["data-zjs-href"] for link in page.select("div.container__headline.container_list-images-with-description__headline > span.container__headline-text")]
 
-        num_pages = min(num_results//10+1, int(self.max_article_num//10))
-        chunk_size = (num_pages - 1) // self.n_threads + 1
-        page_chunks = [list(islice(range(1, num_pages), i * chunk_size, (i + 1) * chunk_size)) for i in range(self.n_threads)]
-        for chunk in page_chunks:
-            q.put(chunk)
+        # start turning pages - one task per search page, spread over the browsers by the scheduler
+        def search_page(i, driver, deadline):
+            driver.set_page_load_timeout(max(deadline - time.time(), 1))
+            url = search_url_prefix.format(self.search_keyword, i*10, i+1)
+            with self.rate_controller.request(url):
+                driver.get(url)
+            WebDriverWait(driver, 2).until(EC.visibility_of_element_located((By.CSS_SELECTOR, CNN_RESULT_SELECTOR)))
+            page = BeautifulSoup(driver.page_source, features="lxml")
+            return [link["data-zjs-href"] for link in page.select(CNN_RESULT_SELECTOR)]
 
-        q.join()
-        print(f"Searching finished, {len(article_links_cnn)} articles found on CNN...")
+        num_pages = min(num_results//10+1, int(self.max_article_num//10))
+        page_links, failed_pages = self.scheduler.run([(i, partial(search_page, i)) for i in range(1, num_pages)])
+        for i in sorted(page_links):
+            article_links.extend(page_links[i])
+        article_links = list(dict.fromkeys(article_links))
+        if failed_pages: print(f"Search pages {sorted(failed_pages)} failed to load")
+        print(f"Searching finished, {len(article_links)} articles found on CNN...")
 
-        return article_links_cnn
+        return article_links
 
     
     def scrape_foxnews(self):
@@ -193,72 +214,18 @@ class NewsScraper:
 
         :return: A pandas DataFrame containing scraped article details from Fox News.
         """
-        # Iterate through the links
-        article_links = self.search_foxnews(self.driver[0])
-        article_content = []
-        skipped_links = []
-        skipped_cnt = 0
-        junk_text = {"cyberguy.com", "click here"}
+        article_links = self.select_links(self.search_foxnews(self.driver[0]), "FoxNews")
         print("\nBegin scraping on FoxNews...")
-        # Get article contents from article urls
-        for article_num, url in enumerate(article_links):
-
-            # Get page
-            self.driver[0].get(url)
-            article_soup = BeautifulSoup(self.driver[0].page_source, features="lxml")
-
-            # Header info extraction, if page has no content, skip this article
-            header = article_soup.find("header", {"class":"article-header"})
-            if header is None:
-                print("\tArticle {} skipped due to invalid content - link: {}".format(article_num+1, url))
-                skipped_cnt += 1
-                skipped_links.append(url)
-                continue
-            
-            # Meta information scraping
-            publish_date = header.find("span",{"class":"article-date"}).text.strip("Published\n ").strip()
-            headline = header.find("h1",{"class":"headline"}).text.strip().replace(u'\xa0', u' ')
-
-            # Main Article Text scraping
-            main_text = []
-            for p in article_soup.select("div.article-body > p"):
-                    sent = p.text.strip().replace(u'\xa0', u' ')
-                    junk_sent_check = junk_text.intersection(set(sent.lower().split()))
-                    if not (len(junk_sent_check) > 0 or sent.isupper()):
-                        main_text.append(sent)
-            main_text = " ".join(main_text).replace(u'\xa0', u' ').replace("  "," ").strip()
-
-            # Check article validity
-            if len(main_text) < self.min_word_cnt: 
-                print("\tArticle {} skipped due to invalid content - link: {}".format(article_num+1, url))
-                skipped_links.append(url)
-                skipped_cnt += 1
-                continue
-            
-            # Append article information to the list
-            article_info = {
-                "publish_date": publish_date,
-                "headline": headline,
-                "main_text": main_text,
-                "media": "FoxNews",
-                "type": "article",
-                "url":url
-            }
-            article_content.append(article_info)
-            #os.system('cls') # Clear screen
-            print(f"\t{len(article_content)}/{len(article_links)} articles scraped, {skipped_cnt} skipped...")
-
-        if skipped_cnt: print(f"Skipped links in FoxNews: {skipped_links}")
+        # pages are loaded one after the other on the first browser and parsed by the same extractors as the other scrapers
+        results, errors = self.scrape_pages([(url, partial(self.scrape_foxnews_page, url)) for url in article_links])
+        results = resolve_records(results)
+        article_content, skipped_links = self.collect_records(article_links, results, errors, media = "FoxNews")
+        print(f"\t{len(article_links)-len(skipped_links)}/{len(article_links)} articles scraped, {len(skipped_links)} skipped...")
+        if skipped_links: print(f"Skipped links in FoxNews: {skipped_links}")
 
         # Parse scraped article infos to a dataframe
         df = pd.DataFrame(article_content)
-        #print(df)
-
-        # Save data to local
-        if self.save_to_local: 
-            df.to_excel(self.save_path+"foxnews.xlsx")
-            print(f"FoxNews data saved to {self.save_path}foxnews.xlsx.")
-
+        self.save_records(df, "foxnews.xlsx", "FoxNews")
         return df
     
     def scrape_cnn(self):
@@ -270,144 +237,40 @@ class NewsScraper:
 
         :return: A pandas DataFrame containing scraped article details from CNN.
         """
-        # Iterate through the links
-        article_links = self.search_cnn()
-        article_content = []
-        skipped_links = []
-        scraped_cnt, skipped_cnt = 0, 0
-        junk_text = {}
+        article_links = self.select_links(self.search_cnn(), "CNN")
+        irrelevant_links = [url for url in article_links if "live-news" not in url and is_irrelevant_cnn_link(url)]
         print("\nBegin scraping on CNN...")
-        # Get article contents from article urls
-        for article_num, url in enumerate(article_links):
-
-            if "live-news" in url:
-
-                try:
-                    self.driver[0].get(url)
-
-                    # Get scroll height
-                    last_height = self.driver[0].execute_script("return document.body.scrollHeight")
-
-                    i = 0
-                    while i < 200:
-
-                        # Scroll down to bottom
-                        self.driver[0].execute_script("window.scrollTo(0, document.body.scrollHeight);")
-
-                        # Wait to load page
-                        time.sleep(0.5)
-
-                        # Calculate new scroll height and compare with last scroll height
-                        new_height = self.driver[0].execute_script("return document.body.scrollHeight")
-                        if new_height == last_height:
-                            break
-                        last_height = new_height
-                        i += 1
-
-                except TimeoutException:
-                    print("\tArticle {} skipped due to invalid content - link: {}".format(article_num+1, url))
-                    skipped_cnt += 1
-                    skipped_links.append(url)
-                    continue
-
-                article_soup = BeautifulSoup(self.driver[0].page_source, features="lxml")
-                if article_soup is None:
-                    print("\tArticle {} skipped due to invalid content - link: {}".format(article_num+1, url))
-                    skipped_cnt += 1
-                    skipped_links.append(url)
-                    continue
-                main_text_sec = article_soup.find("div",{"class":'live-story__items-container'})
-                if main_text_sec is None:
-                    main_text_sec = article_soup.find("div",{"id":'posts-and-button'})
-                    if main_text_sec is None:
-                        print("\tArticle {} skipped due to invalid content - link: {}".format(article_num+1, url))
-                        skipped_cnt += 1
-                        skipped_links.append(url)
-                        continue
-                articles = main_text_sec.find_all("article")
-                num_skipped = 0
-                for i in articles:
-                    header = i.find("header")
-                    headline = header.find("h2").text.strip().replace(u'\xa0', u' ')
-                    publish_date = header.find("span").text.strip().replace(u'\xa0', u' ')
-                    main_text = " ".join([i.text.strip().replace(u'\xa0', u' ') for i in i.select("div > p")]).replace("  ", " ")
-                    if len(main_text) < self.min_word_cnt or headline is None or headline == "": continue
-                    if "From CNN" in publish_date or publish_date is None or publish_date == "": num_skipped += 1; continue
-                    article_info = {
-                        "publish_date": publish_date,
-                        "headline": headline,
-                        "main_text": main_text,
-                        "media": "CNN",
-                        "type": "live-news",
-                        "url":url
-                    }
-                    article_content.append(article_info)
-                if num_skipped == len(articles): skipped_cnt += 1; skipped_links.append(url)
-                scraped_cnt += 1
-            
-            elif "/reviews/" in url or "/cnn-underscored/" in url: # Promotions and advertisements of products
-                print("\tArticle {} skipped due to irrelevant content - link: {}".format(article_num+1, url))
-                skipped_cnt += 1
-                continue
+        for url in irrelevant_links:
+            print("\tArticle skipped due to irrelevant content - link: {}".format(url))
 
-            else:
-                
-                self.driver[0].get(url)
-                article_soup = BeautifulSoup(self.driver[0].page_source, features="lxml")
-
-                header = article_soup.find("div", {"class":"headline headline--has-lowertext"})
-                if header is None:
-                    print("\tArticle {} skipped due to invalid content - link: {}".format(article_num+1, url))
-                    skipped_links.append(url)
-                    skipped_cnt += 1
-                    continue
-                
-                # Meta Information scraping
-                head_wrapper = header.find("div", {"class":"headline__wrapper"})
-                headline = head_wrapper.find("h1", {"id":"maincontent"}).text.strip().replace(u'\xa0', u' ')
-                head_footer_set = header.find("div", {"class":"headline__sub-text"})
-                publish_date = head_footer_set.find("div", {"class":"timestamp"}).text.strip("Published Updated \n").replace(u'\xa0', u' ').replace("\n", "").replace("  "," ").replace("  "," ")
-
-                # Main Article Text scraping
-                main_text_sec = article_soup.find("div",{"class":"article__content"})
-                main_text = [i.text.strip().replace(u'\xa0', u' ') for i in main_text_sec.find_all("p", {"class":"paragraph inline-placeholder"})]
-                sub_header = [i.text.strip().replace(u'\xa0', u' ')+"." for i in main_text_sec.find_all("h2", {"class":"subheader"})]
-                main_text = " ".join(main_text + sub_header).replace("  ", " ").replace('  ', ' ').strip()
-
-                # Check article validity
-                if len(main_text) < self.min_word_cnt: 
-                    print("\tArticle {} skipped due to invalid content - link: {}".format(article_num+1, url))
-                    skipped_links.append(url)
-                    skipped_cnt += 1
-                    continue
-
-                # Append article information to the list
-                article_info = {
-                    "publish_date": publish_date,
-                    "headline": headline,
-                    "main_text": main_text,
-                    "media": "CNN",
-                    "type": "article",
-                    "url":url
-                }
-                article_content.append(article_info)
-                scraped_cnt += 1
-            
-            print(f"\t{scraped_cnt}/{len(article_links)} articles scraped, {skipped_cnt} skipped...")
-
-        if skipped_cnt: print(f"Skipped links: {skipped_links}")
+        scraped_links = [url for url in article_links if url not in irrelevant_links]
+        results, errors = self.scrape_pages([(url, partial(self.scrape_cnn_page, url)) for url in scraped_links])
+        results = resolve_records(results)
+        article_content, skipped_links = self.collect_records(scraped_links, results, errors, irrelevant_links, media = "CNN")
+        print(f"\t{len(article_links)-len(skipped_links)}/{len(article_links)} articles scraped, {len(skipped_links)} skipped...")
+        if skipped_links: print(f"Skipped links: {skipped_links}")
 
         # Parse scraped article infos to a dataframe
         df = pd.DataFrame(article_content)
-        #print(df)
+        self.save_records(df, "cnn.xlsx", "CNN")
+        return df
 
-        # Save data to local
-        if self.save_to_local: 
-            df.to_excel(self.save_path+"cnn.xlsx")
-            print(f"CNN data saved to {self.save_path}cnn.xlsx.")
+    def scrape_pages(self, tasks):
+        """
+        Runs scheduler tasks (key, handler(driver, deadline)) one after the other on the first browser, for the non-threaded
+        scrapers. A failing task is reported and skipped, without the retries of WorkStealingScheduler.
+
+        :return: A dict of key -> result of the tasks that succeeded and a dict of key -> error of the failed ones.
+        """
+        results, errors = {}, {}
+        for num, (key, handler) in enumerate(tasks):
+            try:
+                results[key] = handler(self.driver[0], time.time() + self.scheduler.task_timeout)
+            except Exception as e:
+                errors[key] = f"{type(e).__name__}: {e}"
+                print("\tArticle {} skipped due to {} - link: {}".format(num+1, type(e).__name__, key))
+        return results, errors
 
-        return df
-    
     def scrape_foxnews_threaded(self):
         """
         Scrapes articles from Fox News based on URLs retrieved from the search_foxnews method. Extracts publication date, headline, 
@@ -415,109 +278,22 @@ class NewsScraper:
 
         :return: A pandas DataFrame containing scraped article details from Fox News.
         """
-        # Iterate through the links
-        global article_links, skipped_links, skipped_cnt, junk_text
-        article_links = self.search_fox
+        article_links = self.search_fox if self.search_fox else self.search_foxnews(self.driver[0])
         print(f"\nSearching Pre-loaded...{len(article_links)} articles found on FoxNews...")
-        article_content = []
-        skipped_links = []
-        skipped_cnt = 0
-        junk_text = {"cyberguy.com", "click here"}
+        article_links = self.select_links(article_links, "FoxNews")
         print("\nBegin scraping on FoxNews...")
-        # Get article contents from article urls
-        lock = Lock()
-        def scrape_per_thread(q, driver):
-            global skipped_cnt
-            while True:
-                chunk = q.get()
-                for article_num, url in enumerate(chunk):
-
-                    # Get page
-                    try:
-                        time.sleep(random.uniform(0.3, 0.7))
-                        driver.get(url)
-                        article_soup = BeautifulSoup(driver.page_source, features="lxml")
-                    except TimeoutException:
-                        print("\tArticle skipped due to invalid content - link: {}".format(url))
-                        lock.acquire()
-                        skipped_cnt += 1
-                        skipped_links.append(url)
-                        lock.release()
-                        continue
-
-                    # Header info extraction, if page has no content, skip this article
-                    header = article_soup.find("header", {"class":"article-header"})
-                    if header is None:
-                        print("\tArticle skipped due to invalid content - link: {}".format(url))
-                        lock.acquire()
-                        skipped_cnt += 1
-                        skipped_links.append(url)
-                        lock.release()
-                        continue
-                    
-                    # Meta information scraping
-                    publish_date = header.find("span",{"class":"article-date"}).text.strip("Published\n ").strip()
-                    headline = header.find("h1",{"class":"headline"}).text.strip().replace(u'\xa0', u' ')
-
-                    # Main Article Text scraping
-                    main_text = []
-                    for p in article_soup.select("div.article-body > p"):
-                        sent = p.text.strip()
-                        if not any(junk.lower() in sent.lower() for junk in junk_text) and not sent.isupper():
-                            main_text.append(sent)
-                    main_text = re.sub(r'[\xa0]+|\s{2,}', ' ', ' '.join(main_text)).strip()
-
-                    # Check article validity
-                    if len(main_text) < self.min_word_cnt: 
-                        print("\tArticle skipped due to invalid content - link: {}".format(url))
-                        lock.acquire()
-                        skipped_links.append(url)
-                        skipped_cnt += 1
-                        lock.release()
-                        continue
-                    
-                    # Append article information to the list
-                    article_info = {
-                        "publish_date": publish_date,
-                        "headline": headline,
-                        "main_text": main_text,
-                        "media": "FoxNews",
-                        "type": "article",
-                        "url":url
-                    }
-                    lock.acquire()
-                    article_content.append(article_info)
-                    lock.release()
-                    #os.system('cls') # Clear screen
-                    print(f"\t{len(article_content)}/{len(article_links)} articles scraped, {skipped_cnt} skipped...")
-                q.task_done()
-
-        # Multi-threading
-        q = Queue()
-        for i in range(self.n_threads):
-            worker = Thread(target=scrape_per_thread, args=(q, self.driver[i], ), daemon=True)
-            worker.start() 
-
-        num_pages = len(article_links)
-        chunk_size = num_pages // self.n_threads
-        remainder = num_pages % self.n_threads
-        page_chunks = [article_links[i * chunk_size + min(i, remainder) : (i + 1) * chunk_size + min(i + 1, remainder)] for i in range(self.n_threads)]
-        for chunk in page_chunks:
-            q.put(chunk)
-
-        q.join()
-        # After scraping
-        if skipped_cnt: print(f"Skipped links in FoxNews: {skipped_links}")
+
+        # one task per article, idle browsers steal from the busy ones and hand the html over to the parsers
+        results, errors = self.scheduler.run([(url, partial(self.scrape_foxnews_page, url)) for url in article_links])
+        results = resolve_records(results)
+        article_content, skipped_links = self.collect_records(article_links, results, errors, media = "FoxNews")
+        print(f"\t{len(article_links)-len(skipped_links)}/{len(article_links)} articles scraped, {len(skipped_links)} skipped...")
+        if skipped_links: print(f"Skipped links in FoxNews: {skipped_links}")
+        print(f"Pacing per domain:\n{self.rate_controller.summary()}")
 
         # Parse scraped article infos to a dataframe
         df = pd.DataFrame(article_content)
-        #print(df)
-
-        # Save data to local
-        if self.save_to_local: 
-            df.to_excel(self.save_path+"foxnews.xlsx")
-            print(f"FoxNews data saved to {self.save_path}foxnews.xlsx.")
-
+        self.save_records(df, "foxnews.xlsx", "FoxNews")
         return df
     
     def scrape_cnn_threaded(self):
@@ -529,214 +305,262 @@ class NewsScraper:
 
         :return: A pandas DataFrame containing scraped article details from CNN.
         """
-        # Iterate through the links
-        global article_links, skipped_links, scraped_cnt, skipped_cnt
-        article_links = self.search_cnn_threaded()
-        article_content = []
-        skipped_links = []
-        scraped_cnt, skipped_cnt = 0, 0
-        junk_text = {}
+        article_links = self.select_links(self.search_cnn_threaded(), "CNN")
+        irrelevant_links = [url for url in article_links if "live-news" not in url and is_irrelevant_cnn_link(url)]
         print("\nBegin scraping on CNN...")
+        for url in irrelevant_links:
+            print("\tArticle skipped due to irrelevant content - link: {}".format(url))
+
+        # one task per article, plus the Fox News search to pre-load for scrape_foxnews_threaded
+        tasks = [(url, partial(self.scrape_cnn_page, url)) for url in article_links if url not in irrelevant_links]
+        tasks.append(("foxnews-search", lambda driver, deadline: self.search_foxnews(driver, verbose = False, deadline = deadline)))
+        results, errors = self.scheduler.run(tasks)
+        results = resolve_records(results)
+        self.search_fox = results.pop("foxnews-search", [])
+
+        scraped_links = [url for url in article_links if url not in irrelevant_links]
+        article_content, skipped_links = self.collect_records(scraped_links, results, errors, irrelevant_links, media = "CNN")
+        print(f"\t{len(article_links)-len(skipped_links)}/{len(article_links)} articles scraped, {len(skipped_links)} skipped...")
+        if skipped_links: print(f"Skipped links: {skipped_links}")
+        print(f"Pacing per domain:\n{self.rate_controller.summary()}")
+
+        # Parse scraped article infos to a dataframe
+        df = pd.DataFrame(article_content)
+        self.save_records(df, "cnn.xlsx", "CNN")
+        return df
+
+    def scrape_foxnews_page(self, url, driver, deadline):
+        """
+        Scheduler task scraping one Fox News article with a browser.
+
+        :return: A Future of the list of article records of the page, see resolve_records.
+        """
+        # paced by the per-domain limiter instead of a fixed random sleep
+        driver.set_page_load_timeout(max(deadline - time.time(), 1))
+        with self.rate_controller.request(url):
+            driver.get(url)
+        return self.parse_page(extract_foxnews_article, driver.page_source, url, "FoxNews")
+
+    def scrape_cnn_page(self, url, driver, deadline):
+        """
+        Scheduler task scraping one CNN page with a browser, live-news pages are scrolled through until the deadline.
+
+        :return: A Future of the list of article records of the page, see resolve_records.
+        """
+        if "live-news" in url:
+            return self.parse_page(extract_cnn_live, self.load_live_page(driver, url, deadline), url, "CNN")
+        driver.set_page_load_timeout(max(min(deadline - time.time(), 15), 1))
+        with self.rate_controller.request(url):
+            driver.get(url)
+        return self.parse_page(extract_cnn_article, driver.page_source, url, "CNN")
+
+    def parse_page(self, extractor, html, url, media):
+        """
+        Stores a fetched page in the page cache, if any, and hands it to the parsing pipeline.
+
+        :return: A Future of the list of article records of the page.
+        """
+        if self.page_cache is not None:
+            self.page_cache.put(url, html, media)
+        return self.watch_records(self.parser.submit(extractor, html, url, self.min_word_cnt), media)
+
+    async def parse_page_async(self, extractor, html, url, media):
+        """
+        Coroutine version of parse_page for the async fetcher, waits for a free parser slot without blocking the event loop.
 
-        lock = Lock()
-        def scrape_per_thread(q, i, driver):
-            while True:
-                global scraped_cnt, skipped_cnt
-                # Pre-load the search results for fox news using the last driver to do the job
-                if i == self.n_threads-1: 
-                    self.search_fox = self.search_foxnews(driver, verbose = False)
-                # Other drivers scrape the articles
-                else:
-                    chunk = q.get()
-                    # Get article contents from article urls
-                    for article_num, url in enumerate(chunk):
-
-                        if "live-news" in url:
-
-                            try:
-                                #time.sleep(random.uniform(0.05, 0.1))
-                                driver.set_page_load_timeout(10)
-                                driver.get(url)
-
-                                # Get scroll height
-                                last_height = driver.execute_script("return document.body.scrollHeight")
-
-                                i = 0
-                                while i < 100:
-
-                                    # Scroll down to bottom
-                                    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-
-                                    # Wait to load page
-                                    time.sleep(random.uniform(0.1, 0.2))
-
-                                    # Calculate new scroll height and compare with last scroll height
-                                    new_height = driver.execute_script("return document.body.scrollHeight")
-                                    if new_height == last_height:
-                                        break
-                                    last_height = new_height
-                                    i += 1
-
-                            except TimeoutException:
-                                print("\tArticle skipped due to invalid content - link: {}".format(url))
-                                lock.acquire()
-                                skipped_cnt += 1
-                                skipped_links.append(url)
-                                lock.release()
-                                continue
-
-                            article_soup = BeautifulSoup(driver.page_source, features="lxml")
-                            if article_soup is None:
-                                print("\tArticle skipped due to invalid content - link: {}".format(url))
-                                lock.acquire()
-                                skipped_cnt += 1
-                                skipped_links.append(url)
-                                lock.release()
-                                continue
-                            main_text_sec = article_soup.find("div",{"class":'live-story__items-container'})
-                            if main_text_sec is None:
-                                main_text_sec = article_soup.find("div",{"id":'posts-and-button'})
-                                if main_text_sec is None:
-                                    print("\tArticle {} skipped due to invalid content - link: {}".format(article_num+1, url))
-                                    lock.acquire()
-                                    skipped_cnt += 1
-                                    skipped_links.append(url)
-                                    lock.release()
-                                    continue
-                            articles = main_text_sec.find_all("article")
-                            num_skipped = 0
-                            for i in articles:
-                                header = i.find("header")
-                                headline = header.find("h2").text.strip().replace(u'\xa0', u' ')
-                                publish_date = header.find("span").text.strip().replace(u'\xa0', u' ')
-                                main_text = re.sub(r'[\xa0\n\t]+|\s{2,}', ' ', " ".join([i.text for i in i.select("div > p")])).replace("  "," ").strip()
-                                if len(main_text) < self.min_word_cnt or headline is None or headline == "": continue
-                                if "From CNN" in publish_date or publish_date is None or publish_date == "": lock.acquire(); num_skipped += 1; lock.release(); continue
-                                article_info = {
-                                    "publish_date": publish_date,
-                                    "headline": headline,
-                                    "main_text": main_text,
-                                    "media": "CNN",
-                                    "type": "live-news",
-                                    "url":url
-                                }
-                                lock.acquire()
-                                article_content.append(article_info)
-                                lock.release()
-                            if num_skipped == len(articles): lock.acquire(); skipped_cnt += 1; skipped_links.append(url); lock.release()
-                            lock.acquire()
-                            scraped_cnt += 1
-                            lock.release()
-                        
-                        elif "/reviews/" in url or "/cnn-underscored/" in url: # Promotions and advertisements of products
-                            print("\tArticle skipped due to irrelevant content - link: {}".format(url))
-                            lock.acquire()
-                            skipped_cnt += 1
-                            skipped_links.append(url)
-                            lock.release()
-                            continue
-
-                        else:
-                            #time.sleep(random.uniform(0.25, 0.5))
-                            try:
-                                driver.set_page_load_timeout(15)
-                                driver.get(url)
-                                article_soup = BeautifulSoup(driver.page_source, features="lxml")
-                            except TimeoutException:
-                                print("\tArticle skipped due to invalid content - link: {}".format(url))
-                                lock.acquire()
-                                skipped_cnt += 1
-                                skipped_links.append(url)
-                                lock.release()
-                                continue
-
-                            header = article_soup.find("div", {"class":"headline headline--has-lowertext"})
-                            if header is None:
-                                print("\tArticle skipped due to invalid content - link: {}".format(url))
-                                lock.acquire()
-                                skipped_links.append(url)
-                                skipped_cnt += 1
-                                lock.release()
-                                continue
-                            
-                            # Meta Information scraping
-                            head_wrapper = header.find("div", {"class":"headline__wrapper"})
-                            headline = head_wrapper.find("h1", {"id":"maincontent"}).text.strip().replace(u'\xa0', u' ')
-                            head_footer_set = header.find("div", {"class":"headline__sub-text"})
-                            publish_date = re.sub(r'^(Published|Updated|\n|\s)+|[\xa0\n]+|\s{2,}', ' ', head_footer_set.find("div", {"class":"timestamp"}).text).strip()
-
-                            # Main Article Text scraping
-                            main_text_sec = article_soup.find("div",{"class":"article__content"})
-                            main_text = [i.text for i in main_text_sec.find_all("p", {"class":"paragraph inline-placeholder"})]
-                            main_text = re.sub(r'[\xa0\n\t]+|\s{2,}', ' ', " ".join(main_text)).replace("  "," ").strip()
-
-                            # Check article validity
-                            if len(main_text) < self.min_word_cnt: 
-                                print("\tArticle skipped due to invalid content - link: {}".format(url))
-                                lock.acquire()
-                                skipped_links.append(url)
-                                skipped_cnt += 1
-                                lock.release()
-                                continue
-
-                            # Append article information to the list
-                            article_info = {
-                                "publish_date": publish_date,
-                                "headline": headline,
-                                "main_text": main_text,
-                                "media": "CNN",
-                                "type": "article",
-                                "url":url
-                            }
-                            lock.acquire()
-                            article_content.append(article_info)
-                            scraped_cnt += 1
-                            lock.release()
-                        
-                        print(f"\t{scraped_cnt}/{len(article_links)} articles scraped, {skipped_cnt} skipped...")
-                    q.task_done()
-
-        # Multi-threading
-        q = Queue()
-        for i in range(self.n_threads):
-            worker = Thread(target=scrape_per_thread, args=(q, i, self.driver[i], ), daemon=True)
-            worker.start() 
-
-        num_pages = len(article_links)
-        chunk_size = num_pages // (self.n_threads-1)
-        remainder = num_pages % (self.n_threads-1)
-        page_chunks = [article_links[i * chunk_size + min(i, remainder) : (i + 1) * chunk_size + min(i + 1, remainder)] for i in range(self.n_threads-1)]
-
-        # Redistribute chunk size and set less space for the last chunk
-        # page_chunks = [article_links[i * chunk_size + min(i, remainder) : (i + 1) * chunk_size + min(i + 1, remainder)] for i in range(self.n_threads - 1)]
-        # last_chunk = article_links[(self.n_threads - 1) * chunk_size + remainder:]
-        # page_chunks.append(last_chunk)
-
-        for chunk in page_chunks:
-            q.put(chunk)
-
-        q.join()
-
-        # Scraping finished
-        if skipped_cnt: print(f"Skipped links: {skipped_links}")
+        :return: A Future of the list of article records of the page.
+        """
+        if self.page_cache is not None:
+            self.page_cache.put(url, html, media)
+        return self.watch_records(await self.parser.submit_async(extractor, html, url, self.min_word_cnt), media)
+
+    def watch_records(self, future, media):
+        if self.save_to_local and self.output_format != "xlsx":
+            future.add_done_callback(partial(self.stream_records, media))
+        return future
+
+    def record_writer(self, media):
+        if media not in self.record_writers:
+            self.record_writers[media] = RecordWriter(os.path.join(self.save_path, "records"), media, self.batch_size, self.output_format)
+        return self.record_writers[media]
+
+    def stream_records(self, media, future):
+        # appends the records of a parsed page to the shards as soon as they are extracted
+        if future.exception() is None and future.result():
+            self.record_writer(media).write(future.result())
+
+    def load_live_page(self, driver, url, deadline = None):
+        """
+        Loads a live-news page with Selenium and scrolls down to the page bottom until no more news blogs get loaded,
+        or max_article_num of them are.
+
+            @ deadline: time.time() after which the scrolling stops and the page is taken as loaded so far. Defaults to None.
+
+        :return: The page html, raises TimeoutException if the page itself did not load.
+        """
+        driver.set_page_load_timeout(10)
+        with self.rate_controller.request(url):
+            driver.get(url)
+        scroll_until(driver, CNN_LIVE_POST_SELECTOR, target_count=self.max_article_num, deadline=deadline)
+        return driver.page_source
+
+    def fetch_and_extract(self, urls, extractor, media = None):
+        """
+        Fetches static pages concurrently with the pooled HTTP client and hands each page to the parsing pipeline as soon as it arrives.
+
+            @ urls: List of article urls.
+            @ extractor: One of the extract_* functions, called with (html, url, min_word_cnt).
+            @ media: Site of the pages, "FoxNews" or "CNN", as stored in the page cache. Defaults to None.
+
+        :return: A dict of url -> article records of the fetched pages (empty for invalid ones) and a dict of url -> error of the failed ones.
+        """
+        futures, errors = {}, {}
+        async def on_result(result):
+            if result.html is None:
+                errors[result.url] = result.error
+                print("\tArticle skipped due to {} - link: {}".format(result.error, result.url))
+                return
+            # waits for a parser slot without blocking the event loop, the other downloads go on meanwhile
+            futures[result.url] = await self.parse_page_async(extractor, result.html, result.url, media)
+        self.fetcher.fetch_all(urls, callback=on_result)
+        results = resolve_records(futures)
+        for url, records in results.items():
+            if not records:
+                print("\tArticle skipped due to invalid content - link: {}".format(url))
+        return results, errors
+
+    def select_links(self, article_links, media):
+        """
+        With a crawl index, keeps only the links that are new, failed before or are due for a refresh.
+
+        :return: The list of links to fetch.
+        """
+        if self.crawl_index is None:
+            return article_links
+        selected, skipped = self.crawl_index.select(article_links, self.refresh_after)
+        print(f"Crawl index: fetching {len(selected)}/{len(article_links)} {media} links, already known: {skipped}")
+        return selected
+
+    def collect_records(self, urls, results, errors, irrelevant_links = (), media = None):
+        """
+        Gathers the article records of the scraped urls in link order and, with a crawl index, records the outcome of every url.
+        Pages refetched with unchanged content are left out, they are already in the saved data.
+
+        :return: The list of article records and the list of skipped links.
+        """
+        article_content, skipped_links = [], []
+        for url in urls:
+            records = results.get(url, [])
+            if not records:
+                skipped_links.append(url)
+            if self.crawl_index is None:
+                article_content.extend(records)
+                continue
+            if url not in results:
+                self.crawl_index.record(url, ERROR, media=media, error=errors.get(url), commit=False)
+            elif not records:
+                self.crawl_index.record(url, EMPTY, media=media, commit=False)
+            else:
+                if self.crawl_index.is_changed(url, records):
+                    article_content.extend(records)
+                self.crawl_index.record(url, OK, records, media=media, commit=False)
+        if self.crawl_index is not None:
+            for url in irrelevant_links:
+                self.crawl_index.record(url, IRRELEVANT, media=media, commit=False)
+            self.crawl_index.commit()
+        return article_content, skipped_links + list(irrelevant_links)
+
+    def save_records(self, df, file_name, media):
+        """
+        Saves the scraped records to the data folder. With a crawl index the file is updated instead of overwritten:
+        rows of urls scraped in this run replace their old rows and all other rows are kept. With a streamed output_format
+        this only flushes the shard writer.
+        """
+        if not self.save_to_local:
+            return
+        if self.output_format != "xlsx":
+            # the records were streamed while scraping, only the last partial batch is left
+            writer = self.record_writer(media)
+            writer.flush()
+            print(f"{media} data streamed to {writer.folder} ({writer.num_records} records in {writer.num_shards} shards).")
+            return
+        path = self.save_path + file_name
+        if self.crawl_index is not None and os.path.exists(path):
+            old_df = pd.read_excel(path, index_col=0)
+            if len(df):
+                old_df = old_df[~old_df["url"].isin(df["url"])]
+            df = pd.concat([old_df, df], ignore_index=True)
+        df.to_excel(path)
+        print(f"{media} data saved to {path}.")
+
+    def scrape_foxnews_async(self):
+        """
+        Scrapes articles from Fox News like scrape_foxnews, but fetches the article pages with the async HTTP client instead of
+        Chrome. The search still runs in Selenium since the 'Show More' button needs JavaScript.
+
+        :return: A pandas DataFrame containing scraped article details from Fox News.
+        """
+        article_links = self.search_fox if self.search_fox else self.search_foxnews(self.driver[0])
+        article_links = self.select_links(article_links, "FoxNews")
+        print("\nBegin scraping on FoxNews...")
+        st = time.time()
+        results, errors = self.fetch_and_extract(article_links, extract_foxnews_article, "FoxNews")
+        article_content, skipped_links = self.collect_records(article_links, results, errors, media = "FoxNews")
+        print(f"\t{len(article_links)-len(skipped_links)}/{len(article_links)} articles scraped, {len(skipped_links)} skipped in {time.time()-st:.2f}s...")
+        if skipped_links: print(f"Skipped links in FoxNews: {skipped_links}")
+        print(f"Pacing per domain:\n{self.rate_controller.summary()}")
 
         # Parse scraped article infos to a dataframe
         df = pd.DataFrame(article_content)
-        #print(df)
+        self.save_records(df, "foxnews.xlsx", "FoxNews")
+        return df
+
+    def scrape_cnn_async(self):
+        """
+        Scrapes articles from CNN like scrape_cnn, but fetches the regular article pages with the async HTTP client.
+        Selenium is only used for the search pagination and the live-news pages, which are rendered by JavaScript.
 
-        # Save data to local
-        if self.save_to_local: 
-            df.to_excel(self.save_path+"cnn.xlsx")
-            print(f"CNN data saved to {self.save_path}cnn.xlsx.")
+        :return: A pandas DataFrame containing scraped article details from CNN.
+        """
+        article_links = self.search_cnn_threaded() if self.threaded else self.search_cnn()
+        article_links = self.select_links(article_links, "CNN")
+        live_links = [url for url in article_links if "live-news" in url]
+        irrelevant_links = [url for url in article_links if "live-news" not in url and is_irrelevant_cnn_link(url)]
+        static_links = [url for url in article_links if "live-news" not in url and not is_irrelevant_cnn_link(url)]
+        print("\nBegin scraping on CNN...")
+        for url in irrelevant_links:
+            print("\tArticle skipped due to irrelevant content - link: {}".format(url))
+
+        # Regular articles through the HTTP client
+        st = time.time()
+        results, errors = self.fetch_and_extract(static_links, extract_cnn_article, "CNN")
+        print(f"\t{sum(bool(r) for r in results.values())}/{len(static_links)} articles scraped in {time.time()-st:.2f}s...")
+
+        # live-news pages need a browser to scroll through, spread over all browsers
+        live_results, live_errors = self.scheduler.run([(url, partial(self.scrape_cnn_page, url)) for url in live_links])
+        results.update(resolve_records(live_results))
+        errors.update(live_errors)
+        article_content, skipped_links = self.collect_records(static_links + live_links, results, errors, irrelevant_links, media = "CNN")
+        if skipped_links: print(f"Skipped links: {skipped_links}")
+        print(f"Pacing per domain:\n{self.rate_controller.summary()}")
 
+        # Parse scraped article infos to a dataframe
+        df = pd.DataFrame(article_content)
+        self.save_records(df, "cnn.xlsx", "CNN")
         return df
 
     def close(self):
         """
         Closes the web browser session controlled by the webdriver.
         """
-        for i in range(self.n_threads):
-            self.driver[i].close()
+        self.driver_pool.close()
+        self.parser.close()
+        for writer in self.record_writers.values():
+            writer.close()
+        if self.page_cache is not None:
+            self.page_cache.close()
+        if self.crawl_index is not None:
+            self.crawl_index.close()
 
 
 
@@ -747,11 +571,16 @@ if __name__ == "__main__":
 
     # Start scraper
     start_time = time.time()
-    scraper = NewsScraper(search_keyword=search_key, driver_path="./webdriver/chromedriver.exe", n_threads = 17, max_article_num = 300, min_word_cnt_per_article = 10, save_to_local = True, data_save_path="./data/")
+    # The async scrapers only need a few browsers for the search pages and live-news, the articles go through one HTTP client
+    scraper = NewsScraper(search_keyword=search_key, driver_path="./webdriver/chromedriver.exe", n_threads = 4, max_article_num = 300, min_word_cnt_per_article = 10, save_to_local = True, data_save_path="./data/",
+                          max_concurrency = 32, fetch_timeout = 15, index_path = "./data/crawl_index.sqlite")
 
     # Scrape FoxNews and CNN
-    cnn_df = scraper.scrape_cnn_threaded()
-    foxnews_df = scraper.scrape_foxnews_threaded()
+    cnn_df = scraper.scrape_cnn_async()
+    foxnews_df = scraper.scrape_foxnews_async()
+    # Selenium only version, needs a browser per thread (n_threads = 17)
+    # cnn_df = scraper.scrape_cnn_threaded()
+    # foxnews_df = scraper.scrape_foxnews_threaded()
 
     # Close the scraper after usage
     scraper.close()
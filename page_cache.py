@@ -0,0 +1,161 @@
+import os
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+import pandas as pd
+from news_extractors import extractor_for
+from news_pipeline import ParsePipeline, resolve_records
+
+# Compressed raw page cache for offline re-extraction
+# Every page_source the scrapers fetch is stored zlib-compressed under the sha256 of its html, so a page that did not
+# change between two crawls is stored once. A SQLite table maps (url, fetch time) to the blob, which keeps every
+# snapshot of a page. Once the blobs outgrow max_bytes the ones last fetched longest ago are evicted. replay() reruns the
+# extractors on the latest snapshots without any browser or network, e.g. after a layout change or an extractor fix.
+
+class PageCache:
+    def __init__(self, path="./data/page_cache", max_bytes=2 * 1024 ** 3, compression_level=6):
+        """
+            Opens (or creates) the page cache.
+
+                @ path: Folder of the cache, holds index.sqlite and the blobs. Defaults to "./data/page_cache".
+                @ max_bytes: Maximum compressed size of the cached pages, None never evicts. Defaults to 2 GiB.
+                @ compression_level: zlib level of the blobs. Defaults to 6.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.compression_level = compression_level
+        os.makedirs(os.path.join(path, "blobs"), exist_ok=True)
+        # the scheduler threads store pages concurrently
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(path, "index.sqlite"), check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                last_fetched REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                media TEXT,
+                digest TEXT NOT NULL,
+                PRIMARY KEY (url, fetched_at)
+            );
+            CREATE INDEX IF NOT EXISTS pages_digest ON pages (digest);""")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def blob_path(self, digest):
+        # two-level fan-out keeps the folders small
+        return os.path.join(self.path, "blobs", digest[:2], digest + ".z")
+
+    def put(self, url, html, media=None, fetched_at=None):
+        """
+            Stores one fetched page.
+
+            :return: The content digest of the page.
+        """
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        data = html.encode("utf-8", errors="replace")
+        digest = hashlib.sha256(data).hexdigest()
+        with self.lock:
+            known = self.conn.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            if known is None:
+                blob = zlib.compress(data, self.compression_level)
+                path = self.blob_path(digest)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # write to a temporary file first so that a crash never leaves a truncated blob behind
+                with open(path + ".tmp", "wb") as f:
+                    f.write(blob)
+                os.replace(path + ".tmp", path)
+                self.conn.execute("INSERT INTO blobs (digest, size, last_fetched) VALUES (?, ?, ?)", (digest, len(blob), fetched_at))
+                self.total_bytes += len(blob)
+            else:
+                self.conn.execute("UPDATE blobs SET last_fetched = MAX(last_fetched, ?) WHERE digest = ?", (fetched_at, digest))
+            self.conn.execute("INSERT OR REPLACE INTO pages (url, fetched_at, media, digest) VALUES (?, ?, ?, ?)",
+                              (url, fetched_at, media, digest))
+            if self.max_bytes is not None and self.total_bytes > self.max_bytes:
+                self.evict(self.max_bytes)
+            self.conn.commit()
+        return digest
+
+    def evict(self, max_bytes):
+        # drop the blobs last fetched longest ago, together with the snapshots pointing at them, until under max_bytes
+        excess = self.total_bytes - max_bytes
+        for digest, size in self.conn.execute("SELECT digest, size FROM blobs ORDER BY last_fetched").fetchall():
+            if excess <= 0:
+                break
+            self.conn.execute("DELETE FROM pages WHERE digest = ?", (digest,))
+            self.conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            try:
+                os.remove(self.blob_path(digest))
+            except FileNotFoundError:
+                pass
+            self.total_bytes -= size
+            excess -= size
+
+    def read(self, digest):
+        with open(self.blob_path(digest), "rb") as f:
+            return zlib.decompress(f.read()).decode("utf-8")
+
+    def get(self, url, before=None):
+        """
+            Returns the html of the latest snapshot of a url, or of the latest one fetched at or before `before`, None if not cached.
+        """
+        query = "SELECT digest FROM pages WHERE url = ? AND fetched_at <= ? ORDER BY fetched_at DESC LIMIT 1"
+        with self.lock:
+            row = self.conn.execute(query, (url, float("inf") if before is None else before)).fetchone()
+        return None if row is None else self.read(row[0])
+
+    def snapshots(self, media=None, before=None):
+        # (url, media, digest) of the latest snapshot of every url, in url order
+        query = """
+            SELECT url, media, digest FROM pages p
+            WHERE fetched_at = (SELECT MAX(fetched_at) FROM pages WHERE url = p.url AND fetched_at <= ?)
+            AND (? IS NULL OR media = ?)
+            ORDER BY url"""
+        with self.lock:
+            return self.conn.execute(query, (float("inf") if before is None else before, media, media)).fetchall()
+
+    def pages(self, media=None, before=None):
+        """
+            Iterates over the latest snapshot of every cached url, e.g. as the corpus of news_pipeline.benchmark_parsing.
+
+            :return: A generator of (url, html) pairs.
+        """
+        for url, _, digest in self.snapshots(media, before):
+            yield url, self.read(digest)
+
+    def stats(self):
+        with self.lock:
+            num_pages, num_urls = self.conn.execute("SELECT COUNT(*), COUNT(DISTINCT url) FROM pages").fetchone()
+            num_blobs = self.conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
+        return {"urls": num_urls, "snapshots": num_pages, "blobs": num_blobs, "bytes": self.total_bytes}
+
+    def close(self):
+        self.conn.close()
+
+def replay(cache, media, min_word_cnt=10, parse_workers=0, before=None):
+    """
+        Reruns extraction on the cached pages of one site, without any browser or network.
+
+            @ cache: PageCache or its path.
+            @ media: "FoxNews" or "CNN".
+            @ min_word_cnt: Minimum word count per article, as min_word_cnt_per_article of NewsScraper. Defaults to 10.
+            @ parse_workers: Number of parsing processes, as in NewsScraper. Defaults to 0.
+            @ before: Replay the snapshots as of this time.time(), None takes the latest ones. Defaults to None.
+
+        :return: A pandas DataFrame of the article records, like the scrape_* methods return.
+    """
+    if isinstance(cache, str):
+        cache = PageCache(cache)
+    futures = {}
+    with ParsePipeline(parse_workers) as pipeline:
+        for url, html in cache.pages(media, before):
+            extractor = extractor_for(url, media)
+            if extractor is not None:
+                futures[url] = pipeline.submit(extractor, html, url, min_word_cnt)
+        results = resolve_records(futures)
+    return pd.DataFrame([record for records in results.values() for record in records])
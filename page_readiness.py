@@ -0,0 +1,127 @@
+import time
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+
+# Event-driven readiness of JavaScript-rendered pages
+# Instead of sleeping a fixed time after every scroll or click and comparing scrollHeight, the page gets a
+# MutationObserver that records when its DOM last changed, and WebDriverWait polls one script returning the number of
+# items (search results, live-news posts), the time since the last mutation and the number of network requests completed.
+# A scroll or click is done as soon as the item count grows; it is given up once the DOM and the network have been quiet
+# for quiet_period seconds without new items (end of the feed), or after timeout. Loading stops at target_count items.
+
+# installs the observer once per document, survives repeated calls
+OBSERVER_JS = """
+if (!window.__readiness) {
+    window.__readiness = {mutations: 0, last: performance.now()};
+    new MutationObserver(function(records) {
+        window.__readiness.mutations += records.length;
+        window.__readiness.last = performance.now();
+    }).observe(document.documentElement, {childList: true, subtree: true});
+}
+"""
+
+# [item count, ms since the last DOM mutation, number of completed resource requests]
+STATE_JS = """
+var r = window.__readiness;
+return [document.querySelectorAll(arguments[0]).length,
+        r ? performance.now() - r.last : 0,
+        performance.getEntriesByType("resource").length];
+"""
+
+SCROLL_JS = "window.scrollTo(0, document.body.scrollHeight);"
+
+def page_state(driver, item_selector):
+    count, quiet_ms, num_requests = driver.execute_script(STATE_JS, item_selector)
+    return int(count), quiet_ms / 1000, int(num_requests)
+
+def count_items(driver, item_selector):
+    return page_state(driver, item_selector)[0]
+
+def wait_for_growth(driver, item_selector, count, timeout=5.0, quiet_period=0.5, poll=0.05):
+    """
+        Waits until more than `count` items match item_selector, or the page settled without new ones: for quiet_period
+        seconds, counted from the call at the earliest, no DOM mutation happened and no network request completed.
+
+        :return: The item count when the wait ended.
+    """
+    last = {"num_requests": None, "changed": time.monotonic(), "count": count}
+    def grown_or_settled(driver):
+        new_count, quiet, num_requests = page_state(driver, item_selector)
+        if num_requests != last["num_requests"]:
+            last["num_requests"], last["changed"] = num_requests, time.monotonic()
+        last["count"] = new_count
+        settled = quiet >= quiet_period and time.monotonic() - last["changed"] >= quiet_period
+        return new_count > count or settled
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=poll).until(grown_or_settled)
+    except TimeoutException:
+        pass
+    return last["count"]
+
+def remaining(deadline, timeout):
+    return timeout if deadline is None else max(min(timeout, deadline - time.time()), 0)
+
+def scroll_until(driver, item_selector, target_count=None, deadline=None, timeout=5.0, quiet_period=0.5, max_scrolls=200):
+    """
+        Infinite scroll: scrolls to the bottom as long as every scroll loads more items.
+
+            @ item_selector: CSS selector of the items the scrolling loads.
+            @ target_count: Stop once this many items are loaded, None loads all. Defaults to None.
+            @ deadline: time.time() after which scrolling stops. Defaults to None.
+            @ timeout: Maximum wait for new items after one scroll in seconds. Defaults to 5.0.
+            @ quiet_period: Seconds without DOM changes and new requests after which the feed counts as exhausted. Defaults to 0.5.
+            @ max_scrolls: Maximum number of scrolls. Defaults to 200.
+
+        :return: The number of loaded items.
+    """
+    driver.execute_script(OBSERVER_JS)
+    count = count_items(driver, item_selector)
+    for _ in range(max_scrolls):
+        if (target_count is not None and count >= target_count) or remaining(deadline, timeout) == 0:
+            break
+        driver.execute_script(SCROLL_JS)
+        new_count = wait_for_growth(driver, item_selector, count, remaining(deadline, timeout), quiet_period)
+        if new_count <= count:
+            break
+        count = new_count
+    return count
+
+def click_until(driver, button_locator, item_selector, target_count=None, deadline=None, timeout=5.0, quiet_period=0.5, max_clicks=200):
+    """
+        'Show more' pagination: clicks the button as long as it is there and every click loads more items.
+
+            @ button_locator: (By, value) locator of the button.
+            other parameters as in scroll_until.
+
+        :return: The number of loaded items.
+    """
+    driver.execute_script(OBSERVER_JS)
+    count = count_items(driver, item_selector)
+    for i in range(max_clicks):
+        if (target_count is not None and count >= target_count) or remaining(deadline, timeout) == 0:
+            break
+        # after the first click the button is re-rendered together with the new items, a missing one means the end
+        button_timeout = timeout if i == 0 else max(quiet_period, 1.0)
+        try:
+            button = WebDriverWait(driver, remaining(deadline, button_timeout), poll_frequency=0.05).until(EC.element_to_be_clickable(button_locator))
+        except TimeoutException:
+            break
+        # a script click is not intercepted by pop-ups covering the button, no scrolling to the bottom needed
+        driver.execute_script("arguments[0].click();", button)
+        new_count = wait_for_growth(driver, item_selector, count, remaining(deadline, timeout), quiet_period)
+        if new_count <= count:
+            break
+        count = new_count
+    return count
+
+def wait_for_items(driver, item_selector, timeout=10.0):
+    """
+        Waits for the first items of a page rendered by JavaScript.
+
+        :return: The item count, 0 if none appeared within timeout.
+    """
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=0.05).until(lambda d: count_items(d, item_selector))
+    except TimeoutException:
+        return 0
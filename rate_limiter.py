@@ -0,0 +1,175 @@
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# Adaptive per-domain pacing of the scrapers
+# Every domain gets a token bucket (requests per second, with a small burst) and a concurrency limit, both adjusted
+# AIMD-style from what the site answers, as TCP does: they grow geometrically until the first sign of trouble (slow
+# start), then additively while requests succeed and stay under the target latency, and a timeout, a connection error
+# or a 429/5xx halves them. Decreases happen at most once per observed latency, so a burst of failures of requests that
+# were already in flight counts as one signal.
+# This replaces the fixed random sleeps: a healthy site is crawled as fast as it answers, a struggling one is backed off.
+
+OK = "ok"
+SLOW = "slow"             # answered, but above the target latency
+THROTTLED = "throttled"   # 429 or 5xx, the site asks us to slow down
+TIMEOUT = "timeout"
+ERROR = "error"
+
+def outcome_of(status=None, error=None):
+    # classifies an HTTP status, or an exception / error message of a request without response, into a limiter outcome
+    if status is not None:
+        return THROTTLED if status == 429 or status >= 500 else OK
+    if error is None:
+        return OK
+    name = error if isinstance(error, str) else type(error).__name__
+    return TIMEOUT if "timeout" in name.lower() else ERROR
+
+class DomainLimiter:
+    def __init__(self, domain, rate=2.0, min_rate=0.2, max_rate=50.0, concurrency=2, max_concurrency=32,
+                 target_latency=3.0, burst=2.0, rate_step=0.5, decrease_factor=0.5):
+        """
+            Initializes the limiter of one domain.
+
+                @ rate: Initial requests per second. Defaults to 2.0.
+                @ min_rate/max_rate: Bounds of the rate. Default to 0.2 and 50.0.
+                @ concurrency: Initial number of requests in flight. Defaults to 2.
+                @ max_concurrency: Upper bound of the concurrency. Defaults to 32.
+                @ target_latency: Latency in seconds above which the limits stop growing. Defaults to 3.0.
+                @ burst: Seconds worth of tokens the bucket holds. Defaults to 2.0.
+                @ rate_step: Additive rate increase per successful request, scaled down by the rate. Defaults to 0.5.
+                @ decrease_factor: Multiplicative decrease on timeouts, errors and throttling. Defaults to 0.5.
+        """
+        self.domain = domain
+        self.rate, self.min_rate, self.max_rate = rate, min_rate, max_rate
+        self.concurrency, self.max_concurrency = float(concurrency), max_concurrency
+        self.target_latency = target_latency
+        self.burst = burst
+        self.rate_step = rate_step
+        self.decrease_factor = decrease_factor
+
+        self.tokens = 1.0
+        self.slow_start = True
+        self.last_refill = time.monotonic()
+        self.last_decrease = 0.
+        self.in_flight = 0
+        self.latency = None
+        self.counts = {OK: 0, SLOW: 0, THROTTLED: 0, TIMEOUT: 0, ERROR: 0}
+        self.lock = threading.Lock()
+
+    def try_acquire(self):
+        """
+            Takes a token and a concurrency slot if both are available.
+
+            :return: 0 if acquired, otherwise the number of seconds to wait before trying again.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.tokens + (now - self.last_refill) * self.rate, max(self.rate * self.burst, 1.0))
+            self.last_refill = now
+            if self.in_flight >= int(self.concurrency):
+                # a slot frees up after about one latency, poll a few times per latency
+                return min(max((self.latency or 0.1) / 4, 0.005), 0.25)
+            if self.tokens < 1:
+                return (1 - self.tokens) / self.rate
+            self.tokens -= 1
+            self.in_flight += 1
+            return 0
+
+    def acquire(self):
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return
+            await asyncio.sleep(wait)
+
+    def release(self, latency, outcome=OK):
+        """
+            Frees the slot of a finished request and adapts the rate and concurrency to its outcome.
+        """
+        with self.lock:
+            self.in_flight -= 1
+            if outcome == OK and latency > self.target_latency:
+                outcome = SLOW
+            self.counts[outcome] += 1
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            now = time.monotonic()
+            if outcome == OK and self.slow_start:
+                # slow start: +10% rate and +1 concurrency per successful request until the first decrease
+                self.rate = min(self.rate * 1.1, self.max_rate)
+                self.concurrency = min(self.concurrency + 1, self.max_concurrency)
+            elif outcome == OK:
+                # additive increase: about +rate_step req/s per second of successful requests, +1 concurrency per window
+                self.rate = min(self.rate + self.rate_step / max(self.rate, 1.0), self.max_rate)
+                self.concurrency = min(self.concurrency + 1 / self.concurrency, self.max_concurrency)
+            elif outcome != SLOW and now - self.last_decrease > (self.latency or 0):
+                # multiplicative decrease, once per latency window
+                self.slow_start = False
+                self.rate = max(self.rate * self.decrease_factor, self.min_rate)
+                self.concurrency = max(self.concurrency * self.decrease_factor, 1.0)
+                self.tokens = min(self.tokens, 0.)
+                self.last_decrease = now
+
+    def stats(self):
+        with self.lock:
+            requests = sum(self.counts.values())
+            failures = self.counts[THROTTLED] + self.counts[TIMEOUT] + self.counts[ERROR]
+            return {"rate": round(self.rate, 2), "concurrency": int(self.concurrency), "in_flight": self.in_flight,
+                    "latency": None if self.latency is None else round(self.latency, 3), "requests": requests,
+                    "error_rate": round(failures / requests, 3) if requests else 0., **self.counts}
+
+class RateController:
+    def __init__(self, **limiter_kwargs):
+        """
+            Keeps one DomainLimiter per domain, created on first use with the given DomainLimiter settings.
+        """
+        self.limiter_kwargs = limiter_kwargs
+        self.limiters = {}
+        self.lock = threading.Lock()
+
+    def limiter(self, url):
+        domain = urlsplit(url).netloc.lower()
+        with self.lock:
+            if domain not in self.limiters:
+                self.limiters[domain] = DomainLimiter(domain, **self.limiter_kwargs)
+            return self.limiters[domain]
+
+    @contextmanager
+    def request(self, url):
+        """
+            Context manager pacing one blocking request (e.g. a Selenium driver.get) to the domain of url:
+            waits for a token and a slot, then reports the latency and whether the block raised.
+        """
+        limiter = self.limiter(url)
+        limiter.acquire()
+        st = time.monotonic()
+        try:
+            yield limiter
+        except Exception as e:
+            limiter.release(time.monotonic() - st, outcome_of(error=e))
+            raise
+        limiter.release(time.monotonic() - st, OK)
+
+    def stats(self):
+        """
+            Live state of every domain: current rate (req/s), concurrency limit, requests in flight, smoothed latency (s),
+            number of requests, error rate and the counts per outcome.
+
+            :return: A dict of domain -> stats.
+        """
+        with self.lock:
+            limiters = list(self.limiters.values())
+        return {limiter.domain: limiter.stats() for limiter in limiters}
+
+    def summary(self):
+        return "\n".join(f"\t{domain}: {s['rate']} req/s, concurrency {s['concurrency']}, latency {s['latency']}s, "
+                         f"{s['requests']} requests, error rate {s['error_rate']:.1%}" for domain, s in self.stats().items())
@@ -0,0 +1,141 @@
+import os
+import re
+import json
+import time
+import operator
+import threading
+import pandas as pd
+
+# Streaming storage of the scraped records
+# Instead of one .xlsx written at the very end of a run, the scrapers append their records batch by batch to shards
+# under one folder per site: JSONL by default, Parquet (one file per batch) if pyarrow is installed. A crash only loses
+# the records of the batch in progress and memory stays constant however long the crawl. read_records loads the shards
+# back for the cleaning stage, reading only the requested columns and dropping non-matching rows while parsing, before
+# any DataFrame is built. Shards are never rewritten, a refetched article is appended again and the latest copy wins.
+
+FORMATS = {"jsonl": ".jsonl", "parquet": ".parquet"}
+
+# comparison operators of the (column, op, value) filters, as in pyarrow's read_table filters, plus "contains" for a
+# case-insensitive regex search in a text column, e.g. the keyword filter of the cleaning stage
+FILTER_OPS = {"==": operator.eq, "=": operator.eq, "!=": operator.ne, "<": operator.lt, "<=": operator.le,
+              ">": operator.gt, ">=": operator.ge, "in": lambda a, b: a in b, "not in": lambda a, b: a not in b,
+              "contains": lambda a, b: isinstance(a, str) and re.search(b, a, re.IGNORECASE) is not None}
+
+class RecordWriter:
+    def __init__(self, path="./data/records", media="records", batch_size=100, fmt="jsonl"):
+        """
+            Initializes a writer appending the records of one site to shards under path/media.
+
+                @ path: Root folder of the shards. Defaults to "./data/records".
+                @ media: Site of the records, the subfolder of the shards. Defaults to "records".
+                @ batch_size: Number of records per shard. Defaults to 100.
+                @ fmt: "jsonl" or "parquet" (needs pyarrow). Defaults to "jsonl".
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown record format {fmt}, expected one of {list(FORMATS)}")
+        self.folder = os.path.join(path, media)
+        self.batch_size = batch_size
+        self.fmt = fmt
+        # shards of later runs sort after the earlier ones, read_records relies on it to keep the latest copy
+        now = time.time()
+        self.run_id = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"{now % 1:.6f}"[1:] + f"-{os.getpid()}"
+        self.num_shards = 0
+        self.num_records = 0
+        self.buffer = []
+        # records arrive from the parsing callbacks of several threads
+        self.lock = threading.Lock()
+        os.makedirs(self.folder, exist_ok=True)
+
+    def write(self, records):
+        with self.lock:
+            self.buffer.extend(records)
+            while len(self.buffer) >= self.batch_size:
+                self.write_shard(self.buffer[:self.batch_size])
+                self.buffer = self.buffer[self.batch_size:]
+
+    def flush(self):
+        with self.lock:
+            if self.buffer:
+                self.write_shard(self.buffer)
+                self.buffer = []
+
+    def write_shard(self, records):
+        path = os.path.join(self.folder, f"part-{self.run_id}-{self.num_shards:05d}{FORMATS[self.fmt]}")
+        # write to a temporary file first so that readers never see a half-written shard
+        if self.fmt == "parquet":
+            pd.DataFrame(records).to_parquet(path + ".tmp", index=False)
+        else:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        os.replace(path + ".tmp", path)
+        self.num_shards += 1
+        self.num_records += len(records)
+
+    def close(self):
+        self.flush()
+
+def list_shards(path="./data/records", media=None):
+    """
+        Lists the shard files in write order, media (a name or a list of names) prunes the site folders.
+    """
+    if not os.path.isdir(path):
+        return []
+    medias = sorted(os.listdir(path)) if media is None else [media] if isinstance(media, str) else list(media)
+    shards = []
+    for m in medias:
+        folder = os.path.join(path, m)
+        if os.path.isdir(folder):
+            shards.extend(os.path.join(folder, f) for f in sorted(os.listdir(folder)) if f.endswith(tuple(FORMATS.values())))
+    return sorted(shards, key=os.path.basename)
+
+def matches(record, filters):
+    return all(FILTER_OPS[op](record.get(column), value) for column, op, value in filters)
+
+def read_jsonl_shard(path, columns, filters):
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if filters and not matches(record, filters):
+                continue
+            rows.append(record if columns is None else {c: record.get(c) for c in columns})
+    return pd.DataFrame(rows, columns=columns)
+
+def read_records(path="./data/records", media=None, columns=None, filters=None, dedup=True):
+    """
+        Reads the scraped records back from the shards.
+
+            @ path: Root folder of the shards. Defaults to "./data/records".
+            @ media: Site name or list of site names to read, None reads all. Defaults to None.
+            @ columns: Columns to load, None loads all. Defaults to None.
+            @ filters: List of (column, op, value) predicates rows must all satisfy, op one of ==, !=, <, <=, >, >=, in,
+                       not in, contains (case-insensitive regex search). They are applied while reading a shard, filtered
+                       columns need not be among the loaded ones. Defaults to None.
+            @ dedup: Keep only the latest copy of an article (same url and headline) appended by several runs. Defaults to True.
+
+        :return: A pandas DataFrame of the records in write order.
+    """
+    filters = list(filters or [])
+    # the dedup keys are read even if not requested
+    read_columns = None if columns is None else list(dict.fromkeys(list(columns) + (["url", "headline"] if dedup else [])))
+    frames = []
+    for shard in list_shards(path, media):
+        if shard.endswith(".parquet"):
+            # pyarrow evaluates the comparisons on the row groups, "contains" is applied to what they leave
+            native = [f for f in filters if f[1] != "contains"]
+            searches = [f for f in filters if f[1] == "contains"]
+            search_columns = [f[0] for f in searches if read_columns is not None and f[0] not in read_columns]
+            frame = pd.read_parquet(shard, columns=None if read_columns is None else read_columns + search_columns, filters=native or None)
+            for column, _, pattern in searches:
+                frame = frame[frame[column].str.contains(pattern, case=False, na=False)]
+            frames.append(frame.drop(columns=search_columns))
+        else:
+            frames.append(read_jsonl_shard(shard, read_columns, filters))
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(frames, ignore_index=True)
+    if dedup:
+        df = df.drop_duplicates(["url", "headline"], keep="last").reset_index(drop=True)
+    return df if columns is None else df[list(columns)]
@@ -0,0 +1,198 @@
+import time
+import random
+import threading
+from collections import deque
+
+# Work-stealing scheduler and WebDriver pool for the threaded scrapers
+# Every url is its own task. Tasks are dealt round-robin onto one deque per worker, a worker pops from the front of its
+# own deque and, once that is empty, steals from the back of the longest other deque, so a slow live-news page only
+# delays itself instead of the static chunk it used to be part of. Failed tasks are retried with exponential backoff
+# and each worker owns one browser slot of the DriverPool, which restarts the browser if it crashed or served too
+# many pages. A worker whose browser cannot be restarted hands its task back and stops, the last one to stop fails
+# the tasks still queued, so run always returns. Every attempt gets task_timeout seconds: page loads are cut off by
+# the browser's page load timeout, anything else a handler waits on (scrolling, explicit waits) has to stop at the
+# deadline it is passed, a running handler cannot be interrupted from outside its thread.
+
+class DriverPool:
+    def __init__(self, driver_factory, size, max_pages_per_driver=200):
+        """
+            Starts `size` browsers, one slot per worker.
+
+                @ driver_factory: Function returning a new WebDriver.
+                @ size: Number of browsers.
+                @ max_pages_per_driver: Number of pages after which a browser is recycled, Chrome grows with every page it
+                                        loads. Defaults to 200.
+        """
+        self.driver_factory = driver_factory
+        self.max_pages_per_driver = max_pages_per_driver
+        self.drivers = {i: driver_factory() for i in range(size)}
+        self.page_counts = {i: 0 for i in range(size)}
+        self.restarts = 0
+
+    def __len__(self):
+        return len(self.drivers)
+
+    def get(self, slot):
+        # recycle the browser once it served its share of pages
+        if self.page_counts[slot] >= self.max_pages_per_driver:
+            self.restart(slot)
+        self.page_counts[slot] += 1
+        return self.drivers[slot]
+
+    def is_healthy(self, slot):
+        # a crashed Chrome or a lost chromedriver session fails even the most trivial command
+        try:
+            return self.drivers[slot].execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def restart(self, slot):
+        try:
+            self.drivers[slot].quit()
+        except Exception:
+            pass
+        self.drivers[slot] = self.driver_factory()
+        self.page_counts[slot] = 0
+        self.restarts += 1
+
+    def close(self):
+        for slot in self.drivers:
+            try:
+                self.drivers[slot].quit()
+            except Exception:
+                pass
+
+class Task:
+    def __init__(self, key, handler):
+        # handler(driver, deadline) returns the result of the task, raising on failure, and stops waiting at deadline
+        self.key = key
+        self.handler = handler
+        self.attempt = 0
+        self.ready_at = 0.
+
+class WorkStealingScheduler:
+    def __init__(self, driver_pool, task_timeout=60, max_retries=2, backoff=1.0, verbose=True):
+        """
+            Initializes the scheduler over a driver pool, one worker thread per browser.
+
+                @ driver_pool: DriverPool the workers take their browsers from.
+                @ task_timeout: Time budget of one attempt of a task in seconds, set as the page load timeout of the browser
+                                and passed to the handlers as a deadline. Defaults to 60.
+                @ max_retries: Number of retries of a failing task. Defaults to 2.
+                @ backoff: Delay before the first retry in seconds, doubled on every further retry (with jitter). Defaults to 1.0.
+                @ verbose: Print failures and retries. Defaults to True.
+        """
+        self.driver_pool = driver_pool
+        self.task_timeout = task_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.verbose = verbose
+
+    def next_task(self, queues, w):
+        # own work first (front), then steal from the back of the longest other queue
+        try:
+            return queues[w].popleft()
+        except IndexError:
+            pass
+        for victim in sorted(range(len(queues)), key=lambda v: -len(queues[v])):
+            if victim == w: continue
+            try:
+                return queues[victim].pop()
+            except IndexError:
+                continue
+        return None
+
+    def recover(self, w):
+        """
+            Restarts the browser of worker w if it crashed.
+
+            :return: None if the browser works, the exception of the restart if it could not be restarted.
+        """
+        if self.driver_pool.is_healthy(w):
+            return None
+        if self.verbose: print(f"\tBrowser {w} crashed, restarting it...")
+        try:
+            self.driver_pool.restart(w)
+            return None
+        except Exception as e:
+            if self.verbose: print(f"\tBrowser {w} could not be restarted ({type(e).__name__}: {e}), its worker stops...")
+            return e
+
+    def run(self, tasks):
+        """
+            Runs all tasks on the worker threads and waits for them.
+
+                @ tasks: List of (key, handler) pairs, handler(driver, deadline) returns the result of the task. Handlers
+                         that wait for more than a page load must give up by deadline (time.time() based).
+
+            :return: A dict of key -> result of the succeeded tasks and a dict of key -> last error of the failed ones,
+                     including the tasks left when no browser could be restarted.
+        """
+        n_workers = len(self.driver_pool)
+        queues = [deque() for _ in range(n_workers)]
+        for i, (key, handler) in enumerate(tasks):
+            queues[i % n_workers].append(Task(key, handler))
+        results, errors = {}, {}
+        lock = threading.Lock()
+        remaining = [len(tasks)]
+        alive = [n_workers]
+
+        def retire(w, error):
+            # the last worker without a browser fails whatever is still queued, nobody is left to run it
+            with lock:
+                alive[0] -= 1
+                if alive[0] > 0:
+                    return
+                for queue in queues:
+                    while queue:
+                        errors[queue.popleft().key] = error
+                        remaining[0] -= 1
+
+        def worker(w):
+            while True:
+                with lock:
+                    if remaining[0] == 0:
+                        return
+                task = self.next_task(queues, w)
+                if task is None:
+                    # everything left is in flight on other workers or waiting for a retry
+                    time.sleep(0.05)
+                    continue
+                delay = task.ready_at - time.time()
+                if delay > 0:
+                    # not due yet, park it behind the own queue and let the others steal it
+                    queues[w].append(task)
+                    time.sleep(min(delay, 0.05))
+                    continue
+
+                try:
+                    # taking the browser may recycle it, a failing restart counts as a failed attempt too
+                    driver = self.driver_pool.get(w)
+                    driver.set_page_load_timeout(self.task_timeout)
+                    result = task.handler(driver, time.time() + self.task_timeout)
+                except Exception as e:
+                    restart_error = self.recover(w)
+                    task.attempt += 1
+                    if task.attempt <= self.max_retries or restart_error is not None:
+                        task.ready_at = time.time() + self.backoff * 2 ** (task.attempt - 1) * random.uniform(0.8, 1.2)
+                        if self.verbose and restart_error is None: print(f"\tRetrying {task.key} ({type(e).__name__}), attempt {task.attempt + 1}...")
+                        queues[w].append(task)
+                    else:
+                        with lock:
+                            errors[task.key] = e
+                            remaining[0] -= 1
+                    if restart_error is not None:
+                        # the task goes back to the others, which steal it from this queue
+                        retire(w, restart_error)
+                        return
+                    continue
+                with lock:
+                    results[task.key] = result
+                    remaining[0] -= 1
+
+        threads = [threading.Thread(target=worker, args=(w,), daemon=True) for w in range(n_workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results, errors
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+from aiohttp import web
+from news_fetcher import AsyncFetcher
+
+# news_fetcher.fetch_all against a local aiohttp server standing in for the news sites
+# Run with: python -m pytest test_news_fetcher.py
+
+def run_with_server(handlers, urls, callback=None, **fetcher_kwargs):
+    """
+        Serves handlers (path -> aiohttp handler) on a free localhost port from a background thread and fetches the given
+        paths from it with the blocking fetch_all.
+
+        :return: A dict path -> FetchResult.
+    """
+    loop = asyncio.new_event_loop()
+    app = web.Application()
+    for path, handler in handlers.items():
+        app.router.add_get(path, handler)
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", 0).start())
+    base = f"http://127.0.0.1:{runner.addresses[0][1]}"
+    server = threading.Thread(target=loop.run_forever, daemon=True)
+    server.start()
+    try:
+        results = AsyncFetcher(**fetcher_kwargs).fetch_all([base + url for url in urls], callback)
+    finally:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        server.join()
+        loop.close()
+    return {result.url[len(base):]: result for result in results}
+
+def flaky(status, failures, calls):
+    # answers status for the first failures requests, then the article
+    async def handler(request):
+        calls.append(request.path)
+        if len(calls) <= failures:
+            return web.Response(status=status, text="try again later")
+        return web.Response(text="<html><body><p>article</p></body></html>", content_type="text/html")
+    return handler
+
+def test_success():
+    calls = []
+    results = run_with_server({"/a": flaky(200, 0, calls), "/b": flaky(200, 0, [])}, ["/a", "/b"])
+    assert set(results) == {"/a", "/b"}
+    for result in results.values():
+        assert result.status == 200 and result.error is None
+        assert "<p>article</p>" in result.html
+    assert calls == ["/a"]
+
+def test_retries_429_and_5xx():
+    calls_429, calls_503 = [], []
+    results = run_with_server({"/throttled": flaky(429, 2, calls_429), "/unavailable": flaky(503, 1, calls_503)},
+                              ["/throttled", "/unavailable"], max_retries=2, backoff=0.01)
+    assert results["/throttled"].status == 200 and results["/throttled"].html is not None
+    assert results["/unavailable"].status == 200
+    assert len(calls_429) == 3 and len(calls_503) == 2
+
+def test_gives_up_after_max_retries():
+    calls = []
+    results = run_with_server({"/down": flaky(500, 10, calls)}, ["/down"], max_retries=2, backoff=0.01)
+    assert results["/down"].status == 500 and results["/down"].html is None and results["/down"].error == "HTTP 500"
+    assert len(calls) == 3
+
+def test_client_errors_are_not_retried():
+    calls = []
+    results = run_with_server({"/missing": flaky(404, 10, calls)}, ["/missing"], max_retries=2, backoff=0.01)
+    assert results["/missing"].status == 404 and results["/missing"].error == "HTTP 404"
+    assert len(calls) == 1
+
+def test_timeout_is_retried():
+    calls = []
+
+    async def slow_then_fast(request):
+        calls.append(request.path)
+        if len(calls) == 1:
+            await asyncio.sleep(2)
+        return web.Response(text="<html>late article</html>", content_type="text/html")
+
+    results = run_with_server({"/slow": slow_then_fast}, ["/slow"], timeout=0.3, max_retries=1, backoff=0.01)
+    assert results["/slow"].status == 200 and "late article" in results["/slow"].html
+    assert len(calls) == 2
+
+def test_timeout_gives_up():
+    async def hangs(request):
+        await asyncio.sleep(2)
+        return web.Response(text="never")
+
+    results = run_with_server({"/hangs": hangs}, ["/hangs"], timeout=0.2, max_retries=1, backoff=0.01)
+    assert results["/hangs"].status is None and results["/hangs"].html is None and results["/hangs"].error == "timeout"
+
+def test_slow_async_callback_does_not_time_out_the_downloads():
+    # an awaited callback, as the parsing pipeline's submit_async, must not freeze the loop under the other requests
+    handled = []
+
+    async def on_result(result):
+        await asyncio.sleep(0.2)
+        handled.append(result.url)
+
+    results = run_with_server({f"/{n}": flaky(200, 0, []) for n in range(6)}, [f"/{n}" for n in range(6)], callback=on_result,
+                              max_concurrency=2, timeout=0.3, max_retries=0)
+    assert [result.error for result in results.values()] == [None] * 6
+    assert len(handled) == 6
@@ -0,0 +1,161 @@
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from array import array
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from lda_vocabulary import prune_corpus
+
+# Parallel, chunked preprocessing of the cleaned articles for LDA
+# Same tokens as the notebooks' sent_to_words + process_words (emails and quotes removed, gensim's simple_preprocess
+# tokenization with accents stripped, stop words dropped) with the patterns compiled once and a frozenset of stop words.
+# preprocess_corpus reads cleaned_data.csv in chunks, tokenizes each chunk in a pool of processes and encodes it there
+# into a small chunk vocabulary and int32 token ids, so only arrays come back to the parent, which maps them onto the
+# global vocabulary and returns the flat corpus arrays of lda_model. Only a few chunks are in flight at a time, so
+# memory stays bounded by the chunk size and the int32 token ids, not by the size of the text.
+
+EMAIL_RE = re.compile(r"\S*@\S*\s?")
+NON_ASCII_RE = re.compile(r"[^\x00-\x7f]+")
+# gensim.utils.PAT_ALPHABETIC (runs of word characters that are not digits) written as a character class, which
+# matches the same tokens without a lookahead per character
+TOKEN_RE = re.compile(r"[^\W\d]+")
+
+# the notebooks' additions to the nltk stop words
+EXTRA_STOP_WORDS = ("from", "subject", "re", "edu", "use", "not", "would", "say", "could", "_", "be", "know", "good",
+                    "go", "get", "do", "done", "try", "many", "some", "nice", "thank", "think", "see", "rather", "easy",
+                    "easily", "lot", "lack", "make", "want", "seem", "run", "need", "even", "right", "line", "also",
+                    "may", "take", "come")
+
+def load_stop_words(extra=EXTRA_STOP_WORDS):
+    """
+        The nltk English stop words plus the notebooks' extra ones, as a frozenset for O(1) lookups.
+    """
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words("english")) | frozenset(extra)
+
+@lru_cache(maxsize=4096)
+def deaccent_run(run):
+    # as gensim.utils.deaccent, on one run of non-ascii characters (mostly a single curly quote or accented letter)
+    norm = unicodedata.normalize("NFD", run)
+    return unicodedata.normalize("NFC", "".join(ch for ch in norm if unicodedata.category(ch) != "Mn"))
+
+def deaccent(text):
+    # only the non-ascii runs need normalizing, memoized since the same few characters keep coming back
+    if text.isascii():
+        return text
+    return NON_ASCII_RE.sub(lambda match: deaccent_run(match.group()), text)
+
+def tokenize(text, stop_words=frozenset(), min_len=2, max_len=15):
+    """
+        Tokenizes one article like sent_to_words followed by the stop word filter of process_words.
+
+        :return: The list of tokens.
+    """
+    if not isinstance(text, str):
+        return []
+    # the email pattern is slow to fail, most articles have no @ at all; collapsing whitespace does not change the tokens
+    if "@" in text:
+        text = EMAIL_RE.sub("", text)
+    text = text.replace("'", "")
+    return [token for token in TOKEN_RE.findall(deaccent(text.lower()))
+            if min_len <= len(token) <= max_len and token[0] != "_" and token not in stop_words]
+
+def add_bigrams(tokens):
+    # the bigram notebook's process_words: "w1 w2" of every adjacent pair appended to the unigrams
+    return tokens + [" ".join(pair) for pair in zip(tokens, tokens[1:])]
+
+# worker state, set once per process by init_worker
+worker_config = {}
+
+def init_worker(stop_words, bigrams, lemmatizer):
+    worker_config.update(stop_words=stop_words, bigrams=bigrams, lemmatizer=lemmatizer)
+
+def preprocess_texts(texts, stop_words=frozenset(), bigrams=False, lemmatizer=None):
+    """
+        Preprocesses a batch of articles in the current process.
+
+            @ texts: List of article texts.
+            @ stop_words: Set of words to drop. Defaults to an empty set.
+            @ bigrams: Append the bigrams of every article, as the bigram notebook does. Defaults to False.
+            @ lemmatizer: Optional function mapping a list of token lists to a list of lemmatized token lists, run on
+                          the whole batch. The stop words are dropped again after it. Defaults to None.
+
+        :return: The list of token lists.
+    """
+    docs = [tokenize(text, stop_words) for text in texts]
+    if lemmatizer is not None:
+        docs = [[token for token in doc if token not in stop_words] for doc in lemmatizer(docs)]
+    if bigrams:
+        docs = [add_bigrams(doc) for doc in docs]
+    return docs
+
+def encode_chunk(texts):
+    """
+        Worker task: preprocesses a chunk of articles and encodes it against a vocabulary local to the chunk.
+
+        :return: The chunk's words, its int32 token ids and the int64 number of tokens of every article.
+    """
+    docs = preprocess_texts(texts, **worker_config)
+    word_to_index = defaultdict()
+    word_to_index.default_factory = word_to_index.__len__
+    token_buffer = array("i")
+    for doc in docs:
+        token_buffer.extend(map(word_to_index.__getitem__, doc))
+    return list(word_to_index), np.frombuffer(token_buffer, dtype=np.int32), np.fromiter(map(len, docs), np.int64, len(docs))
+
+def iter_text_chunks(path, column="main_text", chunk_size=1000, nrows=None):
+    # only the text column is parsed, missing texts become empty articles
+    for chunk in pd.read_csv(path, usecols=[column], chunksize=chunk_size, nrows=nrows):
+        yield chunk[column].fillna("").astype(str).tolist()
+
+def preprocess_corpus(path, stop_words=frozenset(), column="main_text", chunk_size=1000, n_workers=None, nrows=None,
+                      bigrams=False, lemmatizer=None, min_df=1, max_df=1.0, max_vocab_size=None):
+    """
+        Reads, tokenizes and encodes the articles of a csv file chunk by chunk in a pool of processes.
+
+            @ path: Path of the csv, e.g. "./input/cleaned_data.csv".
+            @ stop_words: Set of words to drop, e.g. load_stop_words(). Defaults to an empty set.
+            @ column: Text column. Defaults to "main_text".
+            @ chunk_size: Number of articles per chunk. Defaults to 1000.
+            @ n_workers: Number of processes, 0 preprocesses in the current process and None uses all cores. Defaults to None.
+            @ nrows: Read only the first nrows articles, None reads all. Defaults to None.
+            @ bigrams, lemmatizer: See preprocess_texts.
+            @ min_df, max_df, max_vocab_size: Vocabulary pruning, see lda_vocabulary.build_corpus. Default to no pruning.
+
+        :return: A lda_vocabulary.Corpus (sorted vocabulary, int32 token_ids, int64 doc_offsets) in the order of the rows,
+                 which fit_lda accepts in place of the tokenized documents.
+    """
+    word_to_index = defaultdict()
+    word_to_index.default_factory = word_to_index.__len__
+    token_buffer = array("i")
+    doc_lengths = array("q")
+
+    def merge(chunk_words, chunk_ids, chunk_lengths):
+        # chunk ids -> global ids, one dict lookup per distinct word of the chunk instead of one per token
+        remap = np.fromiter(map(word_to_index.__getitem__, chunk_words), np.int32, len(chunk_words))
+        token_buffer.frombytes(remap[chunk_ids].tobytes())
+        doc_lengths.frombytes(chunk_lengths.tobytes())
+
+    chunks = iter_text_chunks(path, column, chunk_size, nrows)
+    if n_workers == 0:
+        init_worker(frozenset(stop_words), bigrams, lemmatizer)
+        for texts in chunks:
+            merge(*encode_chunk(texts))
+    else:
+        n_workers = n_workers or os.cpu_count()
+        with ProcessPoolExecutor(n_workers, initializer=init_worker, initargs=(frozenset(stop_words), bigrams, lemmatizer)) as pool:
+            # a bounded window of chunks in flight, merged in submission order to keep the row order
+            pending = deque()
+            for texts in chunks:
+                pending.append(pool.submit(encode_chunk, texts))
+                if len(pending) >= 2 * n_workers:
+                    merge(*pending.popleft().result())
+            while pending:
+                merge(*pending.popleft().result())
+
+    doc_offsets = np.zeros(len(doc_lengths) + 1, dtype=np.int64)
+    np.cumsum(np.frombuffer(doc_lengths, dtype=np.int64), out=doc_offsets[1:])
+    return prune_corpus(list(word_to_index), np.frombuffer(token_buffer, dtype=np.int32), doc_offsets, min_df, max_df, max_vocab_size)